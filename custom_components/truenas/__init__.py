@@ -2,38 +2,56 @@
 import abc
 import asyncio
 import logging
-from datetime import timedelta
 from enum import Enum, unique
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import async_timeout
 import voluptuous as vol
 from aiotruenas_client import CachingMachine as Machine
 from aiotruenas_client.websockets.disk import CachingDisk
-from aiotruenas_client.websockets.jail import CachingJail
+from aiotruenas_client.websockets.jail import CachingJail, JailStatus
 from aiotruenas_client.websockets.pool import CachingPool
 from aiotruenas_client.websockets.virtualmachine import CachingVirtualMachine
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    CONF_API_KEY,
-    CONF_HOST,
-    CONF_PASSWORD,
-    CONF_SCAN_INTERVAL,
-    CONF_USERNAME,
+from homeassistant.const import CONF_API_KEY, CONF_HOST, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant, State, callback
+from homeassistant.exceptions import (
+    ConfigEntryAuthFailed,
+    ConfigEntryNotReady,
+    HomeAssistantError,
 )
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import entity_registry
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.restore_state import RestoreEntity
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import slugify
-from websockets.exceptions import WebSocketException
-
+from websockets.exceptions import SecurityError, WebSocketException
+
+from .connection import (
+    async_close,
+    async_connect,
+    async_get_session_cache,
+    create_machine,
+    session_key,
+)
 from .const import (
     CONF_AUTH_API_KEY,
     CONF_AUTH_MODE,
     CONF_AUTH_PASSWORD,
-    DEFAULT_SCAN_INTERVAL_SECONDS,
     DOMAIN,
+    ResourceClass,
+)
+from .control import async_refresh_jail, async_refresh_vm, async_wait_for_job
+from .coordinator import create_coordinators
+from .events import signal_resource_updated
+from .hub import TrueNASHub
+from .identity import IDENTITY_SLOTS, identity, shared_device_info
+from .smart import SmartResults
+from .snapshot import Snapshot, StateSnapshots
+from .storage import (
+    FETCHERS,
+    DiskTemperatureStore,
+    MachineSnapshotStore,
+    SmartResultStore,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -44,74 +62,106 @@ PLATFORMS = [
     "binary_sensor",
     "sensor",
 ]
-TIMEOUT = 10
 
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the TrueNAS component."""
+    # Imported here, as the services act on the entities defined in this module.
+    from .services import async_setup_services
+
+    async_setup_services(hass)
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up TrueNAS from a config entry."""
     hass.data.setdefault(DOMAIN, {})
-
-    host = entry.data[CONF_HOST]
-    password = entry.data[CONF_PASSWORD]
-    username = entry.data[CONF_USERNAME]
-    api_key = entry.data[CONF_API_KEY]
-    try:
-        machine = await Machine.create(
-            host=host,
-            password=password,
-            username=username,
-            api_key=api_key,
+    hubs: Dict[str, TrueNASHub] = hass.data[DOMAIN].setdefault("hubs", {})
+
+    store = MachineSnapshotStore(hass, entry.entry_id)
+    # Other entries for the same host and credentials share their connection.
+    hub = hubs.get(session_key(entry.data))
+    new_hub = hub is None
+    if hub is None:
+        # A session left by the config flow, or by the entry before it
+        # reloaded, is adopted instead of connecting again.
+        machine = async_get_session_cache(hass).async_pop(entry.data)
+        if machine is None:
+            machine = create_machine()
+        if not await store.async_restore(machine) and machine.closed:
+            # Without a snapshot there is nothing to show until the host is reached.
+            try:
+                await async_connect(machine, entry.data)
+            except SecurityError as exc:
+                await async_close(machine)
+                raise ConfigEntryAuthFailed from exc
+            except WebSocketException as exc:
+                _LOGGER.error(f"Unable to connect to TrueNAS machine: {exc}")
+                raise ConfigEntryNotReady
+        hub = TrueNASHub(hass, entry, machine)
+        hubs[hub.key] = hub
+
+    machine = hub.machine
+    smart_results = SmartResults()
+    smart_store = SmartResultStore(hass, entry.entry_id)
+    await smart_store.async_restore(smart_results)
+    last_temperatures: Dict[str, int] = {}
+    temperature_store = DiskTemperatureStore(hass, entry.entry_id)
+    await temperature_store.async_restore(last_temperatures)
+    coordinators = create_coordinators(
+        hass, entry, hub, smart_results, last_temperatures
+    )
+    for resource_class in FETCHERS:
+        entry.async_on_unload(
+            coordinators[resource_class].async_add_listener(
+                lambda: store.async_schedule_save(machine)
+            )
         )
-
-        async def async_update_data():
-            """Fetch data from the TrueNAS machine."""
-            _LOGGER.debug("refreshing data")
-            async with async_timeout.timeout(TIMEOUT):
-                try:
-                    await asyncio.gather(
-                        machine.get_disks(include_temperature=True),
-                        machine.get_jails(),
-                        machine.get_pools(),
-                        machine.get_vms(),
-                    )
-                except Exception as exc:
-                    raise UpdateFailed("Error fetching TrueNAS state") from exc
-
-        scan_interval = entry.options.get(
-            CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS
+    entry.async_on_unload(
+        coordinators[ResourceClass.DISK_HEALTH].async_add_listener(
+            lambda: smart_store.async_schedule_save(smart_results)
         )
-        coordinator = DataUpdateCoordinator(
-            hass,
-            _LOGGER,
-            name="TrueNAS resource status",
-            update_method=async_update_data,
-            update_interval=timedelta(seconds=scan_interval),
+    )
+    entry.async_on_unload(
+        coordinators[ResourceClass.DISK_TEMPERATURES].async_add_listener(
+            lambda: temperature_store.async_schedule_save(last_temperatures)
         )
-
-        # Fetch initial data so we have data when entities subscribe
-        await coordinator.async_refresh()
-
-        hass.data[DOMAIN][entry.entry_id] = {
-            "coordinator": coordinator,
-            "machine": machine,
-        }
-    except WebSocketException as exc:
-        _LOGGER.error(f"Unable to connect to TrueNAS machine: {exc}")
-        raise ConfigEntryNotReady
+    )
+    hub.async_add_entry(entry, coordinators)
+
+    hass.data[DOMAIN][entry.entry_id] = {
+        "coordinators": coordinators,
+        "handoff": False,
+        "hub": hub,
+        "machine": machine,
+        "smart_results": smart_results,
+        "snapshots": StateSnapshots(),
+        "supervisor": hub.supervisor,
+    }
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
     for component in PLATFORMS:
         hass.async_create_task(
             hass.config_entries.async_forward_entry_setup(entry, component)
         )
 
+    if new_hub:
+        # Entities start from the last known state, so the host is reached and
+        # refreshed without holding up the rest of Home Assistant.
+        hub.async_start()
+
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry when its options or credentials change."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    # The connection is kept for the reload unless it was authenticated with
+    # credentials the entry no longer has.
+    data["handoff"] = session_key(entry.data) == data["hub"].key
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = all(
@@ -123,12 +173,28 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         )
     )
     if unload_ok:
-        await hass.data[DOMAIN][entry.entry_id]["machine"].close()
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        for coordinator in data["coordinators"].values():
+            await coordinator.async_shutdown()
+        hub: TrueNASHub = data["hub"]
+        # The connection is only closed once no entry for the host uses it.
+        if await hub.async_release(entry):
+            hass.data[DOMAIN]["hubs"].pop(hub.key)
+            if data["handoff"] and not hub.machine.closed:
+                async_get_session_cache(hass).async_put(hub.session_data, hub.machine)
+            else:
+                await async_close(hub.machine)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the snapshot of a config entry that is deleted."""
+    await MachineSnapshotStore(hass, entry.entry_id).async_remove()
+    await SmartResultStore(hass, entry.entry_id).async_remove()
+    await DiskTemperatureStore(hass, entry.entry_id).async_remove()
+
+
 async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
     """Migrate old entry."""
     _LOGGER.debug("Migrating from version %s", config_entry.version)
@@ -144,20 +210,52 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
 
         config_entry.version = 2
 
+    if config_entry.version == 2:
+        # Version 2 built the unique ids of disks, jails and virtual machines
+        # from the unique id of the entry, which is never set, and those of
+        # pools from their guid alone, so they collided across entries.
+        await entity_registry.async_migrate_entries(
+            hass,
+            config_entry.entry_id,
+            lambda entity: _migrate_unique_id(config_entry, entity),
+        )
+
+        config_entry.version = 3
+
     _LOGGER.info("Migration to version %s successful", config_entry.version)
 
     return True
 
 
+@callback
+def _migrate_unique_id(
+    config_entry: ConfigEntry, entity: entity_registry.RegistryEntry
+) -> Optional[Dict[str, Any]]:
+    prefix = f"{slugify(config_entry.entry_id)}_"
+    if entity.unique_id.startswith(prefix):
+        return None
+    unique_id = entity.unique_id
+    old_prefix = f"{slugify(str(config_entry.unique_id))}_"
+    if unique_id.startswith(old_prefix):
+        unique_id = unique_id[len(old_prefix) :]
+    return {"new_unique_id": f"{prefix}{unique_id}"}
+
+
 class TrueNASEntity(RestoreEntity):
     """Define a generic TrueNAS entity."""
 
+    # Hosts may have thousands of entities, so their own state is kept in slots,
+    # rather than in the __dict__ each instance has for the attributes of Home
+    # Assistant's Entity.  Subclasses declare slots for what they add, if any.
+    __slots__ = ("_coordinator", "_entry", "_name", "_last_state") + IDENTITY_SLOTS
+
     def __init__(
         self, entry: ConfigEntry, name: str, coordinator: DataUpdateCoordinator
     ) -> None:
         self._coordinator = coordinator
         self._entry = entry
         self._name = name
+        self._last_state: Optional[State] = None
 
     @abc.abstractmethod
     def _get_state(self) -> Any:
@@ -169,6 +267,41 @@ class TrueNASEntity(RestoreEntity):
         assert self.hass is not None
         return self.hass.data[DOMAIN][self._entry.entry_id]["machine"]
 
+    @property
+    def _resource(self) -> Optional[Tuple[ResourceClass, str]]:
+        """The resource class and key this entity reads, if it has one."""
+        return None
+
+    @property
+    def _identity_key(self) -> Any:
+        """What the unique id, name and device info of this entity depend on."""
+        return None
+
+    @property
+    def _hub_id(self) -> str:
+        assert self.hass is not None
+        return self.hass.data[DOMAIN][self._entry.entry_id]["hub"].hub_id
+
+    @property
+    def _snapshots(self) -> StateSnapshots:
+        assert self.hass is not None
+        return self.hass.data[DOMAIN][self._entry.entry_id]["snapshots"]
+
+    def _snapshot(self) -> Snapshot:
+        available = self.available
+        return (
+            self.name,
+            available,
+            self._get_state() if available else None,
+            self.extra_state_attributes,
+        )
+
+    @callback
+    def _async_write_if_changed(self) -> None:
+        """Write the state only if it differs from what was last published."""
+        if self._snapshots.update(self.unique_id, self._snapshot()):
+            self.async_write_ha_state()
+
     @property
     def should_poll(self):
         """No need to poll!  Coordinator notifies entity of updates."""
@@ -180,9 +313,26 @@ class TrueNASEntity(RestoreEntity):
         return self._coordinator.last_update_success
 
     async def async_added_to_hass(self):
+        # Kept for values that are not part of the machine snapshot, until the
+        # first refresh replaces them.
+        self._last_state = await self.async_get_last_state()
+        # The state is written once the entity is added.
+        self._snapshots.update(self.unique_id, self._snapshot())
         self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
+            self._coordinator.async_add_listener(self._async_write_if_changed)
         )
+        if self._resource is not None:
+            resource_class, key = self._resource
+            self.async_on_remove(
+                async_dispatcher_connect(
+                    self.hass,
+                    signal_resource_updated(self._hub_id, resource_class, key),
+                    self._async_write_if_changed,
+                )
+            )
+
+    async def async_will_remove_from_hass(self):
+        self._snapshots.remove(self.unique_id)
 
     async def async_update(self):
         """Update latest state."""
@@ -207,6 +357,24 @@ class TrueNASSensor(TrueNASEntity):
         return self._get_state()
 
 
+class TrueNASHostEntity:
+    """Represents the TrueNAS host itself."""
+
+    _entry: ConfigEntry
+
+    @property
+    def _identity_key(self) -> Any:
+        return self._entry.title
+
+    @identity
+    def device_info(self):
+        return shared_device_info(
+            identifiers={(DOMAIN, self._entry.entry_id)},
+            name=self._entry.title,
+            manufacturer="TrueNAS",
+        )
+
+
 class TrueNASDiskEntity:
     """Represents a disk on the TrueNAS host."""
 
@@ -218,15 +386,55 @@ class TrueNASDiskEntity:
         return self._disk.available
 
     @property
+    def _identity_key(self) -> Any:
+        assert self._disk is not None
+        # The model of a disk is bound to its serial, so only its name changes.
+        return self._disk.name
+
+    @identity
     def device_info(self):
         assert self._disk is not None
-        return {
-            "identifiers": {
-                (DOMAIN, slugify(self._disk.serial)),
+        return shared_device_info(
+            identifiers={(DOMAIN, slugify(self._disk.serial))},
+            name=self._disk.name,
+            model=self._disk.model,
+        )
+
+    @property
+    def _resource(self) -> Optional[Tuple[ResourceClass, str]]:
+        assert self._disk is not None
+        return (ResourceClass.DISKS, self._disk.serial)
+
+
+class TrueNASInterfaceEntity:
+    """Represents a network interface on the TrueNAS host."""
+
+    _coordinator: DataUpdateCoordinator
+    _entry: ConfigEntry
+    _interface_name: str
+
+    @property
+    def available(self) -> bool:
+        data = self._coordinator.data
+        return (
+            self._coordinator.last_update_success
+            and data is not None
+            and self._interface_name in data.interfaces
+        )
+
+    @property
+    def _identity_key(self) -> Any:
+        return self._interface_name
+
+    @identity
+    def device_info(self):
+        return shared_device_info(
+            identifiers={
+                (DOMAIN, slugify(f"{self._entry.entry_id}-{self._interface_name}")),
             },
-            "name": self._disk.name,
-            "model": self._disk.model,
-        }
+            name=self._interface_name,
+            via_device=(DOMAIN, self._entry.entry_id),
+        )
 
 
 class TrueNASPoolEntity:
@@ -240,20 +448,28 @@ class TrueNASPoolEntity:
         return self._pool.available
 
     @property
+    def _identity_key(self) -> Any:
+        assert self._pool is not None
+        return self._pool.name
+
+    @identity
     def device_info(self):
         assert self._pool is not None
-        return {
-            "identifiers": {
-                (DOMAIN, slugify(self._pool.guid)),
-            },
-            "name": self._pool.name,
-            "manufacturer": f"TrueNAS",
-        }
+        return shared_device_info(
+            identifiers={(DOMAIN, slugify(self._pool.guid))},
+            name=self._pool.name,
+            manufacturer="TrueNAS",
+        )
 
-    @property
+    @identity
     def unique_id(self):
         assert self._pool is not None
-        return self._pool.guid
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}")
+
+    @property
+    def _resource(self) -> Optional[Tuple[ResourceClass, str]]:
+        assert self._pool is not None
+        return (ResourceClass.POOLS, self._pool.guid)
 
 
 class TrueNASJailEntity:
@@ -266,25 +482,57 @@ class TrueNASJailEntity:
         return self._jail.available
 
     @property
+    def _identity_key(self) -> Any:
+        return self._jail.name
+
+    @identity
     def device_info(self):
-        return {
-            "name": self._jail.name,
-        }
+        return shared_device_info(name=self._jail.name)
+
+    @property
+    def _resource(self) -> Optional[Tuple[ResourceClass, str]]:
+        return (ResourceClass.JAILS, self._jail.name)
 
-    async def start(self) -> None:
-        """Starts a Jail"""
+    async def start(self, refresh: bool = True) -> None:
+        """Starts a Jail, then refreshes it unless `refresh` is False."""
         assert self.available
-        await self._jail.start()
+        if self._jail.status != JailStatus.DOWN:
+            raise HomeAssistantError(f"Jail {self._jail.name} is already running.")
+        await self._async_run_job("jail.start", [self._jail.name], refresh)
 
-    async def stop(self, force: bool = False) -> None:
-        """Starts a Jail"""
+    async def stop(self, force: bool = False, refresh: bool = True) -> None:
+        """Stops a Jail, then refreshes it unless `refresh` is False."""
         assert self.available
-        await self._jail.stop(force=force)
+        if self._jail.status != JailStatus.UP:
+            raise HomeAssistantError(f"Jail {self._jail.name} is not running.")
+        await self._async_run_job("jail.stop", [self._jail.name, force], refresh)
 
-    async def restart(self) -> None:
-        """Starts a Jail"""
+    async def restart(self, refresh: bool = True) -> None:
+        """Restarts a Jail, then refreshes it unless `refresh` is False."""
         assert self.available
-        await self._jail.restart()
+        if self._jail.status != JailStatus.UP:
+            raise HomeAssistantError(f"Jail {self._jail.name} is not running.")
+        await self._async_run_job("jail.restart", [self._jail.name], refresh)
+
+    async def _async_run_job(
+        self, method: str, params: List[Any], refresh: bool
+    ) -> None:
+        try:
+            job_id = await self.machine.invoke_method(method, params)
+            await async_wait_for_job(self.machine, job_id)
+        finally:
+            if refresh:
+                await self._async_refresh_jail()
+
+    async def _async_refresh_jail(self) -> None:
+        # Only this jail is queried again, rather than every jail.  A failure
+        # is left to the next refresh, rather than hiding how the action went.
+        try:
+            await async_refresh_jail(
+                self.hass, self._hub_id, self.machine, self._jail.name
+            )
+        except Exception as exc:
+            _LOGGER.warning("Unable to refresh jail %s: %s", self._jail.name, exc)
 
 
 class TrueNASVirtualMachineEntity:
@@ -297,23 +545,58 @@ class TrueNASVirtualMachineEntity:
         return self._vm.available
 
     @property
+    def _identity_key(self) -> Any:
+        return self._vm.name
+
+    @identity
     def device_info(self):
         assert self._vm is not None
-        return {
-            "name": self._vm.name,
-        }
+        return shared_device_info(name=self._vm.name)
 
-    async def start(self, overcommit: bool = False) -> None:
-        """Starts a Virtual Machine"""
-        assert self.available
-        await self._vm.start(overcommit=overcommit)
+    @property
+    def _resource(self) -> Optional[Tuple[ResourceClass, str]]:
+        return (ResourceClass.VMS, str(self._vm.id))
 
-    async def stop(self, force: bool = False) -> None:
-        """Starts a Virtual Machine"""
+    async def start(self, overcommit: bool = False, refresh: bool = True) -> None:
+        """Starts a Virtual Machine, then refreshes it unless `refresh` is False."""
+        assert self.available
+        try:
+            await self.machine.invoke_method(
+                "vm.start", [self._vm.id, {"overcommit": overcommit}]
+            )
+        finally:
+            if refresh:
+                await self._async_refresh_vm()
+
+    async def stop(self, force: bool = False, refresh: bool = True) -> None:
+        """Stops a Virtual Machine, then refreshes it unless `refresh` is False."""
         assert self.available
-        await self._vm.stop(force=force)
+        await self._async_run_job(
+            "vm.stop", [self._vm.id, {"force_after_timeout": force}], refresh
+        )
 
-    async def restart(self) -> None:
-        """Starts a Virtual Machine"""
+    async def restart(self, refresh: bool = True) -> None:
+        """Restarts a Virtual Machine, then refreshes it unless `refresh` is False."""
         assert self.available
-        await self._vm.restart()
+        await self._async_run_job("vm.restart", [self._vm.id], refresh)
+
+    async def _async_run_job(
+        self, method: str, params: List[Any], refresh: bool
+    ) -> None:
+        try:
+            job_id = await self.machine.invoke_method(method, params)
+            await async_wait_for_job(self.machine, job_id)
+        finally:
+            if refresh:
+                await self._async_refresh_vm()
+
+    async def _async_refresh_vm(self) -> None:
+        # Only this virtual machine is queried again, rather than every one.  A
+        # failure is left to the next refresh, rather than hiding how the
+        # action went.
+        try:
+            await async_refresh_vm(self.hass, self._hub_id, self.machine, self._vm.id)
+        except Exception as exc:
+            _LOGGER.warning(
+                "Unable to refresh virtual machine %s: %s", self._vm.name, exc
+            )
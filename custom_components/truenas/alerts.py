@@ -0,0 +1,97 @@
+"""The alerts raised on a TrueNAS host, and how they change between refreshes."""
+from typing import Any, Dict, List, Mapping, NamedTuple
+
+# Levels of alerts, from the least to the most severe.
+ALERT_LEVELS = (
+    "INFO",
+    "NOTICE",
+    "WARNING",
+    "ERROR",
+    "CRITICAL",
+    "ALERT",
+    "EMERGENCY",
+)
+
+
+class Alert(NamedTuple):
+    """An alert raised on the host."""
+
+    uuid: str
+    level: str
+    klass: str
+    formatted: str
+
+    def as_event_data(self) -> Dict[str, Any]:
+        return {
+            "uuid": self.uuid,
+            "level": self.level,
+            "klass": self.klass,
+            "formatted": self.formatted,
+        }
+
+
+class AlertChanges(NamedTuple):
+    """The alerts raised and cleared since the previous refresh."""
+
+    raised: List[Alert]
+    cleared: List[Alert]
+
+
+class AlertIndex:
+    """The alerts active on a host, keyed by uuid.
+
+    Each refresh is compared with the previous one by uuid, which takes time
+    linear in the number of alerts, and the count of each level is adjusted by
+    the alerts that changed rather than counted again.  An alert that changes
+    level is counted again, but neither raised nor cleared.  Dismissed alerts
+    are left out, as if they were cleared.
+    """
+
+    def __init__(self) -> None:
+        self._alerts: Dict[str, Alert] = {}
+        self._counts: Dict[str, int] = {level: 0 for level in ALERT_LEVELS}
+
+    def update(self, alerts: List[Mapping[str, Any]]) -> AlertChanges:
+        """Replaces the active alerts, returning those raised and cleared."""
+        active = {
+            alert["uuid"]: _alert(alert)
+            for alert in alerts
+            if not alert.get("dismissed")
+        }
+        raised = []
+        for uuid, alert in active.items():
+            previous = self._alerts.get(uuid)
+            if previous is None:
+                raised.append(alert)
+            elif previous.level == alert.level:
+                continue
+            else:
+                self._counts[previous.level] -= 1
+            self._counts[alert.level] = self._counts.get(alert.level, 0) + 1
+        cleared = [alert for uuid, alert in self._alerts.items() if uuid not in active]
+        for alert in cleared:
+            self._counts[alert.level] -= 1
+        self._alerts = active
+        return AlertChanges(raised, cleared)
+
+    def count(self, level: str) -> int:
+        """The number of active alerts of a level."""
+        return self._counts.get(level, 0)
+
+    def __getitem__(self, uuid: str) -> Alert:
+        return self._alerts[uuid]
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._alerts
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+
+def _alert(alert: Mapping[str, Any]) -> Alert:
+    return Alert(
+        alert["uuid"],
+        alert.get("level") or "INFO",
+        alert.get("klass") or "",
+        alert.get("formatted") or "",
+    )
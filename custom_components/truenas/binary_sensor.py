@@ -1,22 +1,33 @@
-from typing import Callable, List, Optional
+from typing import Callable, Optional
 
-from aiotruenas_client import CachingMachine as Machine
+from aiotruenas_client.disk import Disk
 from aiotruenas_client.websockets.jail import CachingJail, JailStatus
 from aiotruenas_client.websockets.virtualmachine import (
     CachingVirtualMachine,
     VirtualMachineState,
 )
-from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+)
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_NAME
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import entity_platform
-from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import slugify
 
-from . import TrueNASBinarySensor, TrueNASJailEntity, TrueNASVirtualMachineEntity
+from . import (
+    TrueNASBinarySensor,
+    TrueNASDiskEntity,
+    TrueNASJailEntity,
+    TrueNASVirtualMachineEntity,
+)
 from .const import (
+    ATTR_DESCRIPTION,
+    ATTR_LBA_OF_FIRST_ERROR,
+    ATTR_PEER_DEVIATION,
+    ATTR_STATUS_DETAIL,
     DOMAIN,
     SCHEMA_SERVICE_JAIL_RESTART,
     SCHEMA_SERVICE_JAIL_START,
@@ -30,7 +41,11 @@ from .const import (
     SERVICE_VM_RESTART,
     SERVICE_VM_START,
     SERVICE_VM_STOP,
+    ResourceClass,
 )
+from .discovery import EntityIndex
+from .identity import identity
+from .smart import SmartResults
 
 
 async def async_setup_entry(
@@ -39,8 +54,39 @@ async def async_setup_entry(
     async_add_entities: Callable,
 ):
     """Set up the TrueNAS switches."""
-    entities = _create_entities(hass, entry)
-    async_add_entities(entities)
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    name = entry.data[CONF_NAME]
+    smart_results = hass.data[DOMAIN][entry.entry_id]["smart_results"]
+
+    EntityIndex(
+        hass,
+        entry,
+        async_add_entities,
+        {
+            ResourceClass.DISKS: lambda disk: [
+                DiskRunningHotBinarySensor(
+                    entry, name, disk, coordinators[ResourceClass.DISK_TEMPERATURES]
+                ),
+                DiskFailingBinarySensor(
+                    entry,
+                    name,
+                    disk,
+                    coordinators[ResourceClass.DISK_HEALTH],
+                    smart_results,
+                ),
+            ],
+            ResourceClass.JAILS: lambda jail: [
+                JailIsRunningBinarySensor(
+                    entry, name, jail, coordinators[ResourceClass.JAILS]
+                ),
+            ],
+            ResourceClass.VMS: lambda vm: [
+                VirturalMachineIsRunningBinarySensor(
+                    entry, name, vm, coordinators[ResourceClass.VMS]
+                ),
+            ],
+        },
+    ).async_setup()
 
     platform = entity_platform.current_platform.get()
     assert platform != None
@@ -76,32 +122,11 @@ async def async_setup_entry(
     )
 
 
-def _get_machine(hass: HomeAssistant, entry: ConfigEntry) -> Machine:
-    machine = hass.data[DOMAIN][entry.entry_id]["machine"]
-    assert machine is not None
-    return machine
-
-
-def _create_entities(hass: HomeAssistant, entry: ConfigEntry) -> List[Entity]:
-    entities = []
-
-    machine = _get_machine(hass, entry)
-    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
-    name = entry.data[CONF_NAME]
-
-    for jail in machine.jails:
-        entities.append(JailIsRunningBinarySensor(entry, name, jail, coordinator))
-    for vm in machine.vms:
-        entities.append(
-            VirturalMachineIsRunningBinarySensor(entry, name, vm, coordinator)
-        )
-
-    return entities
-
-
 class JailIsRunningBinarySensor(
     TrueNASJailEntity, TrueNASBinarySensor, BinarySensorEntity
 ):
+    __slots__ = ("_jail",)
+
     def __init__(
         self,
         entry: ConfigEntry,
@@ -112,15 +137,15 @@ class JailIsRunningBinarySensor(
         self._jail = jail
         super().__init__(entry, name, coordinator)
 
-    @property
+    @identity
     def name(self) -> str:
         """Return the name of the jail."""
         return f"{self._jail.name} Jail Running"
 
-    @property
+    @identity
     def unique_id(self) -> str:
         return slugify(
-            f"{self._entry.unique_id}-{self._jail.name}_binary_sensor",
+            f"{self._entry.entry_id}-{self._jail.name}_binary_sensor",
         )
 
     @property
@@ -138,6 +163,8 @@ class JailIsRunningBinarySensor(
 class VirturalMachineIsRunningBinarySensor(
     TrueNASVirtualMachineEntity, TrueNASBinarySensor, BinarySensorEntity
 ):
+    __slots__ = ("_vm",)
+
     def __init__(
         self,
         entry: ConfigEntry,
@@ -148,15 +175,15 @@ class VirturalMachineIsRunningBinarySensor(
         self._vm = virtural_machine
         super().__init__(entry, name, coordinator)
 
-    @property
+    @identity
     def name(self) -> str:
         """Return the name of the virtural machine."""
         return f"{self._vm.name} Virtural Machine Running"
 
-    @property
+    @identity
     def unique_id(self) -> str:
         return slugify(
-            f"{self._entry.unique_id}-{self._vm.id}_binary_sensor",
+            f"{self._entry.entry_id}-{self._vm.id}_binary_sensor",
         )
 
     @property
@@ -169,3 +196,109 @@ class VirturalMachineIsRunningBinarySensor(
         if self._vm.available:
             return self._vm.status == VirtualMachineState.RUNNING
         return None
+
+
+class DiskRunningHotBinarySensor(
+    TrueNASDiskEntity, TrueNASBinarySensor, BinarySensorEntity
+):
+    """Whether a disk runs hotter than the other disks of the host."""
+
+    __slots__ = ("_disk",)
+
+    _disk: Disk
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        disk: Disk,
+        coordinator: DataUpdateCoordinator,
+    ) -> None:
+        self._disk = disk
+        super().__init__(entry, name, coordinator)
+
+    @identity
+    def name(self) -> str:
+        return f"Disk {self._disk.serial} Running Hot"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._disk.serial}_running_hot")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:thermometer-alert"
+
+    @property
+    def device_class(self) -> str:
+        return BinarySensorDeviceClass.HEAT
+
+    @property
+    def extra_state_attributes(self):
+        if self._coordinator.data is None:
+            return None
+        stats = self._coordinator.data.history.stats(self._disk.name)
+        return {
+            ATTR_PEER_DEVIATION: None if stats is None else stats.peer_deviation,
+        }
+
+    def _get_state(self) -> Optional[bool]:
+        if not self.available or self._coordinator.data is None:
+            return None
+        stats = self._coordinator.data.history.stats(self._disk.name)
+        return None if stats is None else stats.hot
+
+
+class DiskFailingBinarySensor(
+    TrueNASDiskEntity, TrueNASBinarySensor, BinarySensorEntity
+):
+    """Whether the latest SMART self-test of a disk found it failing."""
+
+    __slots__ = ("_disk", "_smart_results")
+
+    _disk: Disk
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        disk: Disk,
+        coordinator: DataUpdateCoordinator,
+        smart_results: SmartResults,
+    ) -> None:
+        self._disk = disk
+        self._smart_results = smart_results
+        super().__init__(entry, name, coordinator)
+
+    @identity
+    def name(self) -> str:
+        return f"Disk {self._disk.serial} Failing"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._disk.serial}_failing")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:harddisk-remove"
+
+    @property
+    def device_class(self) -> str:
+        return BinarySensorDeviceClass.PROBLEM
+
+    @property
+    def extra_state_attributes(self):
+        test = self._smart_results.latest(self._disk.serial)
+        if test is None:
+            return None
+        return {
+            ATTR_DESCRIPTION: test.description,
+            ATTR_STATUS_DETAIL: test.status_verbose,
+            ATTR_LBA_OF_FIRST_ERROR: test.lba_of_first_error,
+        }
+
+    def _get_state(self) -> Optional[bool]:
+        if not self.available:
+            return None
+        test = self._smart_results.latest(self._disk.serial)
+        return None if test is None else test.failing
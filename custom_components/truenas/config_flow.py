@@ -3,7 +3,6 @@ import logging
 from typing import Any, Dict, Mapping, Optional
 
 import voluptuous as vol
-from aiotruenas_client import CachingMachine as Machine
 from homeassistant import config_entries, core, exceptions
 from homeassistant.const import (
     CONF_API_KEY,
@@ -14,13 +13,24 @@ from homeassistant.const import (
 )
 from websockets.exceptions import InvalidURI, SecurityError
 
+from .connection import (
+    async_close,
+    async_connect,
+    async_get_session_cache,
+    create_machine,
+)
 from .const import (  # pylint:disable=unused-import
     CONF_AUTH_API_KEY,
     CONF_AUTH_MODE,
     CONF_AUTH_PASSWORD,
+    CONF_PUSH_UPDATES,
+    CONF_SKIP_STANDBY_DISKS,
     DEFAULT_NAME,
     DOMAIN,
+    MIN_SCAN_INTERVAL_SECONDS,
+    SCAN_INTERVAL_OPTIONS,
 )
+from .coordinator import get_scan_interval
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -51,20 +61,24 @@ async def validate_input(hass: core.HomeAssistant, data: Dict[str, Any]) -> Dict
 
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
+    # The machine is built the way the entry builds its own, since the entry
+    # set up from this flow adopts the session instead of opening another.
+    machine = create_machine()
     try:
-        machine = await Machine.create(
-            host=data[CONF_HOST],
-            password=data[CONF_PASSWORD],
-            username=data[CONF_USERNAME],
-            api_key=data[CONF_API_KEY],
-        )
+        await async_connect(machine, data)
     except SecurityError as exc:
+        await async_close(machine)
         raise InvalidAuth from exc
     except InvalidURI as exc:
+        await async_close(machine)
         raise CannotConnect from exc
 
-    info = await machine.get_system_info()
-    await machine.close()
+    try:
+        info = await machine.get_system_info()
+    except Exception:
+        await async_close(machine)
+        raise
+    async_get_session_cache(hass).async_put(data, machine)
     return {
         "hostname": info["hostname"],
     }
@@ -73,10 +87,19 @@ async def validate_input(hass: core.HomeAssistant, data: Dict[str, Any]) -> Dict
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for FreeNAS."""
 
-    VERSION = 2
+    VERSION = 3
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
 
     _user_data: Dict[str, Any] = {}
+    _reauth_entry: Optional[config_entries.ConfigEntry] = None
+
+    @staticmethod
+    @core.callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
 
     async def async_step_user(self, user_input: Optional[Mapping[str, Any]] = None):
         """Handle the initial step."""
@@ -140,6 +163,86 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="auth_api_key", data_schema=DATA_SCHEMA_API_KEY, errors=errors
         )
 
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]):
+        """Handle credentials that are no longer accepted by the host."""
+        self._reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        self._user_data = dict(entry_data)
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(
+        self, user_input: Optional[Mapping[str, Any]] = None
+    ):
+        assert self._reauth_entry is not None
+        errors = {}
+        if user_input is not None:
+            self._user_data.update(user_input)
+            try:
+                await validate_input(self.hass, self._user_data)
+                self.hass.config_entries.async_update_entry(
+                    self._reauth_entry, data=self._user_data
+                )
+                # A loaded entry is reloaded by its update listener instead.
+                if (
+                    self._reauth_entry.state
+                    is not config_entries.ConfigEntryState.LOADED
+                ):
+                    await self.hass.config_entries.async_reload(
+                        self._reauth_entry.entry_id
+                    )
+                return self.async_abort(reason="reauth_successful")
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected exception")
+                errors["base"] = "unknown"
+
+        if self._user_data[CONF_AUTH_MODE] == CONF_AUTH_API_KEY:
+            data_schema = DATA_SCHEMA_API_KEY
+        else:
+            data_schema = DATA_SCHEMA_PASSWORD
+        return self.async_show_form(
+            step_id="reauth_confirm", data_schema=data_schema, errors=errors
+        )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the refresh intervals of a TrueNAS entry."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input: Optional[Mapping[str, Any]] = None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    option,
+                    default=get_scan_interval(self._config_entry, resource_class),
+                ): vol.All(vol.Coerce(int), vol.Range(min=MIN_SCAN_INTERVAL_SECONDS))
+                for resource_class, (option, _) in SCAN_INTERVAL_OPTIONS.items()
+            }
+        ).extend(
+            {
+                vol.Required(
+                    CONF_PUSH_UPDATES,
+                    default=self._config_entry.options.get(CONF_PUSH_UPDATES, False),
+                ): bool,
+                vol.Required(
+                    CONF_SKIP_STANDBY_DISKS,
+                    default=self._config_entry.options.get(
+                        CONF_SKIP_STANDBY_DISKS, False
+                    ),
+                ): bool,
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=data_schema)
+
 
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
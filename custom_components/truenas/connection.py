@@ -0,0 +1,355 @@
+"""Connection handling for the TrueNAS machine."""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+import async_timeout
+from aiotruenas_client import CachingMachine as Machine
+from aiotruenas_client.websockets.dataset import CachingDatasetStateFetcher
+from aiotruenas_client.websockets.disk import CachingDiskStateFetcher
+from aiotruenas_client.websockets.jail import CachingJailStateFetcher
+from aiotruenas_client.websockets.pool import CachingPoolStateFetcher
+from aiotruenas_client.websockets.virtualmachine import (
+    CachingVirtualMachineStateFetcher,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    CONF_API_KEY,
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    EVENT_HOMEASSISTANT_STOP,
+)
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+from websockets.exceptions import SecurityError, WebSocketException
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds between keepalive calls, and how long to wait for their reply.
+KEEPALIVE_INTERVAL = 30
+KEEPALIVE_TIMEOUT = 10
+# Bounds, in seconds, of the exponential backoff between reconnect attempts.
+BACKOFF_BASE = 1
+BACKOFF_MAX = 300
+# Seconds an authenticated session is kept for an entry to adopt it.
+SESSION_TTL = 30
+# The fields the client selects for pools, along with their capacity.
+POOL_FIELDS = [
+    "allocated",
+    "encrypt",
+    "encryptkey",
+    "fragmentation",
+    "free",
+    "guid",
+    "id",
+    "is_decrypted",
+    "name",
+    "size",
+    "status",
+    "topology",
+]
+
+
+class PoolStateFetcher(CachingPoolStateFetcher):
+    """Selects the capacity of pools along with the fields the client reads."""
+
+    async def _fetch_pools(self) -> Dict[str, Dict[str, Any]]:
+        pools = await self._parent.invoke_method(
+            "pool.query", [[], {"select": POOL_FIELDS}]
+        )
+        return {pool["guid"]: pool for pool in pools}
+
+
+def create_machine() -> Machine:
+    """Creates a machine that is not connected yet.
+
+    Unlike `Machine.create`, the caches of the machine exist before it connects,
+    so they can be filled from the last known state while the host is reached.
+    """
+    machine = Machine()
+    machine._dataset_fetcher = CachingDatasetStateFetcher(machine=machine)
+    machine._disk_fetcher = CachingDiskStateFetcher(machine=machine)
+    machine._jail_fetcher = CachingJailStateFetcher(machine=machine)
+    machine._pool_fetcher = PoolStateFetcher(machine=machine)
+    machine._vm_fetcher = CachingVirtualMachineStateFetcher(machine=machine)
+    return machine
+
+
+async def async_connect(machine: Machine, data: Mapping[str, Any]) -> None:
+    """Connects and authenticates a machine made by `create_machine`."""
+    await machine.connect(
+        host=data[CONF_HOST],
+        api_key=data[CONF_API_KEY],
+        password=data[CONF_PASSWORD],
+        username=data[CONF_USERNAME],
+        secure=True,
+    )
+
+
+async def async_close(machine: Machine) -> None:
+    """Closes the connection of a machine, if it was ever opened."""
+    if machine._client is None:
+        return
+    if machine.closed:
+        # Nothing can be unsubscribed over a dropped connection, so subscribers
+        # are only told to stop.
+        subscribers = list(machine._subscribers)
+        machine._subscribers.clear()
+        for subscriber in subscribers:
+            with suppress(Exception):
+                await subscriber.unsubscribe()
+    client = machine._client
+    await machine.close()
+    # Calls still waiting for a reply would otherwise wait forever.  They are
+    # only cancelled once nothing is read any more, since the client stops
+    # reading altogether when a reply arrives for a cancelled call.
+    for future in client._invoke_method_futures.values():
+        future.cancel()
+    client._invoke_method_futures.clear()
+
+
+def session_key(data: Mapping[str, Any]) -> str:
+    """The key of the sessions authenticated with the host and credentials."""
+    credentials = [
+        data[CONF_HOST],
+        data.get(CONF_USERNAME),
+        data.get(CONF_PASSWORD),
+        data.get(CONF_API_KEY),
+    ]
+    # Only a digest is kept, so the cache does not hold on to the credentials.
+    return hashlib.sha256(json.dumps(credentials).encode()).hexdigest()
+
+
+class SessionCache:
+    """Authenticated machines handed over to the entry that will use them.
+
+    Validating a config flow, or unloading an entry to reload it, leaves an
+    open session behind that entry setup can adopt instead of connecting and
+    authenticating all over again.  Sessions that are not adopted in time are
+    closed.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._sessions: Dict[str, Tuple[Machine, CALLBACK_TYPE]] = {}
+
+    @callback
+    def async_put(self, data: Mapping[str, Any], machine: Machine) -> None:
+        """Keeps a session for the host and credentials in `data`."""
+        key = session_key(data)
+        self._async_evict(key)
+
+        @callback
+        def _async_expire(now: datetime) -> None:
+            _LOGGER.debug("closing session to %s that was not adopted", data[CONF_HOST])
+            self._async_evict(key)
+
+        self._sessions[key] = (
+            machine,
+            async_call_later(self._hass, SESSION_TTL, _async_expire),
+        )
+
+    @callback
+    def async_pop(self, data: Mapping[str, Any]) -> Optional[Machine]:
+        """Takes the session for the host and credentials in `data`, if any."""
+        session = self._sessions.pop(session_key(data), None)
+        if session is None:
+            return None
+        machine, cancel_expiry = session
+        cancel_expiry()
+        if machine.closed:
+            self._hass.async_create_task(async_close(machine))
+            return None
+        return machine
+
+    @callback
+    def async_clear(self, event: Optional[Event] = None) -> None:
+        """Closes every session that was not adopted."""
+        for key in list(self._sessions):
+            self._async_evict(key)
+
+    @callback
+    def _async_evict(self, key: str) -> None:
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            machine, cancel_expiry = session
+            cancel_expiry()
+            self._hass.async_create_task(async_close(machine))
+
+
+@callback
+def async_get_session_cache(hass: HomeAssistant) -> SessionCache:
+    """Returns the session cache shared by all the entries and flows."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "sessions" not in domain_data:
+        domain_data["sessions"] = SessionCache(hass)
+        hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, domain_data["sessions"].async_clear
+        )
+    return domain_data["sessions"]
+
+
+def signal_connection_changed(hub_id: str) -> str:
+    """Dispatcher signal sent when the connection to the machine goes up or down."""
+    return f"{DOMAIN}_{hub_id}_connection_changed"
+
+
+class ConnectionSupervisor:
+    """Keeps a machine connected for as long as a config entry for it is loaded.
+
+    The connection is checked with a keepalive call, which also catches
+    half-open sockets, and is reopened with a jittered exponential backoff
+    whenever it drops.  The machine, and so its caches and the entities reading
+    them, are reused across reconnects.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub_id: str,
+        entry: ConfigEntry,
+        machine: Machine,
+        on_connected: Callable[[], Awaitable[None]],
+    ) -> None:
+        self._hass = hass
+        self._hub_id = hub_id
+        # The entry whose credentials are used to connect.
+        self.entry = entry
+        self._machine = machine
+        self._on_connected = on_connected
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._disconnected_since: Optional[datetime] = None
+        self._disconnected_time = timedelta()
+        self.reconnect_count = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    @property
+    def disconnected_time(self) -> timedelta:
+        """The total time spent disconnected after first connecting."""
+        if self._disconnected_since is None:
+            return self._disconnected_time
+        return self._disconnected_time + (dt_util.utcnow() - self._disconnected_since)
+
+    @callback
+    def async_start(self) -> None:
+        """Starts supervising the connection in the background."""
+        self._task = self._hass.async_create_background_task(
+            self._async_run(), f"{DOMAIN} {self._hub_id} connection"
+        )
+
+    async def async_stop(self) -> None:
+        """Stops supervising, so the connection can be closed for good."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def async_wait_connected(self) -> None:
+        """Waits until the machine is connected and has been refreshed."""
+        await self._connected.wait()
+
+    async def _async_run(self) -> None:
+        await self._async_reconnect()
+        while True:
+            try:
+                while True:
+                    await asyncio.sleep(KEEPALIVE_INTERVAL)
+                    if not await self._async_keepalive():
+                        break
+                _LOGGER.warning("Lost connection to TrueNAS machine")
+            except Exception:
+                _LOGGER.exception("Unexpected error keeping TrueNAS machine connected")
+            self._async_set_disconnected()
+            await async_close(self._machine)
+            await self._async_reconnect()
+            self.reconnect_count += 1
+            async_dispatcher_send(self._hass, signal_connection_changed(self._hub_id))
+
+    async def _async_keepalive(self) -> bool:
+        if self._machine.closed:
+            return False
+        ping = asyncio.ensure_future(self._machine.invoke_method("core.ping"))
+        ping.add_done_callback(_consume_exception)
+        try:
+            async with async_timeout.timeout(KEEPALIVE_TIMEOUT):
+                # A late reply to a cancelled call stops the client from reading
+                # any further replies, so the call itself is never cancelled.
+                await asyncio.shield(ping)
+        except Exception as exc:
+            _LOGGER.debug("Keepalive failed: %r", exc)
+            return False
+        return True
+
+    async def _async_reconnect(self) -> None:
+        """Connects, unless the machine still is, and refreshes the machine.
+
+        Any error, whether connecting or refreshing, closes the connection and
+        is retried, so the supervisor never stops for as long as it runs.
+        """
+        attempt = 0
+        reauth_started = False
+        while True:
+            try:
+                if self._machine.closed:
+                    await async_connect(self._machine, self.entry.data)
+                    _LOGGER.info("Connected to TrueNAS machine")
+                await self._on_connected()
+                break
+            except Exception as exc:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+                delay = random.uniform(delay / 2, delay)
+                if isinstance(exc, (OSError, asyncio.TimeoutError, WebSocketException)):
+                    _LOGGER.error(
+                        "Unable to connect to TrueNAS machine, retrying in %.0fs: %s",
+                        delay,
+                        exc,
+                    )
+                else:
+                    _LOGGER.exception(
+                        "Unexpected error connecting to TrueNAS machine, "
+                        "retrying in %.0fs",
+                        delay,
+                    )
+                if isinstance(exc, SecurityError) and not reauth_started:
+                    # Retrying keeps going, in case the host rejected the
+                    # credentials for another reason, until they are replaced.
+                    reauth_started = True
+                    self.entry.async_start_reauth(self._hass)
+                await async_close(self._machine)
+                attempt += 1
+                await asyncio.sleep(delay)
+        self._async_set_connected()
+
+    @callback
+    def _async_set_connected(self) -> None:
+        if self._disconnected_since is not None:
+            self._disconnected_time += dt_util.utcnow() - self._disconnected_since
+            self._disconnected_since = None
+        self._connected.set()
+        async_dispatcher_send(self._hass, signal_connection_changed(self._hub_id))
+
+    @callback
+    def _async_set_disconnected(self) -> None:
+        self._disconnected_since = dt_util.utcnow()
+        self._connected.clear()
+        async_dispatcher_send(self._hass, signal_connection_changed(self._hub_id))
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
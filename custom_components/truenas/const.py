@@ -1,43 +1,176 @@
 """Constants for the FreeNAS integration."""
+from enum import Enum, unique
+
 import voluptuous as vol
 from homeassistant.helpers import config_validation as cv
 
 DOMAIN = "truenas"
 
+ATTR_COALESCED_REQUESTS = "Coalesced Requests"
+ATTR_CONNECTED = "Connected"
+ATTR_AVERAGE = "Average"
+ATTR_DESCRIPTION = "Description"
 ATTR_ENCRYPT = "Encrypted"
+ATTR_FAILURES = "Failures"
+ATTR_LAST_UPDATE_SUCCESS = "Last Update Succeeded"
+ATTR_LBA_OF_FIRST_ERROR = "LBA of First Error"
+ATTR_LIFETIME = "Lifetime Hours"
+ATTR_LINK_STATE = "Link State"
+ATTR_MAXIMUM = "Maximum"
+ATTR_MINIMUM = "Minimum"
+ATTR_P95 = "95th Percentile"
+ATTR_PEER_DEVIATION = "Peer Deviation"
 ATTR_POOL_GUID = "GUID"
 ATTR_POOL_IS_DECRYPTED = "Is Decrypted"
 ATTR_POOL_NAME = "Pool Name"
+ATTR_STALE = "Stale"
+ATTR_STATUS_DETAIL = "Status Detail"
+ATTR_SUCCESSES = "Successes"
+ATTR_WRITE_TIME = "State Write Time"
 
+CONF_ALERT_SCAN_INTERVAL = "alert_scan_interval"
 CONF_AUTH_MODE = "auth_mode"
 CONF_AUTH_PASSWORD = "Username + Password"
 CONF_AUTH_API_KEY = "API Key"
 
+CONF_DISK_HEALTH_SCAN_INTERVAL = "disk_health_scan_interval"
+CONF_DISK_IO_SCAN_INTERVAL = "disk_io_scan_interval"
+CONF_DISK_SCAN_INTERVAL = "disk_scan_interval"
+CONF_DISK_TEMPERATURE_SCAN_INTERVAL = "disk_temperature_scan_interval"
+CONF_HOST_SCAN_INTERVAL = "host_scan_interval"
+CONF_INTERFACE_SCAN_INTERVAL = "interface_scan_interval"
+CONF_JAIL_SCAN_INTERVAL = "jail_scan_interval"
+CONF_POOL_SCAN_INTERVAL = "pool_scan_interval"
+CONF_PUSH_UPDATES = "push_updates"
+CONF_SKIP_STANDBY_DISKS = "skip_standby_disks"
+CONF_VM_SCAN_INTERVAL = "vm_scan_interval"
+
 DEFAULT_NAME: str = "TrueNAS"
+DEFAULT_ALERT_SCAN_INTERVAL_SECONDS = 60
 DEFAULT_SCAN_INTERVAL_SECONDS = 30
+DEFAULT_DISK_HEALTH_SCAN_INTERVAL_SECONDS = 3600
+DEFAULT_DISK_IO_SCAN_INTERVAL_SECONDS = 60
+DEFAULT_DISK_TEMPERATURE_SCAN_INTERVAL_SECONDS = 300
+DEFAULT_HOST_SCAN_INTERVAL_SECONDS = 60
+DEFAULT_RECONCILE_INTERVAL_SECONDS = 600
+MIN_SCAN_INTERVAL_SECONDS = 5
+
+
+@unique
+class ResourceClass(Enum):
+    """A class of resources on the TrueNAS host that is refreshed together."""
+
+    ALERTS = "alerts"
+    DISKS = "disks"
+    DISK_HEALTH = "disk_health"
+    DISK_IO = "disk_io"
+    DISK_TEMPERATURES = "disk_temperatures"
+    HOST = "host"
+    INTERFACES = "interfaces"
+    JAILS = "jails"
+    POOLS = "pools"
+    VMS = "vms"
+
+
+# Option holding the refresh interval of each resource class, and its default.
+SCAN_INTERVAL_OPTIONS = {
+    ResourceClass.ALERTS: (
+        CONF_ALERT_SCAN_INTERVAL,
+        DEFAULT_ALERT_SCAN_INTERVAL_SECONDS,
+    ),
+    ResourceClass.DISKS: (CONF_DISK_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS),
+    ResourceClass.DISK_HEALTH: (
+        CONF_DISK_HEALTH_SCAN_INTERVAL,
+        DEFAULT_DISK_HEALTH_SCAN_INTERVAL_SECONDS,
+    ),
+    ResourceClass.DISK_IO: (
+        CONF_DISK_IO_SCAN_INTERVAL,
+        DEFAULT_DISK_IO_SCAN_INTERVAL_SECONDS,
+    ),
+    ResourceClass.DISK_TEMPERATURES: (
+        CONF_DISK_TEMPERATURE_SCAN_INTERVAL,
+        DEFAULT_DISK_TEMPERATURE_SCAN_INTERVAL_SECONDS,
+    ),
+    ResourceClass.HOST: (CONF_HOST_SCAN_INTERVAL, DEFAULT_HOST_SCAN_INTERVAL_SECONDS),
+    ResourceClass.INTERFACES: (
+        CONF_INTERFACE_SCAN_INTERVAL,
+        DEFAULT_SCAN_INTERVAL_SECONDS,
+    ),
+    ResourceClass.JAILS: (CONF_JAIL_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS),
+    ResourceClass.POOLS: (CONF_POOL_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS),
+    ResourceClass.VMS: (CONF_VM_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL_SECONDS),
+}
+
+# Resource classes kept up to date from middleware events when push updates are
+# enabled.  Polling them is then only needed to reconcile missed events.
+PUSH_RESOURCE_CLASSES = (
+    ResourceClass.DISKS,
+    ResourceClass.JAILS,
+    ResourceClass.POOLS,
+    ResourceClass.VMS,
+)
 
 SERVICE_JAIL_START = "jail_start"
-SCHEMA_SERVICE_JAIL_START = vol.Schema({})
+SCHEMA_SERVICE_JAIL_START = cv.make_entity_service_schema({})
 SERVICE_JAIL_STOP = "jail_stop"
-SCHEMA_SERVICE_JAIL_STOP = vol.Schema(
+SCHEMA_SERVICE_JAIL_STOP = cv.make_entity_service_schema(
     {
         vol.Optional("force"): cv.boolean,
     }
 )
 SERVICE_JAIL_RESTART = "jail_restart"
-SCHEMA_SERVICE_JAIL_RESTART = vol.Schema({})
+SCHEMA_SERVICE_JAIL_RESTART = cv.make_entity_service_schema({})
 
 SERVICE_VM_START = "vm_start"
-SCHEMA_SERVICE_VM_START = vol.Schema(
+SCHEMA_SERVICE_VM_START = cv.make_entity_service_schema(
     {
         vol.Optional("overcommit"): cv.boolean,
     }
 )
 SERVICE_VM_STOP = "vm_stop"
-SCHEMA_SERVICE_VM_STOP = vol.Schema(
+SCHEMA_SERVICE_VM_STOP = cv.make_entity_service_schema(
     {
         vol.Optional("force"): cv.boolean,
     }
 )
 SERVICE_VM_RESTART = "vm_restart"
-SCHEMA_SERVICE_VM_RESTART = vol.Schema({})
+SCHEMA_SERVICE_VM_RESTART = cv.make_entity_service_schema({})
+
+ACTION_RESTART = "restart"
+ACTION_START = "start"
+ACTION_STOP = "stop"
+DEFAULT_MAX_CONCURRENT_ACTIONS = 4
+EVENT_BULK_COMPLETED = f"{DOMAIN}_bulk_completed"
+SCHEMA_SERVICE_BULK = {
+    vol.Required("entity_id"): cv.entity_ids,
+    vol.Required("action"): vol.In([ACTION_START, ACTION_STOP, ACTION_RESTART]),
+    vol.Optional("force", default=False): cv.boolean,
+    vol.Optional("max_concurrent", default=DEFAULT_MAX_CONCURRENT_ACTIONS): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=32)
+    ),
+}
+
+SERVICE_JAIL_BULK = "jail_bulk"
+SCHEMA_SERVICE_JAIL_BULK = vol.Schema(SCHEMA_SERVICE_BULK)
+SERVICE_VM_BULK = "vm_bulk"
+SCHEMA_SERVICE_VM_BULK = vol.Schema(
+    {
+        **SCHEMA_SERVICE_BULK,
+        vol.Optional("overcommit", default=False): cv.boolean,
+    }
+)
+
+EVENT_ALERT_CLEARED = f"{DOMAIN}_alert_cleared"
+EVENT_ALERT_RAISED = f"{DOMAIN}_alert_raised"
+
+DEFAULT_PROFILE_CYCLES = 3
+EVENT_PROFILE_COMPLETED = f"{DOMAIN}_profile_completed"
+SERVICE_PROFILE = "profile"
+SCHEMA_SERVICE_PROFILE = vol.Schema(
+    {
+        vol.Required("entry_id"): cv.string,
+        vol.Optional("cycles", default=DEFAULT_PROFILE_CYCLES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=100)
+        ),
+    }
+)
@@ -0,0 +1,69 @@
+"""Acts on jails and virtual machines, reflecting the outcome right away."""
+import asyncio
+from typing import Any, Dict, List
+
+from aiotruenas_client import CachingMachine as Machine
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import ResourceClass
+from .events import async_apply_update
+
+# Seconds between polls of a pending job, and how long to poll it for.
+JOB_POLL_INTERVAL = 0.25
+JOB_TIMEOUT = 120
+
+JOB_FAILED = "FAILED"
+JOB_SUCCESS = "SUCCESS"
+
+# The fields of each resource the client reads, as selected by its fetchers.
+JAIL_FIELDS = ["id", "state"]
+VM_FIELDS = ["id", "name", "description", "status"]
+
+
+async def async_wait_for_job(machine: Machine, job_id: int) -> Any:
+    """Polls a middleware job until it succeeds or fails, returning its result.
+
+    Unlike `Machine.wait_for_job`, this does not miss a job that completed
+    before it was waited for.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + JOB_TIMEOUT
+    while True:
+        jobs = await machine.invoke_method("core.get_jobs", [[["id", "=", job_id]]])
+        if jobs and jobs[0]["state"] in (JOB_FAILED, JOB_SUCCESS):
+            break
+        if loop.time() >= deadline:
+            raise HomeAssistantError(f"Timed out waiting for TrueNAS job {job_id}")
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+    if jobs[0]["state"] == JOB_FAILED:
+        raise HomeAssistantError(jobs[0].get("error") or f"TrueNAS job {job_id} failed")
+    return jobs[0].get("result")
+
+
+async def async_refresh_jail(
+    hass: HomeAssistant, hub_id: str, machine: Machine, name: str
+) -> None:
+    """Queries a single jail, updating only the entities of that jail."""
+    jails = await _async_query(machine, "jail.query", name, JAIL_FIELDS)
+    if jails:
+        async_apply_update(
+            hass, hub_id, ResourceClass.JAILS, machine._jail_fetcher, name, jails[0]
+        )
+
+
+async def async_refresh_vm(
+    hass: HomeAssistant, hub_id: str, machine: Machine, id: int
+) -> None:
+    """Queries a single virtual machine, updating only the entities of that VM."""
+    vms = await _async_query(machine, "vm.query", id, VM_FIELDS)
+    if vms:
+        async_apply_update(
+            hass, hub_id, ResourceClass.VMS, machine._vm_fetcher, str(id), vms[0]
+        )
+
+
+async def _async_query(
+    machine: Machine, method: str, id: Any, fields: List[str]
+) -> List[Dict[str, Any]]:
+    return await machine.invoke_method(method, [[["id", "=", id]], {"select": fields}])
@@ -0,0 +1,528 @@
+"""Refresh coordinators for the resources on a TrueNAS host."""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+import async_timeout
+import numpy as np
+from aiotruenas_client.pool import Pool
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_SCAN_INTERVAL
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_PUSH_UPDATES,
+    CONF_SKIP_STANDBY_DISKS,
+    DEFAULT_RECONCILE_INTERVAL_SECONDS,
+    PUSH_RESOURCE_CLASSES,
+    SCAN_INTERVAL_OPTIONS,
+    ResourceClass,
+)
+from .hub import TrueNASHub
+from .instrumentation import RefreshStats
+from .rates import CounterRates
+from .reporting import (
+    NO_READING,
+    REPORTING_WINDOW,
+    Reading,
+    Summary,
+    graph_series,
+    graph_values,
+    reduce_graphs,
+    summarize,
+)
+from .scheduler import RefreshScheduler, async_get_scheduler
+from .smart import SmartResults
+from .thermal import TemperatureHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+TIMEOUT = 10
+# Seconds refresh requests are collected for before they are served together.
+COALESCE_WINDOW = 0.5
+# Reading temperatures queries SMART on every disk, which can be much slower
+# than the other endpoints.
+TIMEOUTS = {
+    ResourceClass.DISK_HEALTH: 30,
+    ResourceClass.DISK_TEMPERATURES: 30,
+}
+
+# The fields of a pool that describe how much of it is used.
+CAPACITY_FIELDS = ("allocated", "fragmentation", "free", "size")
+
+# Resource classes that were refreshed at the single scan interval option,
+# before there was an interval per resource class.
+LEGACY_SCAN_INTERVAL_CLASSES = (
+    ResourceClass.DISKS,
+    ResourceClass.JAILS,
+    ResourceClass.POOLS,
+    ResourceClass.VMS,
+)
+
+# Reporting graphs of each disk, with the series of reads and writes in bytes
+# per second and the percentage of time the disk was busy.
+DISK_IO_GRAPH = "disk"
+DISK_BUSY_GRAPH = "diskgeombusy"
+# Columns of the byte counters of each network interface.
+INTERFACE_RECEIVED = 0
+INTERFACE_SENT = 1
+
+# Reporting graphs of the host itself.
+HOST_GRAPHS = ["arcratio", "arcsize", "cpu", "load", "memory"]
+
+
+class DiskTemperatures(NamedTuple):
+    """The data of the disk temperatures resource class."""
+
+    # The last known temperature of each disk, keyed by disk name.
+    temperatures: Dict[str, Optional[int]]
+    # Disks that were in standby and not read, so their temperature is stale.
+    standby: FrozenSet[str]
+    # The temperatures read over the recent history.
+    history: TemperatureHistory
+
+
+class DiskIO(NamedTuple):
+    """The throughput and load of a disk, from its reporting graphs."""
+
+    read: Reading
+    write: Reading
+    busy: Reading
+
+
+class Pools(NamedTuple):
+    """The data of the pools resource class."""
+
+    # The pools found by the last refresh.
+    pools: List[Pool]
+    # The capacity fields reported for each pool, keyed by guid.
+    capacity: Dict[str, Dict[str, Any]]
+
+
+class HostStats(NamedTuple):
+    """The load of the host, each summarized over the reporting window."""
+
+    # Percentage of CPU time that was not idle.
+    cpu: Summary
+    # Load average over the last minute.
+    load: Summary
+    # Percentage of memory in use.
+    memory: Summary
+    # Size of the ZFS ARC, in bytes.
+    arc_size: Summary
+    # Percentage of ZFS ARC lookups that were hits.
+    arc_hit_ratio: Summary
+
+
+class TrueNASDataUpdateCoordinator(DataUpdateCoordinator):
+    """Refreshes a single class of resources on the TrueNAS host."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        resource_class: ResourceClass,
+        fetch: Callable[[], Awaitable[Any]],
+        update_interval: timedelta,
+        scheduler: RefreshScheduler,
+        schedule_key: str,
+    ) -> None:
+        self.resource_class = resource_class
+        self.last_success_time: Optional[datetime] = None
+        self._fetch = fetch
+        self._scheduler = scheduler
+        self._schedule_key = schedule_key
+        self._pending_fetch: Optional[asyncio.Future] = None
+        self._requested_refresh: Optional[asyncio.Future] = None
+        self._timeout = TIMEOUTS.get(resource_class, TIMEOUT)
+        # Refresh requests served by a refresh requested by someone else.
+        self.coalesced_requests = 0
+        self.stats = RefreshStats()
+        # Told how long each scheduled refresh took, while a profile runs.
+        self.profile_listeners: List[Callable[[float], None]] = []
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"TrueNAS {resource_class.value} status",
+            update_interval=update_interval,
+        )
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        """Schedule the next refresh at the phase given by the scheduler."""
+        if self.update_interval is None:
+            return
+        if self.config_entry and self.config_entry.pref_disable_polling:
+            return
+        if self._unsub_refresh:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+        self._unsub_refresh = async_track_point_in_utc_time(
+            self.hass,
+            self._job,
+            self._scheduler.next_refresh(
+                self._schedule_key, self.update_interval, dt_util.utcnow()
+            ),
+        )
+
+    async def _handle_refresh_interval(self, _now: datetime) -> None:
+        """Run a scheduled refresh, timing it while a profile runs."""
+        if not self.profile_listeners:
+            await super()._handle_refresh_interval(_now)
+            return
+        start = time.perf_counter()
+        await super()._handle_refresh_interval(_now)
+        elapsed = time.perf_counter() - start
+        for listener in list(self.profile_listeners):
+            listener(elapsed)
+
+    async def async_request_refresh(self) -> None:
+        """Request a refresh, shared with the requests made around the same time.
+
+        The first request opens a short window.  Every request made during the
+        window, or while the refresh it leads to runs, waits for that same
+        refresh instead of causing another one.
+        """
+        if self._requested_refresh is not None:
+            self.coalesced_requests += 1
+            await asyncio.shield(self._requested_refresh)
+            return
+        self._requested_refresh = requested = self.hass.loop.create_future()
+        try:
+            await asyncio.sleep(COALESCE_WINDOW)
+            await self.async_refresh()
+        finally:
+            self._requested_refresh = None
+            requested.set_result(None)
+
+    async def _async_update_data(self) -> Any:
+        """Fetch data for this resource class from the TrueNAS machine."""
+        async with self._scheduler.slot():
+            return await self.stats.async_measure(self._async_fetch)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the listeners, measuring how long writing their state takes."""
+        start = time.perf_counter()
+        super().async_update_listeners()
+        self.stats.write_time.observe(time.perf_counter() - start)
+
+    async def _async_fetch(self) -> Any:
+        _LOGGER.debug("refreshing %s", self.resource_class.value)
+        # The client stops reading replies if one arrives for a cancelled call,
+        # so a fetch that times out is left to finish and is picked up by the
+        # next refresh instead of being issued again.
+        if self._pending_fetch is None or self._pending_fetch.done():
+            self._pending_fetch = asyncio.ensure_future(self._fetch())
+            self._pending_fetch.add_done_callback(_consume_exception)
+        try:
+            async with async_timeout.timeout(self._timeout):
+                data = await asyncio.shield(self._pending_fetch)
+        except asyncio.TimeoutError as exc:
+            raise UpdateFailed(
+                f"Timed out fetching TrueNAS {self.resource_class.value}"
+            ) from exc
+        except Exception as exc:
+            raise UpdateFailed(
+                f"Error fetching TrueNAS {self.resource_class.value}"
+            ) from exc
+        self.last_success_time = dt_util.utcnow()
+        return data
+
+    async def async_shutdown(self) -> None:
+        """Forget any fetch still in flight.
+
+        It is not cancelled, since its reply may already be on the way: it
+        either completes, or is cancelled once the connection is closed.
+        """
+        self._pending_fetch = None
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Errors are reported by the refresh awaiting the fetch, if there is one.
+    if not future.cancelled():
+        future.exception()
+
+
+class NetworkInterface(NamedTuple):
+    """A network interface on the host, as of the last refresh."""
+
+    name: str
+    link_state: Optional[str]
+
+    @property
+    def available(self) -> bool:
+        """Interfaces are only listed while they exist."""
+        return True
+
+
+class NetworkInterfaces(NamedTuple):
+    """The data of the network interfaces resource class."""
+
+    # The interfaces found by the last refresh, keyed by name.
+    interfaces: Dict[str, NetworkInterface]
+    # Bytes received and sent per second by each interface.
+    rates: CounterRates
+
+
+def link_counters(interface: Dict[str, Any]) -> Optional[Sequence[int]]:
+    """The byte counters of an interface, from the statistics of its link."""
+    for alias in (interface.get("state") or {}).get("aliases") or []:
+        stats = alias.get("stats")
+        if alias.get("type") == "LINK" and stats:
+            return (stats["received_bytes"], stats["sent_bytes"])
+    return None
+
+
+def host_series(results: List[Dict[str, Any]]) -> Dict[str, Optional[np.ndarray]]:
+    """The series of each of the `HostStats`, derived from the host graphs."""
+    graphs = {result["name"]: result for result in results}
+
+    def series(graph: str, name: str) -> Optional[np.ndarray]:
+        return graph_series(graphs[graph], name) if graph in graphs else None
+
+    idle = series("cpu", "idle")
+    free = series("memory", "free")
+    memory = graph_values(graphs["memory"]) if "memory" in graphs else None
+    used: Optional[np.ndarray] = None
+    if free is not None and memory is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            used = 100 * (1 - free / np.nansum(memory, axis=1))
+    return {
+        "cpu": None if idle is None else 100 - idle,
+        "load": series("load", "shortterm"),
+        "memory": used,
+        "arc_size": series("arcsize", "arc"),
+        "arc_hit_ratio": series("arcratio", "arc"),
+    }
+
+
+def get_scan_interval(entry: ConfigEntry, resource_class: ResourceClass) -> int:
+    """Returns the configured refresh interval, in seconds, for a resource class."""
+    option, default = SCAN_INTERVAL_OPTIONS[resource_class]
+    if resource_class in LEGACY_SCAN_INTERVAL_CLASSES:
+        # Entries configured before intervals were split share a single option.
+        default = entry.options.get(CONF_SCAN_INTERVAL, default)
+    return entry.options.get(option, default)
+
+
+def get_refresh_interval(entry: ConfigEntry, resource_class: ResourceClass) -> int:
+    """Returns how often, in seconds, a resource class is actually polled."""
+    interval = get_scan_interval(entry, resource_class)
+    if entry.options.get(CONF_PUSH_UPDATES) and resource_class in PUSH_RESOURCE_CLASSES:
+        return max(interval, DEFAULT_RECONCILE_INTERVAL_SECONDS)
+    return interval
+
+
+def create_coordinators(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    hub: TrueNASHub,
+    smart_results: SmartResults,
+    last_temperatures: Dict[str, int],
+) -> Dict[ResourceClass, TrueNASDataUpdateCoordinator]:
+    """Creates the coordinators of an entry, one per resource class on the host.
+
+    `smart_results` holds the SMART results read so far, and
+    `last_temperatures` the last temperature read of each disk, keyed by
+    serial, both of which may have been restored from before a restart.
+    """
+    machine = hub.machine
+    scheduler = async_get_scheduler(hass)
+    skip_standby = entry.options.get(CONF_SKIP_STANDBY_DISKS, False)
+
+    async def read_temperatures(params: List[Any]) -> Dict[str, Optional[int]]:
+        # Other entries for the host may ask for the very same temperatures.
+        temperatures = await hub.async_fetch(
+            ("disk.temperatures", json.dumps(params)),
+            lambda: machine.invoke_method("disk.temperatures", params),
+        )
+        return dict(temperatures)
+
+    temperature_history = TemperatureHistory()
+
+    async def fetch_disk_temperatures() -> DiskTemperatures:
+        serials = {disk.name: disk.serial for disk in machine.disks if disk.available}
+        if len(serials) == 0:
+            return DiskTemperatures({}, frozenset(), temperature_history)
+        names = list(serials)
+        if not skip_standby:
+            temperatures = await read_temperatures([names])
+            temperature_history.add(temperatures)
+            _remember_temperatures(serials, temperatures)
+            return DiskTemperatures(temperatures, frozenset(), temperature_history)
+
+        # With the STANDBY power mode the middleware checks the power state of
+        # every disk in the same batch and does not wake disks that are spun
+        # down, returning no temperature for them instead.
+        temperatures = await read_temperatures([names, "STANDBY"])
+        # Only temperatures that were actually read make it into the history.
+        temperature_history.add(temperatures)
+        _remember_temperatures(serials, temperatures)
+        standby = frozenset(
+            name for name, temperature in temperatures.items() if temperature is None
+        )
+        for name in standby:
+            temperatures[name] = last_temperatures.get(serials[name])
+        return DiskTemperatures(temperatures, standby, temperature_history)
+
+    def _remember_temperatures(
+        serials: Dict[str, str], temperatures: Dict[str, Optional[int]]
+    ) -> None:
+        for name, temperature in temperatures.items():
+            if temperature is not None and name in serials:
+                last_temperatures[serials[name]] = temperature
+
+    async def read_smart_results(params: List[Any]) -> List[Dict[str, Any]]:
+        return await hub.async_fetch(
+            ("smart.test.results", json.dumps(params)),
+            lambda: machine.invoke_method("smart.test.results", params),
+        )
+
+    async def fetch_disk_health() -> SmartResults:
+        serials = {disk.name: disk.serial for disk in machine.disks if disk.available}
+        if len(serials) == 0:
+            return smart_results
+        # The middleware leaves out the tests of a disk from before its cursor,
+        # which differs per disk, so each disk read before is queried on its
+        # own.  Only the disks never read are queried for their whole log,
+        # together.
+        queries: List[List[Any]] = []
+        unread = []
+        for name, serial in sorted(serials.items()):
+            cursor = smart_results.cursor(serial)
+            if cursor is None:
+                unread.append(name)
+                continue
+            tests_filter = [["lifetime", ">=", cursor]]
+            queries.append(
+                [[["disk", "=", name]], {"extra": {"tests_filter": tests_filter}}]
+            )
+        if unread:
+            queries.append([[["disk", "in", unread]]])
+        replies = await asyncio.gather(
+            *[read_smart_results(params) for params in queries]
+        )
+        results = [result for reply in replies for result in reply]
+        changed = smart_results.update(serials, results)
+        _LOGGER.debug("read new SMART results of %d disk(s)", len(changed))
+        return smart_results
+
+    async def fetch_disk_io() -> Dict[str, DiskIO]:
+        names = [disk.name for disk in machine.disks if disk.available]
+        if len(names) == 0:
+            return {}
+        # A single query covers the graphs of every disk, however many there are.
+        graphs = [
+            {"name": graph, "identifier": name}
+            for name in names
+            for graph in (DISK_IO_GRAPH, DISK_BUSY_GRAPH)
+        ]
+        end = int(dt_util.utcnow().timestamp())
+        query = {"start": end - REPORTING_WINDOW, "end": end, "aggregate": False}
+        results = await hub.async_fetch(
+            ("reporting.get_data", json.dumps(graphs)),
+            lambda: machine.invoke_method("reporting.get_data", [graphs, query]),
+        )
+        readings = reduce_graphs(results)
+
+        def reading(graph: str, name: str, column: int) -> Reading:
+            series = readings.get((graph, name), [])
+            return series[column] if column < len(series) else NO_READING
+
+        return {
+            name: DiskIO(
+                reading(DISK_IO_GRAPH, name, 0),
+                reading(DISK_IO_GRAPH, name, 1),
+                reading(DISK_BUSY_GRAPH, name, 0),
+            )
+            for name in names
+        }
+
+    async def fetch_host() -> HostStats:
+        graphs = [{"name": graph, "identifier": None} for graph in HOST_GRAPHS]
+        end = int(dt_util.utcnow().timestamp())
+        query = {"start": end - REPORTING_WINDOW, "end": end, "aggregate": False}
+        results = await hub.async_fetch(
+            ("reporting.get_data", json.dumps(graphs)),
+            lambda: machine.invoke_method("reporting.get_data", [graphs, query]),
+        )
+        return HostStats(**summarize(host_series(results)))
+
+    interface_rates = CounterRates(2)
+
+    async def fetch_interfaces() -> NetworkInterfaces:
+        # Every interface is listed by a single query, with its counters.
+        results = await hub.async_fetch(
+            "interface.query", lambda: machine.invoke_method("interface.query", [])
+        )
+        # Other entries may have received the result a little while ago.
+        sampled_at = hub.fetched_at("interface.query") or hass.loop.time()
+        interfaces: Dict[str, NetworkInterface] = {}
+        counters: Dict[str, Sequence[int]] = {}
+        for result in results:
+            name = result["name"]
+            interfaces[name] = NetworkInterface(
+                name, (result.get("state") or {}).get("link_state")
+            )
+            link = link_counters(result)
+            if link is not None:
+                counters[name] = link
+        interface_rates.update(sampled_at, counters)
+        return NetworkInterfaces(interfaces, interface_rates)
+
+    async def fetch_pools() -> Pools:
+        # The capacity is selected along with the pools, but the client does not
+        # read it, so it is kept apart from them.
+        pools = await hub.async_fetch("pool.query", machine.get_pools)
+        fetcher = machine._pool_fetcher
+        capacity = {
+            pool.guid: {
+                field: fetcher.get_cached_state(pool).get(field)
+                for field in CAPACITY_FIELDS
+            }
+            for pool in pools
+            if pool.available
+        }
+        return Pools(pools, capacity)
+
+    fetchers: Dict[ResourceClass, Callable[[], Awaitable[Any]]] = {
+        ResourceClass.ALERTS: hub.async_fetch_alerts,
+        ResourceClass.DISKS: lambda: hub.async_fetch("disk.query", machine.get_disks),
+        ResourceClass.DISK_HEALTH: fetch_disk_health,
+        ResourceClass.DISK_IO: fetch_disk_io,
+        ResourceClass.DISK_TEMPERATURES: fetch_disk_temperatures,
+        ResourceClass.HOST: fetch_host,
+        ResourceClass.INTERFACES: fetch_interfaces,
+        ResourceClass.JAILS: lambda: hub.async_fetch("jail.query", machine.get_jails),
+        ResourceClass.POOLS: fetch_pools,
+        ResourceClass.VMS: lambda: hub.async_fetch("vm.query", machine.get_vms),
+    }
+    coordinators = {
+        resource_class: TrueNASDataUpdateCoordinator(
+            hass,
+            resource_class,
+            fetch,
+            timedelta(seconds=get_refresh_interval(entry, resource_class)),
+            scheduler,
+            # Entries for the same host refresh together, so they share queries.
+            f"{hub.hub_id}-{resource_class.value}",
+        )
+        for resource_class, fetch in fetchers.items()
+    }
+    return coordinators
@@ -0,0 +1,43 @@
+"""Diagnostics of the refreshes of a TrueNAS host."""
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_API_KEY, CONF_PASSWORD, CONF_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Return how the refreshes and queries of an entry have been doing."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    hub = data["hub"]
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "connection": {
+            "connected": hub.supervisor.connected,
+            "reconnects": hub.supervisor.reconnect_count,
+            "disconnected_seconds": hub.supervisor.disconnected_time.total_seconds(),
+        },
+        "resource_classes": {
+            resource_class.value: {
+                "update_interval": coordinator.update_interval.total_seconds(),
+                "last_update_success": coordinator.last_update_success,
+                "coalesced_requests": coordinator.coalesced_requests,
+                **coordinator.stats.as_dict(),
+            }
+            for resource_class, coordinator in data["coordinators"].items()
+        },
+        "endpoints": {
+            endpoint: stats.as_dict()
+            for endpoint, stats in sorted(hub.endpoint_stats.items())
+        },
+    }
@@ -0,0 +1,123 @@
+"""Adds and retires entities as resources come and go on the TrueNAS host."""
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Tuple
+
+from aiotruenas_client import CachingMachine as Machine
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+
+from .const import DOMAIN, ResourceClass
+from .events import signal_resources_changed
+
+_LOGGER = logging.getLogger(__name__)
+
+# How to list the resources of a class, from the machine or from the data of
+# their coordinator, and the key that identifies each of them for as long as
+# they exist.
+RESOURCES: Mapping[ResourceClass, Callable[[Machine, Any], Iterable[Any]]] = {
+    ResourceClass.DISKS: lambda machine, data: machine.disks,
+    ResourceClass.INTERFACES: lambda machine, data: (
+        [] if data is None else data.interfaces.values()
+    ),
+    ResourceClass.JAILS: lambda machine, data: machine.jails,
+    ResourceClass.POOLS: lambda machine, data: machine.pools,
+    ResourceClass.VMS: lambda machine, data: machine.vms,
+}
+RESOURCE_KEYS: Mapping[ResourceClass, Callable[[Any], str]] = {
+    ResourceClass.DISKS: lambda disk: disk.serial,
+    ResourceClass.INTERFACES: lambda interface: interface.name,
+    ResourceClass.JAILS: lambda jail: jail.name,
+    ResourceClass.POOLS: lambda pool: pool.guid,
+    ResourceClass.VMS: lambda vm: str(vm.id),
+}
+
+EntityFactory = Callable[[Any], List[Entity]]
+
+
+class EntityIndex:
+    """The entities of a platform, indexed by the resource they represent.
+
+    After every refresh of a resource class the index is diffed against the
+    resources on the machine: entities are created for new resources and
+    retired for resources that went away, without reloading the entry.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        async_add_entities: Callable[[List[Entity]], None],
+        factories: Mapping[ResourceClass, EntityFactory],
+    ) -> None:
+        self._hass = hass
+        self._entry = entry
+        self._async_add_entities = async_add_entities
+        self._factories = factories
+        self._entities: Dict[Tuple[ResourceClass, str], List[Entity]] = {}
+
+    @property
+    def _machine(self) -> Machine:
+        return self._hass.data[DOMAIN][self._entry.entry_id]["machine"]
+
+    @callback
+    def async_setup(self) -> None:
+        """Creates the current entities and follows the resource classes."""
+        coordinators = self._hass.data[DOMAIN][self._entry.entry_id]["coordinators"]
+        hub_id = self._hass.data[DOMAIN][self._entry.entry_id]["hub"].hub_id
+        for resource_class in self._factories:
+            self.async_sync(resource_class)
+
+            @callback
+            def _async_sync(resource_class: ResourceClass = resource_class) -> None:
+                self.async_sync(resource_class)
+
+            self._entry.async_on_unload(
+                coordinators[resource_class].async_add_listener(_async_sync)
+            )
+            self._entry.async_on_unload(
+                async_dispatcher_connect(
+                    self._hass,
+                    signal_resources_changed(hub_id, resource_class),
+                    _async_sync,
+                )
+            )
+
+    @callback
+    def async_sync(self, resource_class: ResourceClass) -> None:
+        """Diffs the indexed entities against the resources on the machine."""
+        get_key = RESOURCE_KEYS[resource_class]
+        data = self._hass.data[DOMAIN][self._entry.entry_id]["coordinators"][
+            resource_class
+        ].data
+        resources = {
+            get_key(resource): resource
+            for resource in RESOURCES[resource_class](self._machine, data)
+            if resource.available
+        }
+        known = {key for (cls, key) in self._entities if cls == resource_class}
+
+        new_entities: List[Entity] = []
+        for key in resources.keys() - known:
+            entities = self._factories[resource_class](resources[key])
+            self._entities[(resource_class, key)] = entities
+            new_entities.extend(entities)
+        if new_entities:
+            _LOGGER.debug(
+                "adding %d entities for new %s", len(new_entities), resource_class.value
+            )
+            self._async_add_entities(new_entities)
+
+        for key in known - resources.keys():
+            _LOGGER.debug("retiring entities of %s %s", resource_class.value, key)
+            for entity in self._entities.pop((resource_class, key)):
+                self._hass.async_create_task(self._async_retire(entity))
+
+    async def _async_retire(self, entity: Entity) -> None:
+        registry = entity_registry.async_get(self._hass)
+        if entity.entity_id and registry.async_get(entity.entity_id) is not None:
+            registry.async_remove(entity.entity_id)
+        elif entity.hass is not None:
+            await entity.async_remove()
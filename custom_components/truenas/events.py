@@ -0,0 +1,201 @@
+"""Push updates from TrueNAS middleware collection subscriptions."""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from aiotruenas_client import CachingMachine as Machine
+from aiotruenas_client.websockets.interfaces import Subscriber
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .const import DOMAIN, ResourceClass
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def signal_resource_updated(
+    hub_id: str, resource_class: ResourceClass, key: str
+) -> str:
+    """Dispatcher signal sent when a single resource was updated in place."""
+    return f"{DOMAIN}_{hub_id}_{resource_class.value}_{key}_updated"
+
+
+def signal_resources_changed(hub_id: str, resource_class: ResourceClass) -> str:
+    """Dispatcher signal sent when a resource was added to a resource class."""
+    return f"{DOMAIN}_{hub_id}_{resource_class.value}_changed"
+
+
+def _find_key(state: Dict[str, Dict[str, Any]], field: str, value: Any) -> Any:
+    for key, resource in state.items():
+        if resource.get(field) == value:
+            return key
+    return None
+
+
+def _disk_key(state: Dict[str, Dict[str, Any]], message: Dict[str, Any]) -> Any:
+    # Disks are cached by serial, but collection updates carry the identifier.
+    fields = message.get("fields", {})
+    if "serial" in fields:
+        return fields["serial"].strip()
+    return _find_key(state, "identifier", message["id"])
+
+
+def _pool_key(state: Dict[str, Dict[str, Any]], message: Dict[str, Any]) -> Any:
+    # Pools are cached by guid, but collection updates carry the numeric id.
+    fields = message.get("fields", {})
+    if "guid" in fields:
+        return fields["guid"]
+    return _find_key(state, "id", message["id"])
+
+
+class CollectionSubscriber(Subscriber):
+    """Applies the updates of a single middleware collection to the machine."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub_id: str,
+        machine: Machine,
+        collection: str,
+        resource_class: ResourceClass,
+        get_fetcher: Callable[[], Any],
+        get_key: Callable[[Dict[str, Dict[str, Any]], Dict[str, Any]], Any],
+    ) -> None:
+        self._hass = hass
+        self._hub_id = hub_id
+        self._machine = machine
+        self._collection = collection
+        self._resource_class = resource_class
+        self._get_fetcher = get_fetcher
+        self._get_key = get_key
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self) -> None:
+        """Subscribes to the collection and starts applying its updates."""
+        queue = await self._machine.subscribe(self, self._collection)
+        self._task = asyncio.create_task(self._process_queue(queue))
+
+    async def unsubscribe(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._machine.unsubscribe(self, self._collection)
+
+    async def _process_queue(self, queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                message = await queue.get()
+                queue.task_done()
+                try:
+                    self._apply(message)
+                except Exception as exc:
+                    _LOGGER.exception(
+                        "exception while processing %s update",
+                        self._collection,
+                        exc_info=exc,
+                    )
+        except asyncio.CancelledError:
+            _LOGGER.debug("%s subscription is getting canceled", self._collection)
+            raise
+
+    @callback
+    def _apply(self, message: Dict[str, Any]) -> None:
+        fetcher = self._get_fetcher()
+        key = self._get_key(fetcher._state, message)
+        if key is None:
+            _LOGGER.debug(
+                "ignoring %s update for unknown resource %s",
+                self._collection,
+                message.get("id"),
+            )
+            return
+        async_apply_update(
+            self._hass,
+            self._hub_id,
+            self._resource_class,
+            fetcher,
+            str(key),
+            message.get("fields", {}),
+        )
+
+
+@callback
+def async_apply_update(
+    hass: HomeAssistant,
+    hub_id: str,
+    resource_class: ResourceClass,
+    fetcher: Any,
+    key: str,
+    fields: Dict[str, Any],
+) -> None:
+    """Merges the fields of a single resource into the cache of its fetcher.
+
+    The entities of the resource are told about the update, and those of its
+    resource class too when the resource is new.
+    """
+    # The caching fetchers do not expose a way to update a single resource,
+    # so their cached state is updated directly.
+    if key in fetcher._state:
+        fetcher._state[key].update(fields)
+    else:
+        fetcher._state[key] = dict(fields)
+        fetcher._update_properties_from_state()
+        async_dispatcher_send(hass, signal_resources_changed(hub_id, resource_class))
+    async_dispatcher_send(hass, signal_resource_updated(hub_id, resource_class, key))
+
+
+class TrueNASEventSubscriber:
+    """Keeps the cached machine in sync from middleware collection updates."""
+
+    def __init__(self, hass: HomeAssistant, hub_id: str, machine: Machine) -> None:
+        self._subscribers: List[CollectionSubscriber] = [
+            CollectionSubscriber(
+                hass,
+                hub_id,
+                machine,
+                "disk.query",
+                ResourceClass.DISKS,
+                lambda: machine._disk_fetcher,
+                _disk_key,
+            ),
+            CollectionSubscriber(
+                hass,
+                hub_id,
+                machine,
+                "jail.query",
+                ResourceClass.JAILS,
+                lambda: machine._jail_fetcher,
+                lambda state, message: message["id"],
+            ),
+            CollectionSubscriber(
+                hass,
+                hub_id,
+                machine,
+                "pool.query",
+                ResourceClass.POOLS,
+                lambda: machine._pool_fetcher,
+                _pool_key,
+            ),
+            CollectionSubscriber(
+                hass,
+                hub_id,
+                machine,
+                "vm.query",
+                ResourceClass.VMS,
+                lambda: machine._vm_fetcher,
+                lambda state, message: message["id"],
+            ),
+        ]
+
+    async def async_subscribe(self) -> None:
+        """Subscribes to all of the supported collections."""
+        for subscriber in self._subscribers:
+            await subscriber.subscribe()
+
+    async def async_unsubscribe(self) -> None:
+        """Unsubscribes from all of the supported collections."""
+        for subscriber in self._subscribers:
+            try:
+                await subscriber.unsubscribe()
+            except Exception as exc:
+                _LOGGER.debug("Unable to unsubscribe: %s", exc)
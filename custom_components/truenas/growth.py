@@ -0,0 +1,60 @@
+"""Incremental growth rate of a quantity sampled over time."""
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+# Samples kept per tracker; a day of refreshes at the default interval.
+HISTORY_SIZE = 2880
+
+
+class GrowthTracker:
+    """Least squares slope over a bounded window of the most recent samples.
+
+    The sums the slope is computed from are updated as samples enter and leave
+    the window, so adding a sample and reading the rate take constant time
+    whatever the size of the history.  Samples are taken relative to the first
+    one ever added, which keeps the sums small enough to stay precise.
+    """
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        self._size = size
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._origin: Optional[Tuple[float, float]] = None
+        self._sum_t = 0.0
+        self._sum_y = 0.0
+        self._sum_tt = 0.0
+        self._sum_ty = 0.0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, timestamp: float, value: float) -> None:
+        """Adds a sample, dropping the oldest one once the window is full."""
+        if self._origin is None:
+            self._origin = (timestamp, value)
+        t = timestamp - self._origin[0]
+        y = value - self._origin[1]
+        if self._samples and t <= self._samples[-1][0]:
+            # Only samples moving forward in time describe a rate.
+            return
+        if len(self._samples) == self._size:
+            old_t, old_y = self._samples.popleft()
+            self._accumulate(old_t, old_y, -1)
+        self._samples.append((t, y))
+        self._accumulate(t, y, 1)
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Change of the value per second, if there are enough samples."""
+        n = len(self._samples)
+        if n < 2:
+            return None
+        denominator = n * self._sum_tt - self._sum_t * self._sum_t
+        if denominator <= 0:
+            return None
+        return (n * self._sum_ty - self._sum_t * self._sum_y) / denominator
+
+    def _accumulate(self, t: float, y: float, sign: int) -> None:
+        self._sum_t += sign * t
+        self._sum_y += sign * y
+        self._sum_tt += sign * t * t
+        self._sum_ty += sign * t * y
@@ -0,0 +1,240 @@
+"""Connections to TrueNAS hosts, shared by all the config entries for a host."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional
+
+from aiotruenas_client import CachingMachine as Machine
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import slugify
+
+from .alerts import AlertIndex
+from .connection import ConnectionSupervisor, session_key
+from .const import (
+    CONF_PUSH_UPDATES,
+    DOMAIN,
+    EVENT_ALERT_CLEARED,
+    EVENT_ALERT_RAISED,
+    ResourceClass,
+)
+from .events import TrueNASEventSubscriber
+from .instrumentation import RefreshStats, payload_size
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds the result of a query is shared with the other entries for the host.
+SHARED_RESULT_TTL = 5
+
+
+class TrueNASHub:
+    """A connection to a TrueNAS host, shared by the config entries using it.
+
+    Entries for the same host and credentials share a single connection,
+    machine cache and event subscription.  Each entry keeps its own
+    coordinators, but their fetches go through the hub so a query made by
+    several entries in the same cycle is only sent once.  The hub, and so the
+    connection, lives until the last entry releases it.
+
+    The same host may also be added with different credentials, for instance
+    with a read-only API key for sensors and with another key for services.
+    Those entries each get a hub of their own, so that every call, including
+    starting and stopping jails and VMs, is made with the entry's credentials.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, machine: Machine):
+        # The key of the hub among the others, by host and credentials.
+        self.key = session_key(entry.data)
+        self.hub_id = slugify(f"{entry.data[CONF_HOST]}-{self.key[:8]}")
+        self.machine = machine
+        self.events: Optional[TrueNASEventSubscriber] = None
+        # How the queries to each endpoint of the middleware have been doing.
+        self.endpoint_stats: Dict[str, RefreshStats] = {}
+        # The alerts active on the host, indexed once for all the entries.
+        self.alerts = AlertIndex()
+        # The config entry data the current session authenticated with.
+        self.session_data: Mapping[str, Any] = entry.data
+        self.supervisor = ConnectionSupervisor(
+            hass, self.hub_id, entry, machine, self._async_connected
+        )
+        self._hass = hass
+        self._entries: Dict[str, ConfigEntry] = {}
+        self._coordinators: Dict[str, Dict[ResourceClass, Any]] = {}
+        self._shared: Dict[Hashable, asyncio.Future] = {}
+        self._fetched_at: Dict[Hashable, float] = {}
+        self._alerts_read = False
+
+    @callback
+    def async_start(self) -> None:
+        """Starts connecting, once the first entry has been set up."""
+        self.supervisor.async_start()
+
+    @callback
+    def async_add_entry(
+        self, entry: ConfigEntry, coordinators: Dict[ResourceClass, Any]
+    ) -> None:
+        """Adds a reference to the hub for an entry and its coordinators."""
+        self._entries[entry.entry_id] = entry
+        self._coordinators[entry.entry_id] = coordinators
+        if self.supervisor.connected:
+            # The connection is already up, so it is only refreshed for this
+            # entry rather than being reopened.
+            entry.async_create_background_task(
+                self._hass,
+                self._async_entry_joined(entry.entry_id),
+                f"{DOMAIN} {entry.title} refresh",
+            )
+
+    async def async_release(self, entry: ConfigEntry) -> bool:
+        """Releases the hub for an entry, returning whether it was the last one.
+
+        The connection is left open, for the caller to close or hand over.
+        """
+        self._entries.pop(entry.entry_id)
+        self._coordinators.pop(entry.entry_id)
+        if self._entries:
+            if self.supervisor.entry.entry_id == entry.entry_id:
+                # Reconnects use the credentials of an entry that is still loaded.
+                self.supervisor.entry = next(iter(self._entries.values()))
+            if self.supervisor.connected:
+                await self._async_try_update_subscription()
+            return False
+
+        await self.supervisor.async_stop()
+        # Queries still in flight are cancelled once the connection is closed.
+        self._shared.clear()
+        if self.events is not None:
+            await self.events.async_unsubscribe()
+            self.events = None
+        return True
+
+    async def async_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Runs `fetch`, sharing its result with the other entries for the host.
+
+        A query identified by `key` that is already in flight, or that was
+        answered in the last few seconds for another entry, is not sent again.
+        Queries are measured by endpoint, which is `key` or its first item.
+        """
+        endpoint = key[0] if isinstance(key, tuple) else key
+        stats = self.endpoint_stats.setdefault(endpoint, RefreshStats())
+
+        async def measured_fetch() -> Any:
+            result = await stats.async_measure(fetch)
+            stats.payload.observe(payload_size(result))
+            return result
+
+        if len(self._entries) < 2:
+            result = await measured_fetch()
+            self._fetched_at[key] = self._hass.loop.time()
+            return result
+        shared = self._shared.get(key)
+        if shared is None or not self._is_fresh(key, shared):
+            shared = asyncio.ensure_future(measured_fetch())
+            shared.add_done_callback(lambda future: self._async_fetched(key, future))
+            self._shared[key] = shared
+        # One entry giving up on the query does not cancel it for the others.
+        return await asyncio.shield(shared)
+
+    async def async_fetch_alerts(self) -> AlertIndex:
+        """Fetches the alerts of the host, firing an event for each change.
+
+        The alerts are indexed by the hub rather than by each entry, so a change
+        is only reported once however many entries use the host.  Its event
+        holds the entry whose credentials the connection uses.
+        """
+        alerts = await self.async_fetch(
+            "alert.list", lambda: self.machine.invoke_method("alert.list")
+        )
+        changes = self.alerts.update(alerts)
+        # Alerts already raised when the host is first read are not news.
+        if self._alerts_read:
+            entry_id = self.supervisor.entry.entry_id
+            for event, changed in (
+                (EVENT_ALERT_RAISED, changes.raised),
+                (EVENT_ALERT_CLEARED, changes.cleared),
+            ):
+                for alert in changed:
+                    self._hass.bus.async_fire(
+                        event, {"entry_id": entry_id, **alert.as_event_data()}
+                    )
+        self._alerts_read = True
+        return self.alerts
+
+    def fetched_at(self, key: Hashable) -> Optional[float]:
+        """The loop time the last result of the query `key` was received."""
+        return self._fetched_at.get(key)
+
+    def _is_fresh(self, key: Hashable, shared: asyncio.Future) -> bool:
+        if not shared.done():
+            return True
+        if shared.cancelled() or shared.exception() is not None:
+            return False
+        return self._hass.loop.time() - self._fetched_at[key] < SHARED_RESULT_TTL
+
+    @callback
+    def _async_fetched(self, key: Hashable, future: asyncio.Future) -> None:
+        # Errors are reported by the refreshes awaiting the query.
+        if not future.cancelled():
+            future.exception()
+        if self._shared.get(key) is future:
+            self._fetched_at[key] = self._hass.loop.time()
+
+    async def _async_connected(self) -> None:
+        """Fetch the current state of the machine, each time it is (re)connected."""
+        self.session_data = self.supervisor.entry.data
+        # Nothing fetched over the previous connection is shared any more.
+        self._shared.clear()
+        self._fetched_at.clear()
+        for entry_id in list(self._entries):
+            await self._async_refresh(entry_id)
+
+        # Subscriptions do not outlive a connection.
+        self.events = None
+        await self._async_update_subscription()
+
+    async def _async_entry_joined(self, entry_id: str) -> None:
+        await self._async_refresh(entry_id)
+        await self._async_try_update_subscription()
+
+    async def _async_refresh(self, entry_id: str) -> None:
+        coordinators = self._coordinators.get(entry_id)
+        if coordinators is None:
+            # The entry was unloaded while the host was being refreshed.
+            return
+        # Disk temperatures are read for the disks found by the disk refresh.
+        await coordinators[ResourceClass.DISKS].async_refresh()
+        await asyncio.gather(
+            *[
+                coordinator.async_refresh()
+                for resource_class, coordinator in coordinators.items()
+                if resource_class != ResourceClass.DISKS
+            ]
+        )
+
+    async def _async_try_update_subscription(self) -> None:
+        """Updates the subscription, leaving a failed one to the next attempt."""
+        try:
+            await self._async_update_subscription()
+        except Exception as exc:
+            _LOGGER.warning("Unable to subscribe to TrueNAS events: %s", exc)
+
+    async def _async_update_subscription(self) -> None:
+        """Subscribes to events while any of the entries wants push updates."""
+        wanted = any(
+            entry.options.get(CONF_PUSH_UPDATES) for entry in self._entries.values()
+        )
+        if wanted and self.events is None:
+            events = TrueNASEventSubscriber(self._hass, self.hub_id, self.machine)
+            try:
+                await events.async_subscribe()
+            except Exception:
+                # Collections subscribed before the failure are let go, so the
+                # next attempt starts over.
+                await events.async_unsubscribe()
+                raise
+            self.events = events
+        elif not wanted and self.events is not None:
+            await self.events.async_unsubscribe()
+            self.events = None
@@ -0,0 +1,79 @@
+"""Identity of TrueNAS entities, computed once rather than on every access."""
+from typing import Any, Callable, Hashable, List, Optional
+from weakref import WeakValueDictionary
+
+# Attributes holding the identity of an entity, which entities declare as slots:
+# the identity key the values were computed for, then each of the values.
+IDENTITY_SLOTS = (
+    "_identity_of",
+    "_identity_device_info",
+    "_identity_name",
+    "_identity_unique_id",
+)
+
+# Attributes of the values of every identity property.
+_ATTRIBUTES: List[str] = []
+_MISSING = object()
+
+
+class identity:
+    """A read-only property computed once per identity of its entity.
+
+    Home Assistant reads the unique id, name and device info of an entity many
+    times over, while building them slugifies and formats strings each time.
+    Their values are kept instead, and only computed again once the
+    `_identity_key` of the entity changes, which is when the name of the object
+    behind it changes on the host.  Each value is kept in an attribute of its
+    own, declared in `IDENTITY_SLOTS`, as hosts may have thousands of entities.
+    """
+
+    def __init__(self, method: Callable[[Any], Any]) -> None:
+        self._method = method
+        self._name = method.__name__
+        self._attribute = f"_identity_{self._name}"
+        if self._attribute not in _ATTRIBUTES:
+            _ATTRIBUTES.append(self._attribute)
+        self.__doc__ = method.__doc__
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        key = instance._identity_key
+        if getattr(instance, "_identity_of", _MISSING) != key:
+            for attribute in _ATTRIBUTES:
+                setattr(instance, attribute, _MISSING)
+            instance._identity_of = key
+        value = getattr(instance, self._attribute)
+        if value is _MISSING:
+            value = self._method(instance)
+            setattr(instance, self._attribute, value)
+        return value
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        raise AttributeError(f"can't set attribute '{self._name}'")
+
+
+class DeviceInfo(dict):
+    """Device info, which unlike a plain dict can be shared through a weakref."""
+
+    __slots__ = ("__weakref__",)
+
+
+# Device info of the devices of every entry, for as long as an entity has it.
+_DEVICE_INFOS: "WeakValueDictionary[Hashable, DeviceInfo]" = WeakValueDictionary()
+
+
+def shared_device_info(**info: Any) -> DeviceInfo:
+    """The device info with these fields, shared by every entity that has it.
+
+    Disks and pools each have several entities, which would otherwise each
+    keep a copy of the same device info.
+    """
+    key = tuple(
+        (field, tuple(value) if isinstance(value, set) else value)
+        for field, value in info.items()
+    )
+    device_info = _DEVICE_INFOS.get(key)
+    if device_info is None:
+        device_info = _DEVICE_INFOS[key] = DeviceInfo(info)
+    return device_info
@@ -0,0 +1,121 @@
+"""Measures how long refreshes of a TrueNAS host take and how much they fetch."""
+import bisect
+import time
+from typing import Any, Awaitable, Callable, Dict, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Upper bounds of the buckets of latencies, in seconds.
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+)
+# Upper bounds of the buckets of payload sizes, in records.
+PAYLOAD_BUCKETS: Tuple[float, ...] = (1, 10, 100, 1000, 10000)
+
+
+class Histogram:
+    """Counts observations in fixed buckets, so its size never grows."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self._bounds = tuple(buckets)
+        # The last bucket holds everything above the last bound.
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """The upper bound of the bucket holding the given percentile."""
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, count in zip(self._bounds, self._counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "last": self.last,
+            "max": self.maximum,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": {
+                **{
+                    f"le_{bound:g}": count
+                    for bound, count in zip(self._bounds, self._counts)
+                },
+                "inf": self._counts[-1],
+            },
+        }
+
+
+class RefreshStats:
+    """How a refresh, or a query to a single endpoint, has been doing."""
+
+    def __init__(self) -> None:
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.payload = Histogram(PAYLOAD_BUCKETS)
+        # Seconds spent writing the state of entities after refreshes.
+        self.write_time = Histogram(LATENCY_BUCKETS)
+        self.successes = 0
+        self.failures = 0
+
+    async def async_measure(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Runs `call`, recording how long it took and whether it succeeded."""
+        start = time.perf_counter()
+        try:
+            result = await call()
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+        self.successes += 1
+        return result
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "latency": self.latency.as_dict(),
+            "payload": self.payload.as_dict(),
+            "write_time": self.write_time.as_dict(),
+        }
+
+
+def payload_size(result: Any) -> int:
+    """The number of records in a result.
+
+    The client does not expose the frames it receives, so a payload is sized by
+    the records it holds rather than by its bytes.
+    """
+    if isinstance(result, (list, dict, tuple)):
+        return len(result)
+    return 0 if result is None else 1
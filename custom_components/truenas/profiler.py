@@ -0,0 +1,145 @@
+"""Profiles the scheduled refreshes of a TrueNAS entry on demand."""
+import cProfile
+import io
+import logging
+import pstats
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .const import DOMAIN, ResourceClass
+
+_LOGGER = logging.getLogger(__name__)
+
+# Functions listed in the summary of a profile.
+TOP_FUNCTIONS = 30
+
+
+class ProfileFiles(NamedTuple):
+    """Where a profile was written."""
+
+    stats: str
+    summary: str
+
+
+async def async_profile(
+    hass: HomeAssistant, entry: ConfigEntry, cycles: int
+) -> ProfileFiles:
+    """Profiles the next scheduled refreshes of an entry, writing the results.
+
+    The profile lasts until every resource class of the entry has refreshed
+    `cycles` times on its schedule.  CPU time is profiled with cProfile, while
+    the time each scheduled refresh spends awaiting, including on the
+    middleware, is measured around it.  Nothing is installed outside of a
+    profile, so it costs nothing the rest of the time.
+    """
+    domain_data = hass.data[DOMAIN]
+    if domain_data.get("profiling"):
+        raise HomeAssistantError("A TrueNAS profile is already running")
+    if entry.pref_disable_polling:
+        raise HomeAssistantError(f"{entry.title} is not refreshed on a schedule")
+    data = domain_data[entry.entry_id]
+    coordinators = data["coordinators"]
+    hub = data["hub"]
+
+    # Seconds each resource class spent refreshing, and writing states.
+    refresh_times: Dict[ResourceClass, List[float]] = {rc: [] for rc in coordinators}
+    write_times = {rc: c.stats.write_time.total for rc, c in coordinators.items()}
+    endpoints = {
+        endpoint: (stats.latency.count, stats.latency.total)
+        for endpoint, stats in hub.endpoint_stats.items()
+    }
+
+    finished = hass.loop.create_future()
+
+    def timer(resource_class: ResourceClass) -> Callable[[float], None]:
+        @callback
+        def observe(elapsed: float) -> None:
+            times = refresh_times[resource_class]
+            if len(times) < cycles:
+                times.append(elapsed)
+            if not finished.done() and all(
+                len(times) == cycles for times in refresh_times.values()
+            ):
+                finished.set_result(None)
+
+        return observe
+
+    @callback
+    def abandon() -> None:
+        if not finished.done():
+            finished.set_exception(
+                HomeAssistantError(f"{entry.title} was unloaded while profiled")
+            )
+
+    # The entry may be unloaded before it has refreshed often enough.
+    entry.async_on_unload(abandon)
+    timers = {rc: timer(rc) for rc in coordinators}
+    profiler = cProfile.Profile(time.process_time)
+    domain_data["profiling"] = True
+    start = time.perf_counter()
+    for resource_class, coordinator in coordinators.items():
+        coordinator.profile_listeners.append(timers[resource_class])
+    profiler.enable()
+    try:
+        await finished
+    finally:
+        profiler.disable()
+        for resource_class, coordinator in coordinators.items():
+            coordinator.profile_listeners.remove(timers[resource_class])
+        domain_data["profiling"] = False
+    elapsed = time.perf_counter() - start
+
+    lines = [
+        f"TrueNAS profile of {entry.title}, {cycles} scheduled refresh(es)",
+        f"Wall time: {elapsed * 1000:.1f} ms",
+        "",
+        "Scheduled refreshes, by resource class (wall time, including awaits):",
+    ]
+    for resource_class, times in refresh_times.items():
+        writes = (
+            coordinators[resource_class].stats.write_time.total
+            - write_times[resource_class]
+        )
+        lines.append(
+            f"  {resource_class.value:<20} mean {_ms(sum(times) / len(times))}"
+            f"  max {_ms(max(times))}  state writes {_ms(writes)}"
+        )
+    lines += ["", "Middleware queries, by endpoint:"]
+    for endpoint, stats in sorted(hub.endpoint_stats.items()):
+        count, total = endpoints.get(endpoint, (0, 0.0))
+        queries = stats.latency.count - count
+        if queries:
+            lines.append(
+                f"  {endpoint:<20} {queries} queries"
+                f"  mean {_ms((stats.latency.total - total) / queries)}"
+            )
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(
+        TOP_FUNCTIONS
+    )
+    lines += ["", "Hot spots, by cumulative CPU time:", stream.getvalue()]
+
+    name = f"truenas_profile_{slugify(entry.title)}_{dt_util.utcnow():%Y%m%d%H%M%S}"
+    files = ProfileFiles(
+        hass.config.path(f"{name}.prof"), hass.config.path(f"{name}.txt")
+    )
+    await hass.async_add_executor_job(_write, profiler, files, "\n".join(lines))
+    _LOGGER.info("Wrote the profile of %s to %s", entry.title, files.summary)
+    return files
+
+
+def _write(profiler: cProfile.Profile, files: ProfileFiles, summary: str) -> None:
+    profiler.dump_stats(files.stats)
+    with open(files.summary, "w", encoding="utf-8") as summary_file:
+        summary_file.write(summary)
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f} ms"
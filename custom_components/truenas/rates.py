@@ -0,0 +1,82 @@
+"""Rates of change of counters that may wrap around or be reset."""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+WRAP_32 = 2**32
+WRAP_64_HALF = 2**63
+
+
+class CounterRates:
+    """The rate of a fixed number of counters for each of a set of names.
+
+    Counters are kept in flat arrays, one row per name, rather than in objects
+    per name and sample, so that hosts with hundreds of interfaces stay cheap
+    and every rate is computed in the same pass.
+
+    A counter that went backwards either wrapped around or was reset.  The
+    middleware does not say how wide a counter is, so one that was past half
+    of the 32 or 64 bit range is taken to have wrapped, and its rate accounts
+    for the wrap.  Otherwise it was reset, for instance by a reboot or the
+    interface being recreated, and its rate is unknown until the next sample.
+    """
+
+    def __init__(self, columns: int) -> None:
+        self._columns = columns
+        self._names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._counters = np.zeros((0, columns), dtype=np.uint64)
+        self._sampled_at = np.zeros(0)
+        self._rates = np.zeros((0, columns))
+
+    @property
+    def names(self) -> List[str]:
+        """The names sampled last."""
+        return list(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def update(self, timestamp: float, counters: Dict[str, Sequence[int]]) -> None:
+        """Samples the counters of every name, forgetting names that went away."""
+        names = list(counters)
+        new = np.array([counters[name] for name in names], dtype=np.uint64).reshape(
+            len(names), self._columns
+        )
+
+        # The previous sample of each name, if there was one.
+        rows = np.array([self._index.get(name, -1) for name in names], dtype=int)
+        known = rows >= 0
+        old = np.zeros_like(new)
+        old[known] = self._counters[rows[known]]
+        elapsed = np.full(len(names), np.nan)
+        elapsed[known] = timestamp - self._sampled_at[rows[known]]
+
+        # Unsigned subtraction already wraps around at 64 bits.
+        delta = new - old
+        backwards = new < old
+        wrapped_32 = backwards & (old < WRAP_32) & (old >= WRAP_32 // 2)
+        delta = np.where(wrapped_32, delta % np.uint64(WRAP_32), delta)
+        reset = backwards & ~wrapped_32 & (old < WRAP_64_HALF)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = delta.astype(float) / elapsed[:, np.newaxis]
+        rates[reset | ~known[:, np.newaxis]] = np.nan
+        rates[elapsed <= 0] = np.nan
+
+        self._names = names
+        self._index = {name: row for row, name in enumerate(names)}
+        self._counters = new
+        self._sampled_at = np.full(len(names), timestamp)
+        self._rates = rates
+
+    def rate(self, name: str, column: int) -> Optional[float]:
+        """The rate of a counter per second between its last two samples."""
+        row = self._index.get(name)
+        if row is None:
+            return None
+        rate = self._rates[row, column]
+        return None if np.isnan(rate) else float(rate)
@@ -0,0 +1,125 @@
+"""Reduces the series returned by the reporting API of the middleware."""
+import warnings
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Seconds of history requested from the reporting API on each refresh.
+REPORTING_WINDOW = 300
+
+
+class Reading(NamedTuple):
+    """A single series of a graph, reduced to a couple of values."""
+
+    # The most recent value reported, which for counters is already a rate.
+    latest: Optional[float]
+    # The average over the window that was queried.
+    mean: Optional[float]
+
+
+NO_READING = Reading(None, None)
+
+
+class Summary(NamedTuple):
+    """A series summarized over the window that was queried."""
+
+    minimum: Optional[float]
+    mean: Optional[float]
+    maximum: Optional[float]
+    p95: Optional[float]
+
+
+NO_SUMMARY = Summary(None, None, None, None)
+
+
+def reduce_graphs(
+    results: List[Dict[str, Any]]
+) -> Dict[Tuple[str, str], List[Reading]]:
+    """Reduces every series of every graph, keyed by graph name and identifier.
+
+    The graphs of a batched query are packed into a single array, padded with
+    NaN where a graph has fewer rows or series than the others, so that all of
+    them are reduced at once rather than one value at a time.  Gaps in a series,
+    which the middleware reports as nulls, are skipped.
+    """
+    if not results:
+        return {}
+    rows = max(len(result.get("data") or []) for result in results)
+    columns = max(len(result.get("legend") or []) for result in results)
+    values = np.full((len(results), max(rows, 1), columns), np.nan)
+    for index, result in enumerate(results):
+        series = graph_values(result)
+        if series is not None:
+            series = series[:, :columns]
+            values[index, rows - len(series) :, : series.shape[1]] = series
+
+    finite = np.isfinite(values)
+    count = finite.sum(axis=1)
+    total = np.where(finite, values, 0.0).sum(axis=1)
+    mean = np.divide(total, count, out=np.full(count.shape, np.nan), where=count > 0)
+    # The last row of each series that holds a value.
+    last = values.shape[1] - 1 - np.argmax(finite[:, ::-1, :], axis=1)
+    latest = np.take_along_axis(values, last[:, np.newaxis, :], axis=1)[:, 0, :]
+
+    return {
+        (result["name"], result["identifier"]): [
+            Reading(_value(latest[index, column]), _value(mean[index, column]))
+            for column in range(len(result.get("legend") or []))
+        ]
+        for index, result in enumerate(results)
+    }
+
+
+def graph_values(result: Dict[str, Any]) -> Optional[np.ndarray]:
+    """All the series of a graph, one column per entry of its legend."""
+    data = result.get("data") or []
+    if not data:
+        return None
+    # Nulls become NaN.
+    return np.array(data, dtype=float).reshape(len(data), -1)
+
+
+def graph_series(result: Dict[str, Any], name: str) -> Optional[np.ndarray]:
+    """The values of the series of a graph whose legend contains `name`."""
+    legend = result.get("legend") or []
+    column = next((index for index, label in enumerate(legend) if name in label), None)
+    values = graph_values(result)
+    if column is None or values is None or column >= values.shape[1]:
+        return None
+    return values[:, column]
+
+
+def summarize(series: Dict[str, Optional[np.ndarray]]) -> Dict[str, Summary]:
+    """Summarizes each of the named series over its window.
+
+    The series are stacked into a single NaN-padded array, so the statistics of
+    all of them are computed in one pass rather than sample by sample.
+    """
+    names = [name for name, values in series.items() if values is not None]
+    summaries = {name: NO_SUMMARY for name in series}
+    if not names:
+        return summaries
+    rows = max(len(series[name]) for name in names)
+    values = np.full((len(names), max(rows, 1)), np.nan)
+    for index, name in enumerate(names):
+        samples = series[name]
+        values[index, rows - len(samples) :] = samples
+    with warnings.catch_warnings():
+        # Series without any value summarize to NaN, which is expected.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        statistics = np.stack(
+            [
+                np.nanmin(values, axis=1),
+                np.nanmean(values, axis=1),
+                np.nanmax(values, axis=1),
+                np.nanpercentile(values, 95, axis=1),
+            ],
+            axis=1,
+        )
+    for index, name in enumerate(names):
+        summaries[name] = Summary(*(_value(value) for value in statistics[index]))
+    return summaries
+
+
+def _value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
@@ -0,0 +1,50 @@
+"""Spreads the refreshes of many TrueNAS hosts over time."""
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+
+# How many refreshes may run at once, across every TrueNAS host.
+MAX_CONCURRENT_REFRESHES = 4
+
+
+class RefreshScheduler:
+    """Decides when the coordinators of every TrueNAS host refresh.
+
+    Coordinators with the same refresh interval would otherwise all fire in
+    the same second.  Instead, each refreshes at a fixed phase within its
+    interval that is derived from its host and resource class, so refreshes
+    are spread evenly across the interval and land at the same point of it
+    across restarts.  How many refreshes run at once is capped as well.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REFRESHES) -> None:
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @staticmethod
+    def phase(key: str, interval: timedelta) -> float:
+        """The offset, in seconds, into each interval at which `key` refreshes."""
+        digest = int(hashlib.sha256(key.encode()).hexdigest(), 16)
+        return (digest % 1_000_000) / 1_000_000 * interval.total_seconds()
+
+    def next_refresh(self, key: str, interval: timedelta, now: datetime) -> datetime:
+        """The first time after `now` at which `key` is due to refresh."""
+        seconds = interval.total_seconds()
+        elapsed = (now.timestamp() - self.phase(key, interval)) % seconds
+        return now + timedelta(seconds=seconds - elapsed)
+
+    def slot(self) -> asyncio.Semaphore:
+        """Held for as long as a refresh runs."""
+        return self._semaphore
+
+
+@callback
+def async_get_scheduler(hass: HomeAssistant) -> RefreshScheduler:
+    """Returns the scheduler shared by all the TrueNAS hosts."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "scheduler" not in domain_data:
+        domain_data["scheduler"] = RefreshScheduler()
+    return domain_data["scheduler"]
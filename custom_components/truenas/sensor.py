@@ -1,24 +1,81 @@
-from typing import Any, Callable, List, Mapping, Optional
+from typing import Any, Callable, Dict, Mapping, Optional
 
-from aiotruenas_client import CachingMachine as Machine
 from aiotruenas_client.disk import Disk, DiskType
 from aiotruenas_client.pool import Pool
-from homeassistant.components.sensor import DEVICE_CLASS_TEMPERATURE, SensorEntity
+from homeassistant.components.sensor import (
+    DEVICE_CLASS_TEMPERATURE,
+    DEVICE_CLASS_TIMESTAMP,
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_NAME, TEMP_CELSIUS
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    CONF_NAME,
+    PERCENTAGE,
+    TEMP_CELSIUS,
+    TIME_MILLISECONDS,
+    TIME_SECONDS,
+    UnitOfDataRate,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import entity_platform
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
 from homeassistant.util import slugify
 
-from . import TrueNASDiskEntity, TrueNASPoolEntity, TrueNASSensor
+from . import (
+    TrueNASDiskEntity,
+    TrueNASHostEntity,
+    TrueNASInterfaceEntity,
+    TrueNASPoolEntity,
+    TrueNASSensor,
+)
+from .alerts import ALERT_LEVELS, AlertIndex
+from .connection import ConnectionSupervisor, signal_connection_changed
 from .const import (
+    ATTR_AVERAGE,
+    ATTR_COALESCED_REQUESTS,
+    ATTR_CONNECTED,
+    ATTR_DESCRIPTION,
     ATTR_ENCRYPT,
+    ATTR_FAILURES,
+    ATTR_LAST_UPDATE_SUCCESS,
+    ATTR_LBA_OF_FIRST_ERROR,
+    ATTR_LIFETIME,
+    ATTR_LINK_STATE,
+    ATTR_MAXIMUM,
+    ATTR_MINIMUM,
+    ATTR_P95,
+    ATTR_PEER_DEVIATION,
     ATTR_POOL_GUID,
     ATTR_POOL_IS_DECRYPTED,
     ATTR_POOL_NAME,
+    ATTR_STALE,
+    ATTR_STATUS_DETAIL,
+    ATTR_SUCCESSES,
+    ATTR_WRITE_TIME,
     DOMAIN,
+    ResourceClass,
+)
+from .coordinator import (
+    INTERFACE_RECEIVED,
+    INTERFACE_SENT,
+    DiskIO,
+    HostStats,
+    NetworkInterface,
+    Pools,
+    TrueNASDataUpdateCoordinator,
 )
+from .discovery import EntityIndex
+from .growth import GrowthTracker
+from .identity import IDENTITY_SLOTS, identity
+from .reporting import Reading, Summary
+from .smart import SmartResults, SmartTest
 
 
 async def async_setup_entry(
@@ -27,33 +84,126 @@ async def async_setup_entry(
     async_add_entities: Callable,
 ):
     """Set up the TrueNAS switches."""
-    entities = _create_entities(hass, entry)
-    async_add_entities(entities)
-
-
-def _get_machine(hass: HomeAssistant, entry: ConfigEntry) -> Machine:
-    machine = hass.data[DOMAIN][entry.entry_id]["machine"]
-    assert machine is not None
-    return machine
-
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    name = entry.data[CONF_NAME]
+    smart_results = hass.data[DOMAIN][entry.entry_id]["smart_results"]
 
-def _create_entities(hass: HomeAssistant, entry: ConfigEntry) -> List[SensorEntity]:
-    entities = []
+    hub = hass.data[DOMAIN][entry.entry_id]["hub"]
+    async_add_entities(
+        [
+            LastRefreshSensor(entry, name, resource_class, coordinator)
+            for resource_class, coordinator in coordinators.items()
+        ]
+        + [
+            RefreshDurationSensor(entry, name, resource_class, coordinator)
+            for resource_class, coordinator in coordinators.items()
+        ]
+        + [
+            sensor(entry, name, coordinators[ResourceClass.HOST])
+            for sensor in (
+                HostCPUSensor,
+                HostLoadSensor,
+                HostMemorySensor,
+                HostARCSizeSensor,
+                HostARCHitRatioSensor,
+            )
+        ]
+        + [
+            AlertCountSensor(entry, name, level, coordinators[ResourceClass.ALERTS])
+            for level in ALERT_LEVELS
+        ]
+        + [
+            ReconnectsSensor(entry, name, hub.hub_id, hub.supervisor),
+            DisconnectedTimeSensor(entry, name, hub.hub_id, hub.supervisor),
+        ]
+    )
 
-    machine = _get_machine(hass, entry)
-    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
-    name = entry.data[CONF_NAME]
+    # Pools are sampled before their sensors are told about a refresh, but only
+    # when a refresh succeeded and the capacity changed, since the listeners are
+    # also called for failed refreshes and pushed updates.
+    pool_growth: Dict[str, GrowthTracker] = {}
+    sampled_capacity: Dict[str, Dict[str, Any]] = {}
 
-    for disk in machine.disks:
-        entities.append(DiskTemperatureSensor(entry, name, disk, coordinator))
+    @callback
+    def _async_sample_pools() -> None:
+        coordinator = coordinators[ResourceClass.POOLS]
+        pools: Optional[Pools] = coordinator.data
+        if not coordinator.last_update_success or pools is None:
+            return
+        if pools.capacity == sampled_capacity:
+            return
+        now = dt_util.utcnow().timestamp()
+        for guid in pools.capacity:
+            allocated = _pool_capacity(pools, guid, "allocated")
+            if allocated is not None:
+                pool_growth.setdefault(guid, GrowthTracker()).add(now, allocated)
+        sampled_capacity.clear()
+        sampled_capacity.update(pools.capacity)
 
-    for pool in machine.pools:
-        entities.append(PoolSensor(entry, name, pool, coordinator))
+    entry.async_on_unload(
+        coordinators[ResourceClass.POOLS].async_add_listener(_async_sample_pools)
+    )
 
-    return entities
+    EntityIndex(
+        hass,
+        entry,
+        async_add_entities,
+        {
+            ResourceClass.DISKS: lambda disk: [
+                DiskTemperatureSensor(
+                    entry, name, disk, coordinators[ResourceClass.DISK_TEMPERATURES]
+                ),
+                DiskReadSensor(entry, name, disk, coordinators[ResourceClass.DISK_IO]),
+                DiskWriteSensor(entry, name, disk, coordinators[ResourceClass.DISK_IO]),
+                DiskBusySensor(entry, name, disk, coordinators[ResourceClass.DISK_IO]),
+                DiskSmartTestSensor(
+                    entry,
+                    name,
+                    disk,
+                    coordinators[ResourceClass.DISK_HEALTH],
+                    smart_results,
+                ),
+            ],
+            ResourceClass.INTERFACES: lambda interface: [
+                InterfaceReceivedSensor(
+                    entry, name, interface, coordinators[ResourceClass.INTERFACES]
+                ),
+                InterfaceSentSensor(
+                    entry, name, interface, coordinators[ResourceClass.INTERFACES]
+                ),
+            ],
+            ResourceClass.POOLS: lambda pool: [
+                PoolSensor(entry, name, pool, coordinators[ResourceClass.POOLS]),
+                PoolAllocatedSensor(
+                    entry, name, pool, coordinators[ResourceClass.POOLS]
+                ),
+                PoolFreeSensor(entry, name, pool, coordinators[ResourceClass.POOLS]),
+                PoolUsedSensor(entry, name, pool, coordinators[ResourceClass.POOLS]),
+                PoolFragmentationSensor(
+                    entry, name, pool, coordinators[ResourceClass.POOLS]
+                ),
+                PoolGrowthRateSensor(
+                    entry,
+                    name,
+                    pool,
+                    coordinators[ResourceClass.POOLS],
+                    pool_growth.setdefault(pool.guid, GrowthTracker()),
+                ),
+                PoolDaysUntilFullSensor(
+                    entry,
+                    name,
+                    pool,
+                    coordinators[ResourceClass.POOLS],
+                    pool_growth.setdefault(pool.guid, GrowthTracker()),
+                ),
+            ],
+        },
+    ).async_setup()
 
 
 class DiskTemperatureSensor(TrueNASDiskEntity, TrueNASSensor, SensorEntity):
+    __slots__ = ("_disk",)
+
     _disk: Disk
 
     def __init__(
@@ -66,17 +216,17 @@ class DiskTemperatureSensor(TrueNASDiskEntity, TrueNASSensor, SensorEntity):
         self._disk = disk
         super().__init__(entry, name, coordinator)
 
-    @property
+    @identity
     def name(self) -> str:
         """Return the name of the disk."""
         assert self._disk is not None
         return f"Disk {self._disk.serial} Temperature"
 
-    @property
+    @identity
     def unique_id(self) -> str:
         assert self._disk is not None
         return slugify(
-            f"{self._entry.unique_id}-{self._disk.serial}_temperature_sensor",
+            f"{self._entry.entry_id}-{self._disk.serial}_temperature_sensor",
         )
 
     @property
@@ -88,18 +238,310 @@ class DiskTemperatureSensor(TrueNASDiskEntity, TrueNASSensor, SensorEntity):
     def device_class(self) -> str:
         return DEVICE_CLASS_TEMPERATURE
 
+    @property
+    def extra_state_attributes(self):
+        """Return whether the temperature is stale, and its recent history."""
+        if self._coordinator.data is None:
+            return None
+        attributes = {
+            ATTR_STALE: self._disk.name in self._coordinator.data.standby,
+        }
+        stats = self._coordinator.data.history.stats(self._disk.name)
+        if stats is not None:
+            attributes.update(
+                {
+                    ATTR_AVERAGE: stats.average,
+                    ATTR_MINIMUM: stats.minimum,
+                    ATTR_MAXIMUM: stats.maximum,
+                    ATTR_PEER_DEVIATION: stats.peer_deviation,
+                }
+            )
+        return attributes
+
     @property
     def unit_of_measurement(self):
         return TEMP_CELSIUS
 
     def _get_state(self) -> Optional[int]:
         """Returns the current temperature of the disk."""
-        if self.available:
-            return self._disk.temperature
+        if not self.available:
+            return None
+        if self._coordinator.data is not None:
+            return self._coordinator.data.temperatures.get(self._disk.name)
+        if self._last_state is not None:
+            # Not refreshed since startup yet, so use the temperature from before.
+            try:
+                return int(self._last_state.state)
+            except ValueError:
+                pass
         return None
 
 
+class DiskIOSensor(TrueNASDiskEntity, TrueNASSensor, SensorEntity):
+    """Base for sensors reading the reporting graphs of a disk."""
+
+    __slots__ = ("_disk",)
+
+    _disk: Disk
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        disk: Disk,
+        coordinator: DataUpdateCoordinator,
+    ) -> None:
+        self._disk = disk
+        super().__init__(entry, name, coordinator)
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def extra_state_attributes(self):
+        """Return the average over the window of the last refresh."""
+        reading = self._reading()
+        if reading is None or reading.mean is None:
+            return None
+        return {
+            ATTR_AVERAGE: round(reading.mean, 1),
+        }
+
+    def _reading(self) -> Optional[Reading]:
+        if not self.available or self._coordinator.data is None:
+            return None
+        disk_io: Optional[DiskIO] = self._coordinator.data.get(self._disk.name)
+        return None if disk_io is None else self._select(disk_io)
+
+    def _select(self, disk_io: DiskIO) -> Reading:
+        raise NotImplementedError
+
+    def _get_state(self) -> Optional[float]:
+        reading = self._reading()
+        if reading is None or reading.latest is None:
+            return None
+        return round(reading.latest, 1)
+
+
+class DiskReadSensor(DiskIOSensor):
+    """How fast a disk is read from."""
+
+    @identity
+    def name(self) -> str:
+        return f"Disk {self._disk.serial} Read Rate"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._disk.serial}_read_rate")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:download"
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DATA_RATE
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfDataRate.BYTES_PER_SECOND
+
+    def _select(self, disk_io: DiskIO) -> Reading:
+        return disk_io.read
+
+
+class DiskWriteSensor(DiskIOSensor):
+    """How fast a disk is written to."""
+
+    @identity
+    def name(self) -> str:
+        return f"Disk {self._disk.serial} Write Rate"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._disk.serial}_write_rate")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:upload"
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DATA_RATE
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfDataRate.BYTES_PER_SECOND
+
+    def _select(self, disk_io: DiskIO) -> Reading:
+        return disk_io.write
+
+
+class DiskBusySensor(DiskIOSensor):
+    """The share of time a disk is busy serving requests."""
+
+    @identity
+    def name(self) -> str:
+        return f"Disk {self._disk.serial} Busy"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._disk.serial}_busy")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:harddisk"
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return PERCENTAGE
+
+    def _select(self, disk_io: DiskIO) -> Reading:
+        return disk_io.busy
+
+
+class DiskSmartTestSensor(TrueNASDiskEntity, TrueNASSensor, SensorEntity):
+    """The outcome of the latest SMART self-test of a disk."""
+
+    __slots__ = ("_disk", "_smart_results")
+
+    _disk: Disk
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        disk: Disk,
+        coordinator: DataUpdateCoordinator,
+        smart_results: SmartResults,
+    ) -> None:
+        self._disk = disk
+        # Results restored from before a restart are shown until the first
+        # refresh, so this does not wait for the coordinator.
+        self._smart_results = smart_results
+        super().__init__(entry, name, coordinator)
+
+    @identity
+    def name(self) -> str:
+        return f"Disk {self._disk.serial} SMART Test"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._disk.serial}_smart_test")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:harddisk"
+
+    @property
+    def entity_category(self) -> EntityCategory:
+        return EntityCategory.DIAGNOSTIC
+
+    @property
+    def extra_state_attributes(self):
+        test = self._test()
+        if test is None:
+            return None
+        return {
+            ATTR_DESCRIPTION: test.description,
+            ATTR_STATUS_DETAIL: test.status_verbose,
+            ATTR_LIFETIME: test.lifetime,
+            ATTR_LBA_OF_FIRST_ERROR: test.lba_of_first_error,
+        }
+
+    def _test(self) -> Optional[SmartTest]:
+        return self._smart_results.latest(self._disk.serial)
+
+    def _get_state(self) -> Optional[str]:
+        test = self._test()
+        return None if test is None else test.status
+
+
+class InterfaceRateSensor(TrueNASInterfaceEntity, TrueNASSensor, SensorEntity):
+    """Base for sensors of how fast a network interface moves bytes."""
+
+    __slots__ = ("_interface_name",)
+
+    _column: int
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        interface: NetworkInterface,
+        coordinator: DataUpdateCoordinator,
+    ) -> None:
+        self._interface_name = interface.name
+        super().__init__(entry, name, coordinator)
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DATA_RATE
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfDataRate.BYTES_PER_SECOND
+
+    @property
+    def extra_state_attributes(self):
+        if not self.available:
+            return None
+        interface = self._coordinator.data.interfaces[self._interface_name]
+        return {
+            ATTR_LINK_STATE: interface.link_state,
+        }
+
+    def _get_state(self) -> Optional[float]:
+        if not self.available:
+            return None
+        rate = self._coordinator.data.rates.rate(self._interface_name, self._column)
+        return None if rate is None else round(rate, 1)
+
+
+class InterfaceReceivedSensor(InterfaceRateSensor):
+    """How fast a network interface receives bytes."""
+
+    _column = INTERFACE_RECEIVED
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} {self._interface_name} Received"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._interface_name}_received")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:download-network"
+
+
+class InterfaceSentSensor(InterfaceRateSensor):
+    """How fast a network interface sends bytes."""
+
+    _column = INTERFACE_SENT
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} {self._interface_name} Sent"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._interface_name}_sent")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:upload-network"
+
+
 class PoolSensor(TrueNASPoolEntity, TrueNASSensor, SensorEntity):
+    __slots__ = ("_pool",)
+
     _pool: Pool
 
     def __init__(
@@ -112,15 +554,15 @@ class PoolSensor(TrueNASPoolEntity, TrueNASSensor, SensorEntity):
         self._pool = pool
         super().__init__(entry, name, coordinator)
 
-    @property
+    @identity
     def name(self) -> str:
         """Return the name of the pool."""
         return f"{self._pool.name} Pool"
 
-    @property
+    @identity
     def unique_id(self):
         """Return the Unique ID of the pool."""
-        return slugify(self._pool.guid)
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}")
 
     @property
     def extra_state_attributes(self):
@@ -143,3 +585,626 @@ class PoolSensor(TrueNASPoolEntity, TrueNASSensor, SensorEntity):
         if not isinstance:
             return None
         return self._pool.status.name
+
+
+def _pool_capacity(pools: Optional[Pools], guid: str, field: str) -> Optional[float]:
+    """Returns a capacity field of a pool, if the host reported it."""
+    if pools is None:
+        return None
+    try:
+        # Fragmentation is reported as a string.
+        return float(pools.capacity[guid][field])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class PoolCapacitySensor(TrueNASPoolEntity, TrueNASSensor, SensorEntity):
+    """Base for sensors describing how much of a pool is used."""
+
+    __slots__ = ("_pool",)
+
+    _pool: Pool
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        pool: Pool,
+        coordinator: DataUpdateCoordinator,
+    ) -> None:
+        self._pool = pool
+        super().__init__(entry, name, coordinator)
+
+    @property
+    def icon(self) -> str:
+        return "mdi:database"
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.MEASUREMENT
+
+    def _capacity(self, field: str) -> Optional[float]:
+        if not self._pool.available:
+            return None
+        return _pool_capacity(self._coordinator.data, self._pool.guid, field)
+
+
+class PoolAllocatedSensor(PoolCapacitySensor):
+    """The space allocated on a pool."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._pool.name} Pool Allocated"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}_allocated")
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DATA_SIZE
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfInformation.BYTES
+
+    def _get_state(self) -> Optional[int]:
+        allocated = self._capacity("allocated")
+        return None if allocated is None else int(allocated)
+
+
+class PoolFreeSensor(PoolCapacitySensor):
+    """The space left on a pool."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._pool.name} Pool Free"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}_free")
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DATA_SIZE
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfInformation.BYTES
+
+    def _get_state(self) -> Optional[int]:
+        free = self._capacity("free")
+        return None if free is None else int(free)
+
+
+class PoolUsedSensor(PoolCapacitySensor):
+    """The share of a pool that is allocated."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._pool.name} Pool Used"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}_used")
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return PERCENTAGE
+
+    def _get_state(self) -> Optional[float]:
+        allocated = self._capacity("allocated")
+        size = self._capacity("size")
+        if allocated is None or not size:
+            return None
+        return round(allocated / size * 100, 1)
+
+
+class PoolFragmentationSensor(PoolCapacitySensor):
+    """How fragmented the free space of a pool is."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._pool.name} Pool Fragmentation"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}_fragmentation")
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return PERCENTAGE
+
+    def _get_state(self) -> Optional[float]:
+        return self._capacity("fragmentation")
+
+
+class PoolGrowthSensor(PoolCapacitySensor):
+    """Base for sensors projecting the allocated space of a pool."""
+
+    __slots__ = ("_growth",)
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        pool: Pool,
+        coordinator: DataUpdateCoordinator,
+        growth: GrowthTracker,
+    ) -> None:
+        self._growth = growth
+        super().__init__(entry, name, pool, coordinator)
+
+    @property
+    def icon(self) -> str:
+        return "mdi:chart-line"
+
+    def _bytes_per_day(self) -> Optional[float]:
+        rate = self._growth.rate
+        return None if rate is None else rate * 86400
+
+
+class PoolGrowthRateSensor(PoolGrowthSensor):
+    """How fast the allocated space of a pool grows, over the recent history."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._pool.name} Pool Growth Rate"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}_growth_rate")
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return f"{UnitOfInformation.BYTES}/{UnitOfTime.DAYS}"
+
+    def _get_state(self) -> Optional[int]:
+        bytes_per_day = self._bytes_per_day()
+        return None if bytes_per_day is None else round(bytes_per_day)
+
+
+class PoolDaysUntilFullSensor(PoolGrowthSensor):
+    """When a pool runs out of space if it keeps growing at the same rate."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._pool.name} Pool Days Until Full"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._pool.guid}_days_until_full")
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DURATION
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfTime.DAYS
+
+    def _get_state(self) -> Optional[float]:
+        bytes_per_day = self._bytes_per_day()
+        free = self._capacity("free")
+        if bytes_per_day is None or bytes_per_day <= 0 or free is None:
+            # A pool that is not growing is never full.
+            return None
+        return round(free / bytes_per_day, 1)
+
+
+class HostStatSensor(TrueNASHostEntity, TrueNASSensor, SensorEntity):
+    """Base for sensors summarizing the load of the host over a window.
+
+    The state is the mean over the window, and the other statistics of the
+    window are attributes.
+    """
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def extra_state_attributes(self):
+        summary = self._summary()
+        if summary is None:
+            return None
+        return {
+            ATTR_MINIMUM: self._round(summary.minimum),
+            ATTR_MAXIMUM: self._round(summary.maximum),
+            ATTR_P95: self._round(summary.p95),
+        }
+
+    def _summary(self) -> Optional[Summary]:
+        if not self.available or self._coordinator.data is None:
+            return None
+        return self._select(self._coordinator.data)
+
+    def _select(self, stats: HostStats) -> Summary:
+        raise NotImplementedError
+
+    def _round(self, value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value, 1)
+
+    def _get_state(self) -> Optional[float]:
+        summary = self._summary()
+        return None if summary is None else self._round(summary.mean)
+
+
+class HostCPUSensor(HostStatSensor):
+    """The share of CPU time the host is not idle."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} CPU Usage"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-cpu_usage")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:cpu-64-bit"
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return PERCENTAGE
+
+    def _select(self, stats: HostStats) -> Summary:
+        return stats.cpu
+
+
+class HostLoadSensor(HostStatSensor):
+    """The load average of the host over the last minute."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} Load"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-load")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:gauge"
+
+    def _select(self, stats: HostStats) -> Summary:
+        return stats.load
+
+
+class HostMemorySensor(HostStatSensor):
+    """The share of memory in use on the host."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} Memory Usage"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-memory_usage")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:memory"
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return PERCENTAGE
+
+    def _select(self, stats: HostStats) -> Summary:
+        return stats.memory
+
+
+class HostARCSizeSensor(HostStatSensor):
+    """The size of the ZFS ARC."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} ARC Size"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-arc_size")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:memory"
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DATA_SIZE
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return UnitOfInformation.BYTES
+
+    def _select(self, stats: HostStats) -> Summary:
+        return stats.arc_size
+
+
+class HostARCHitRatioSensor(HostStatSensor):
+    """The share of ZFS ARC lookups that were hits."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} ARC Hit Ratio"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-arc_hit_ratio")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:bullseye-arrow"
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return PERCENTAGE
+
+    def _select(self, stats: HostStats) -> Summary:
+        return stats.arc_hit_ratio
+
+
+class AlertCountSensor(TrueNASHostEntity, TrueNASSensor, SensorEntity):
+    """How many alerts of a level are active on the host."""
+
+    __slots__ = ("_level",)
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        level: str,
+        coordinator: DataUpdateCoordinator,
+    ) -> None:
+        self._level = level
+        super().__init__(entry, name, coordinator)
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} {self._level.title()} Alerts"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-{self._level}_alerts")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:alert"
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.MEASUREMENT
+
+    def _get_state(self) -> Optional[int]:
+        alerts: Optional[AlertIndex] = self._coordinator.data
+        return None if alerts is None else alerts.count(self._level)
+
+
+class LastRefreshSensor(TrueNASHostEntity, TrueNASSensor, SensorEntity):
+    """When a resource class was last refreshed successfully."""
+
+    __slots__ = ("_resource_class",)
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        resource_class: ResourceClass,
+        coordinator: TrueNASDataUpdateCoordinator,
+    ) -> None:
+        self._resource_class = resource_class
+        super().__init__(entry, name, coordinator)
+
+    @identity
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        label = self._resource_class.value.replace("_", " ").title()
+        return f"{self._name} {label} Last Refresh"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(
+            f"{self._entry.entry_id}-{self._resource_class.value}_last_refresh",
+        )
+
+    @property
+    def icon(self) -> str:
+        return "mdi:update"
+
+    @property
+    def device_class(self) -> str:
+        return DEVICE_CLASS_TIMESTAMP
+
+    @property
+    def entity_category(self) -> EntityCategory:
+        return EntityCategory.DIAGNOSTIC
+
+    @property
+    def available(self) -> bool:
+        """The time of the last success is known even while refreshes fail."""
+        return True
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            ATTR_LAST_UPDATE_SUCCESS: self._coordinator.last_update_success,
+        }
+
+    def _get_state(self) -> Optional[str]:
+        """Returns when the resource class was last refreshed successfully."""
+        if self._coordinator.last_success_time is None:
+            return None
+        return self._coordinator.last_success_time.isoformat()
+
+
+class RefreshDurationSensor(TrueNASHostEntity, TrueNASSensor, SensorEntity):
+    """How long the last refresh of a resource class took, and how they fare."""
+
+    __slots__ = ("_resource_class",)
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        resource_class: ResourceClass,
+        coordinator: TrueNASDataUpdateCoordinator,
+    ) -> None:
+        self._resource_class = resource_class
+        super().__init__(entry, name, coordinator)
+
+    @identity
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        label = self._resource_class.value.replace("_", " ").title()
+        return f"{self._name} {label} Refresh Duration"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(
+            f"{self._entry.entry_id}-{self._resource_class.value}_refresh_duration",
+        )
+
+    @property
+    def icon(self) -> str:
+        return "mdi:timer-outline"
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DURATION
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return TIME_MILLISECONDS
+
+    @property
+    def entity_category(self) -> EntityCategory:
+        return EntityCategory.DIAGNOSTIC
+
+    @property
+    def available(self) -> bool:
+        """Failed refreshes are measured too."""
+        return True
+
+    @property
+    def extra_state_attributes(self):
+        stats = self._coordinator.stats
+        return {
+            ATTR_SUCCESSES: stats.successes,
+            ATTR_FAILURES: stats.failures,
+            ATTR_AVERAGE: _milliseconds(stats.latency.mean),
+            ATTR_P95: _milliseconds(stats.latency.percentile(95)),
+            ATTR_WRITE_TIME: _milliseconds(stats.write_time.last),
+            ATTR_COALESCED_REQUESTS: self._coordinator.coalesced_requests,
+        }
+
+    def _get_state(self) -> Optional[float]:
+        """Returns how long the last refresh took."""
+        if not self._coordinator.stats.latency.count:
+            return None
+        return _milliseconds(self._coordinator.stats.latency.last)
+
+
+def _milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class TrueNASConnectionSensor(TrueNASHostEntity, SensorEntity):
+    """Base for sensors describing the connection to the TrueNAS host."""
+
+    __slots__ = ("_entry", "_name", "_hub_id", "_supervisor") + IDENTITY_SLOTS
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        name: str,
+        hub_id: str,
+        supervisor: ConnectionSupervisor,
+    ) -> None:
+        self._entry = entry
+        self._name = name
+        self._hub_id = hub_id
+        self._supervisor = supervisor
+
+    @property
+    def should_poll(self) -> bool:
+        return False
+
+    @property
+    def entity_category(self) -> EntityCategory:
+        return EntityCategory.DIAGNOSTIC
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                signal_connection_changed(self._hub_id),
+                self.async_write_ha_state,
+            )
+        )
+
+
+class ReconnectsSensor(TrueNASConnectionSensor):
+    """How many times the connection to the host was lost and reopened."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} Reconnects"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-reconnects")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:lan-connect"
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def state(self) -> int:
+        return self._supervisor.reconnect_count
+
+
+class DisconnectedTimeSensor(TrueNASConnectionSensor):
+    """The total time the host was unreachable since it was first connected."""
+
+    @identity
+    def name(self) -> str:
+        return f"{self._name} Disconnected Time"
+
+    @identity
+    def unique_id(self) -> str:
+        return slugify(f"{self._entry.entry_id}-disconnected_time")
+
+    @property
+    def icon(self) -> str:
+        return "mdi:lan-disconnect"
+
+    @property
+    def device_class(self) -> str:
+        return SensorDeviceClass.DURATION
+
+    @property
+    def state_class(self) -> str:
+        return SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def unit_of_measurement(self) -> str:
+        return TIME_SECONDS
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            ATTR_CONNECTED: self._supervisor.connected,
+        }
+
+    @property
+    def state(self) -> int:
+        return int(self._supervisor.disconnected_time.total_seconds())
@@ -0,0 +1,157 @@
+"""Services acting on many jails or virtual machines at once, or on an entry."""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity_platform import async_get_platforms
+
+from . import TrueNASJailEntity, TrueNASVirtualMachineEntity
+from .const import (
+    ACTION_RESTART,
+    ACTION_START,
+    ACTION_STOP,
+    DOMAIN,
+    EVENT_BULK_COMPLETED,
+    EVENT_PROFILE_COMPLETED,
+    SCHEMA_SERVICE_JAIL_BULK,
+    SCHEMA_SERVICE_PROFILE,
+    SCHEMA_SERVICE_VM_BULK,
+    SERVICE_JAIL_BULK,
+    SERVICE_PROFILE,
+    SERVICE_VM_BULK,
+)
+from .profiler import async_profile
+
+_LOGGER = logging.getLogger(__name__)
+
+RESULT_SUCCESS = "success"
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Registers the bulk jail and virtual machine services, and profiling."""
+
+    async def async_jail_bulk(call: ServiceCall) -> None:
+        await _async_run_bulk(hass, call, TrueNASJailEntity)
+
+    async def async_vm_bulk(call: ServiceCall) -> None:
+        await _async_run_bulk(hass, call, TrueNASVirtualMachineEntity)
+
+    async def async_run_profile(call: ServiceCall) -> None:
+        entry = hass.config_entries.async_get_entry(call.data["entry_id"])
+        if (
+            entry is None
+            or entry.domain != DOMAIN
+            or entry.state != ConfigEntryState.LOADED
+        ):
+            raise HomeAssistantError(
+                f"{call.data['entry_id']} is not a loaded TrueNAS config entry"
+            )
+        files = await async_profile(hass, entry, call.data["cycles"])
+        hass.bus.async_fire(
+            EVENT_PROFILE_COMPLETED,
+            {
+                "entry_id": entry.entry_id,
+                "stats": files.stats,
+                "summary": files.summary,
+            },
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_JAIL_BULK, async_jail_bulk, schema=SCHEMA_SERVICE_JAIL_BULK
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_VM_BULK, async_vm_bulk, schema=SCHEMA_SERVICE_VM_BULK
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, async_run_profile, schema=SCHEMA_SERVICE_PROFILE
+    )
+
+
+def _find_entities(
+    hass: HomeAssistant, entity_ids: List[str], entity_type: Type
+) -> Dict[str, Optional[Any]]:
+    entities: Dict[str, Optional[Any]] = {entity_id: None for entity_id in entity_ids}
+    for platform in async_get_platforms(hass, DOMAIN):
+        for entity_id in entity_ids:
+            entity = platform.entities.get(entity_id)
+            if isinstance(entity, entity_type):
+                entities[entity_id] = entity
+    return entities
+
+
+async def _async_act(entity: Any, call: ServiceCall) -> None:
+    action = call.data["action"]
+    if not entity.available:
+        raise RuntimeError(f"{entity.entity_id} is not available")
+    # The whole batch is refreshed at once, rather than each target after its
+    # action.
+    if action == ACTION_START:
+        if "overcommit" in call.data:
+            await entity.start(overcommit=call.data["overcommit"], refresh=False)
+        else:
+            await entity.start(refresh=False)
+    elif action == ACTION_STOP:
+        await entity.stop(force=call.data["force"], refresh=False)
+    elif action == ACTION_RESTART:
+        await entity.restart(refresh=False)
+
+
+async def _async_run_bulk(
+    hass: HomeAssistant, call: ServiceCall, entity_type: Type
+) -> Dict[str, str]:
+    """Runs the action of `call` on every target, a limited number at a time.
+
+    The result of each target is reported with an event, since a failing
+    target does not stop the others.  Once all of them are done, each of the
+    coordinators involved is refreshed once.
+    """
+    entities = _find_entities(hass, call.data["entity_id"], entity_type)
+    semaphore = asyncio.Semaphore(call.data["max_concurrent"])
+
+    async def act(entity_id: str, entity: Optional[Any]) -> str:
+        if entity is None:
+            return f"{entity_id} is not a TrueNAS {entity_type.__name__}"
+        async with semaphore:
+            try:
+                await _async_act(entity, call)
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.warning(
+                    "%s of %s failed: %s", call.data["action"], entity_id, exc
+                )
+                return str(exc) or type(exc).__name__
+        return RESULT_SUCCESS
+
+    outcomes = await asyncio.gather(
+        *[act(entity_id, entity) for entity_id, entity in entities.items()]
+    )
+    results = dict(zip(entities.keys(), outcomes))
+
+    coordinators = {
+        id(entity._coordinator): entity._coordinator
+        for entity in entities.values()
+        if entity is not None
+    }
+    for coordinator in coordinators.values():
+        await coordinator.async_refresh()
+
+    failed = sum(1 for result in results.values() if result != RESULT_SUCCESS)
+    _LOGGER.info(
+        "%s %s: %d succeeded, %d failed",
+        call.service,
+        call.data["action"],
+        len(results) - failed,
+        failed,
+    )
+    hass.bus.async_fire(
+        EVENT_BULK_COMPLETED,
+        {
+            "service": call.service,
+            "action": call.data["action"],
+            "results": results,
+        },
+    )
+    return results
@@ -0,0 +1,92 @@
+"""The SMART self-test results of the disks of a host, read incrementally."""
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+# Status of a self-test that found the disk failing.
+STATUS_FAILED = "FAILED"
+
+
+class SmartTest(NamedTuple):
+    """The outcome of a SMART self-test of a disk."""
+
+    # Power-on hours of the disk when the test ran; later tests never have less.
+    lifetime: int
+    description: str
+    # SUCCESS, FAILED, ABORTED or RUNNING.
+    status: str
+    status_verbose: str
+    lba_of_first_error: Optional[int]
+
+    @property
+    def failing(self) -> bool:
+        """Whether the test found the disk failing."""
+        return self.status == STATUS_FAILED or self.lba_of_first_error is not None
+
+
+class SmartResults:
+    """The latest self-test of each disk, keyed by serial.
+
+    The log of a disk lists its newest test first, so only its first entry is
+    read, and only when it is at or past the lifetime of the latest test read
+    so far, which serves as a cursor per disk.  A test at the cursor is read
+    again, as a running test completes without moving it.  The results are
+    saved along with their cursors, so that a restart picks up where it left
+    off rather than starting over from whatever the logs hold.
+    """
+
+    def __init__(self) -> None:
+        self._latest: Dict[str, SmartTest] = {}
+
+    def latest(self, serial: str) -> Optional[SmartTest]:
+        """The latest self-test of a disk, if it ever ran one."""
+        return self._latest.get(serial)
+
+    def cursor(self, serial: str) -> Optional[int]:
+        """The lifetime of the latest self-test read for a disk."""
+        test = self._latest.get(serial)
+        return None if test is None else test.lifetime
+
+    def update(
+        self, serials: Mapping[str, str], results: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Reads the new tests of each disk, returning the serials that changed.
+
+        `serials` maps the name of each disk to its serial, as the results are
+        keyed by name, which may change across reboots of the host.
+        """
+        changed = []
+        for result in results:
+            serial = serials.get(result.get("disk"))
+            if serial is None:
+                continue
+            tests = result.get("tests")
+            if not tests:
+                continue
+            cursor = self.cursor(serial)
+            if cursor is not None and (tests[0].get("lifetime") or 0) < cursor:
+                # Power-on hours only grow, so this is not a newer test.
+                continue
+            newest = _test(tests[0])
+            if newest != self._latest.get(serial):
+                self._latest[serial] = newest
+                changed.append(serial)
+        return changed
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {serial: test._asdict() for serial, test in self._latest.items()}
+
+    def restore(self, data: Mapping[str, Mapping[str, Any]]) -> None:
+        """Restores results saved with `as_dict`."""
+        self._latest = {serial: SmartTest(**test) for serial, test in data.items()}
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+
+def _test(test: Mapping[str, Any]) -> SmartTest:
+    return SmartTest(
+        test.get("lifetime") or 0,
+        test.get("description") or "",
+        test.get("status") or "",
+        test.get("status_verbose") or "",
+        test.get("lba_of_first_error"),
+    )
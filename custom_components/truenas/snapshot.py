@@ -0,0 +1,33 @@
+"""Tracks the state each TrueNAS entity last published to Home Assistant."""
+from typing import Any, Dict, Hashable, Mapping, Optional, Tuple
+
+# (name, available, state, extra state attributes)
+Snapshot = Tuple[Optional[str], bool, Any, Optional[Mapping[str, Any]]]
+
+
+class StateSnapshots:
+    """The last published snapshot of each entity, keyed by `unique_id`.
+
+    Refreshes notify every entity listening to a coordinator, but most of them
+    have not changed.  Comparing against the last published snapshot lets an
+    entity skip writing an identical state.  The name is part of a snapshot,
+    since the resource behind an entity may be renamed while its state stays
+    the same.
+    """
+
+    def __init__(self) -> None:
+        self._snapshots: Dict[Hashable, Snapshot] = {}
+
+    def update(self, unique_id: Hashable, snapshot: Snapshot) -> bool:
+        """Records `snapshot`, returning whether it differs from the last one."""
+        if self._snapshots.get(unique_id) == snapshot:
+            return False
+        self._snapshots[unique_id] = snapshot
+        return True
+
+    def remove(self, unique_id: Hashable) -> None:
+        """Forgets the snapshot of an entity that is going away."""
+        self._snapshots.pop(unique_id, None)
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
@@ -0,0 +1,132 @@
+"""Persists the last known state of a TrueNAS machine for warm starts."""
+import logging
+from typing import Any, Dict, Optional
+
+from aiotruenas_client import CachingMachine as Machine
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, ResourceClass
+from .smart import SmartResults
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+# The client fetcher caching the state of each resource class.
+FETCHERS = {
+    ResourceClass.DISKS: "_disk_fetcher",
+    ResourceClass.JAILS: "_jail_fetcher",
+    ResourceClass.POOLS: "_pool_fetcher",
+    ResourceClass.VMS: "_vm_fetcher",
+}
+# Fields no entity reads, which are left out to keep the snapshot compact.
+OMITTED_FIELDS = {
+    ResourceClass.POOLS: ("encryptkey", "topology"),
+}
+
+
+class MachineSnapshotStore:
+    """Saves the cached inventory and state of a machine to Home Assistant storage.
+
+    At startup the snapshot fills the caches of a machine that is not connected
+    yet, so entities can be created before the host has been reached.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self._machine: Optional[Machine] = None
+
+    async def async_restore(self, machine: Machine) -> bool:
+        """Fills the caches of `machine`, returning whether a snapshot existed."""
+        data = await self._store.async_load()
+        if not data:
+            return False
+        for resource_class, attribute in FETCHERS.items():
+            fetcher = getattr(machine, attribute)
+            fetcher._state = data.get(resource_class.value, {})
+            fetcher._update_properties_from_state()
+        _LOGGER.debug("restored %s", {key: len(value) for key, value in data.items()})
+        return True
+
+    @callback
+    def async_schedule_save(self, machine: Machine) -> None:
+        """Saves the state of `machine` soon, coalescing frequent refreshes."""
+        self._machine = machine
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        assert self._machine is not None
+        data: Dict[str, Any] = {}
+        for resource_class, attribute in FETCHERS.items():
+            omitted = OMITTED_FIELDS.get(resource_class, ())
+            data[resource_class.value] = {
+                key: {
+                    field: value
+                    for field, value in state.items()
+                    if field not in omitted
+                }
+                for key, state in getattr(self._machine, attribute)._state.items()
+            }
+        return data
+
+
+class SmartResultStore:
+    """Saves the SMART results of the disks of a host, along with their cursors."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.smart")
+        self._results: Optional[SmartResults] = None
+
+    async def async_restore(self, results: SmartResults) -> None:
+        data = await self._store.async_load()
+        if data:
+            results.restore(data)
+
+    @callback
+    def async_schedule_save(self, results: SmartResults) -> None:
+        self._results = results
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        assert self._results is not None
+        return self._results.as_dict()
+
+
+class DiskTemperatureStore:
+    """Saves the last temperature read of each disk of a host, keyed by serial.
+
+    Disks in standby are not read, so a disk that stays spun down across a
+    restart keeps the temperature it had before.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.temperatures")
+        self._temperatures: Optional[Dict[str, int]] = None
+
+    async def async_restore(self, temperatures: Dict[str, int]) -> None:
+        data = await self._store.async_load()
+        if data:
+            temperatures.update(data)
+
+    @callback
+    def async_schedule_save(self, temperatures: Dict[str, int]) -> None:
+        self._temperatures = temperatures
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        assert self._temperatures is not None
+        return dict(self._temperatures)
@@ -0,0 +1,129 @@
+"""Rolling statistics of the temperatures of the disks in a host."""
+import warnings
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# Samples kept per disk; a day of refreshes at the default interval.
+HISTORY_SIZE = 288
+# Weight of the newest sample in the moving average.
+EWMA_ALPHA = 0.2
+# Degrees above the typical disk of the host at which a disk runs hot.
+HOT_DISK_DEVIATION = 5.0
+# Disks needed for the typical temperature of a host to mean anything.
+MIN_PEERS = 3
+
+
+class TemperatureStats(NamedTuple):
+    """The temperature of a disk over the recent history."""
+
+    # Exponentially weighted moving average.
+    average: Optional[float]
+    minimum: Optional[float]
+    maximum: Optional[float]
+    # How far the average is above the median average of every disk.
+    peer_deviation: Optional[float]
+
+    @property
+    def hot(self) -> bool:
+        """Whether the disk runs hotter than its peers."""
+        return (
+            self.peer_deviation is not None and self.peer_deviation > HOT_DISK_DEVIATION
+        )
+
+
+class TemperatureHistory:
+    """A ring buffer of the temperatures of every disk of a host.
+
+    Each refresh writes one column for all the disks at once, overwriting the
+    oldest, so memory does not grow however long it runs.  The average and
+    extremes are kept up to date as samples come and go: the window is only
+    scanned again for the disks whose minimum or maximum just left it.  The
+    deviation of each disk from its peers is computed across all of them.
+    """
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        self._size = size
+        self._cursor = 0
+        self._names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._samples = np.full((0, size), np.nan)
+        self._average = np.zeros(0)
+        self._minimum = np.zeros(0)
+        self._maximum = np.zeros(0)
+        self._deviation = np.zeros(0)
+
+    def add(self, temperatures: Dict[str, Optional[int]]) -> None:
+        """Adds a sample of every disk, forgetting the disks that went away."""
+        if list(temperatures) != self._names:
+            self._reindex(list(temperatures))
+        new = np.array(
+            [np.nan if value is None else value for value in temperatures.values()],
+            dtype=float,
+        )
+
+        evicted = self._samples[:, self._cursor].copy()
+        self._samples[:, self._cursor] = new
+        self._cursor = (self._cursor + 1) % self._size
+
+        self._average = np.where(
+            np.isnan(self._average),
+            new,
+            np.where(
+                np.isnan(new),
+                self._average,
+                EWMA_ALPHA * new + (1 - EWMA_ALPHA) * self._average,
+            ),
+        )
+        stale_minimum = evicted == self._minimum
+        stale_maximum = evicted == self._maximum
+        self._minimum = np.fmin(self._minimum, new)
+        self._maximum = np.fmax(self._maximum, new)
+        with warnings.catch_warnings():
+            # Disks without any sample in the window have no extremes.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            if stale_minimum.any():
+                self._minimum[stale_minimum] = np.nanmin(
+                    self._samples[stale_minimum], axis=1
+                )
+            if stale_maximum.any():
+                self._maximum[stale_maximum] = np.nanmax(
+                    self._samples[stale_maximum], axis=1
+                )
+
+        if np.count_nonzero(~np.isnan(self._average)) >= MIN_PEERS:
+            self._deviation = self._average - np.nanmedian(self._average)
+        else:
+            self._deviation = np.full(len(self._names), np.nan)
+
+    def stats(self, name: str) -> Optional[TemperatureStats]:
+        """The statistics of a disk, if it was sampled."""
+        row = self._index.get(name)
+        if row is None:
+            return None
+        return TemperatureStats(
+            _value(self._average[row]),
+            _value(self._minimum[row]),
+            _value(self._maximum[row]),
+            _value(self._deviation[row]),
+        )
+
+    def _reindex(self, names: List[str]) -> None:
+        rows = np.array([self._index.get(name, -1) for name in names], dtype=int)
+        known = rows >= 0
+
+        def carry(values: np.ndarray, empty: np.ndarray) -> np.ndarray:
+            empty[known] = values[rows[known]]
+            return empty
+
+        self._samples = carry(self._samples, np.full((len(names), self._size), np.nan))
+        self._average = carry(self._average, np.full(len(names), np.nan))
+        self._minimum = carry(self._minimum, np.full(len(names), np.nan))
+        self._maximum = carry(self._maximum, np.full(len(names), np.nan))
+        self._deviation = carry(self._deviation, np.full(len(names), np.nan))
+        self._names = names
+        self._index = {name: row for row, name in enumerate(names)}
+
+
+def _value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 1)
@@ -0,0 +1 @@
+"""Benchmarks of the TrueNAS integration against a synthetic NAS."""
@@ -0,0 +1,271 @@
+"""Benchmarks of setting up and refreshing a NAS with many resources.
+
+These only run with `TRUENAS_BENCHMARK=1`, as they take a while, and log their
+results at the INFO level:
+
+    TRUENAS_BENCHMARK=1 python -m pytest tests/benchmarks --log-cli-level=INFO
+
+Each result is checked against `baseline.json`, failing when it regressed past
+the tolerance of its kind.  Run with `TRUENAS_BENCHMARK_UPDATE=1` as well to
+record the current results as the new baseline instead.
+"""
+import asyncio
+import gc
+import json
+import logging
+import os
+import time
+import tracemalloc
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+import pytest
+from custom_components.truenas.const import DOMAIN, ResourceClass
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import async_get_platforms
+
+from ..conftest import _insecure_connect, setup_entry
+from ..fake_middleware import FakeMiddleware
+
+_LOGGER = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("TRUENAS_BENCHMARK"),
+    reason="benchmarks only run with TRUENAS_BENCHMARK=1",
+)
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = [10, 100, 1000]
+# How much slower than the baseline a timing may get, plus a little slack in
+# seconds so that timings of a few milliseconds do not fail on noise.
+TIME_TOLERANCE = 2.0
+TIME_SLACK = 0.05
+MEMORY_TOLERANCE = 1.25
+# Refresh cycles timed per size, of which the median is kept.
+CYCLES = 5
+# Times the identity of every entity is read per size.
+IDENTITY_READS = 100
+
+
+def synthetic_nas(resources: int) -> FakeMiddleware:
+    """A NAS with `resources` split evenly across disks, pools, jails and VMs."""
+    disks, pools, jails, vms = (
+        resources // 4 + (index < resources % 4) for index in range(4)
+    )
+    server = FakeMiddleware(
+        disks=[
+            {
+                "description": "",
+                "identifier": f"{{serial}}SERIAL{index}",
+                "model": "Some Disk",
+                "name": f"da{index}",
+                "serial": f"SERIAL{index}",
+                "size": 1000,
+                "type": "HDD",
+            }
+            for index in range(disks)
+        ],
+        jails=[{"id": f"jail{index}", "state": "up"} for index in range(jails)],
+        pools=[
+            {
+                "allocated": 400,
+                "encrypt": 0,
+                "encryptkey": "",
+                "fragmentation": "5",
+                "free": 600,
+                "guid": f"{index}",
+                "id": index,
+                "is_decrypted": True,
+                "name": f"pool{index}",
+                "size": 1000,
+                "status": "ONLINE",
+                "topology": {},
+            }
+            for index in range(pools)
+        ],
+        vms=[
+            {
+                "id": index,
+                "name": f"vm{index}",
+                "description": "",
+                "status": {"state": "RUNNING"},
+            }
+            for index in range(vms)
+        ],
+    )
+    server.temperatures = {f"da{index}": 35 for index in range(disks)}
+    return server
+
+
+class LoopMonitor:
+    """Measures the longest time the event loop was blocked.
+
+    A full collection of the garbage left by setting up thousands of entities
+    blocks the loop for about 0.1s whenever it happens to run, which would
+    swamp what the refreshes block it for.  Garbage is collected beforehand
+    instead, and the collector kept from running while measuring.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.max_blocked = 0.0
+        self._task: Any = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.max_blocked = max(self.max_blocked, loop.time() - expected)
+
+    def __enter__(self) -> "LoopMonitor":
+        gc.collect()
+        gc.disable()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._task.cancel()
+        gc.enable()
+
+
+async def refresh_cycle(coordinators: Dict[ResourceClass, Any]) -> float:
+    """Refreshes every resource class the way the hub does after connecting."""
+    start = time.perf_counter()
+    await coordinators[ResourceClass.DISKS].async_refresh()
+    await asyncio.gather(
+        *[
+            coordinator.async_refresh()
+            for resource_class, coordinator in coordinators.items()
+            if resource_class != ResourceClass.DISKS
+        ]
+    )
+    return time.perf_counter() - start
+
+
+def median(values: List[float]) -> float:
+    return sorted(values)[len(values) // 2]
+
+
+@pytest.fixture
+async def nas(request, socket_enabled):
+    server = synthetic_nas(request.param)
+    await server.start()
+    with patch(
+        "custom_components.truenas.connection.Machine.connect", _insecure_connect
+    ):
+        yield server
+    await server.stop()
+
+
+@pytest.mark.parametrize("nas", SIZES, indirect=True)
+async def test_setup_and_refresh(hass, enable_custom_integrations, request, nas):
+    """Benchmark setting up an entry and refreshing every resource class."""
+    start = time.perf_counter()
+    entry = await setup_entry(hass, nas)
+    setup = time.perf_counter() - start
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+
+    with LoopMonitor() as monitor, patch.object(
+        Entity, "async_write_ha_state", autospec=True
+    ) as mock_write_ha_state:
+        # Growth rates settle after the first refreshes.
+        await refresh_cycle(coordinators)
+        await refresh_cycle(coordinators)
+        mock_write_ha_state.reset_mock()
+        refresh = median([await refresh_cycle(coordinators) for _ in range(CYCLES)])
+        writes_unchanged = mock_write_ha_state.call_count // CYCLES
+
+        mock_write_ha_state.reset_mock()
+        for name in nas.temperatures:
+            nas.temperatures[name] += 1
+        await refresh_cycle(coordinators)
+        writes_changed = mock_write_ha_state.call_count
+        await hass.async_block_till_done()
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    check(
+        str(request.node.callspec.params["nas"]),
+        {
+            "setup_seconds": setup,
+            "refresh_seconds": refresh,
+            "max_loop_blocked_seconds": monitor.max_blocked,
+            "writes_per_unchanged_cycle": writes_unchanged,
+            "writes_per_changed_cycle": writes_changed,
+        },
+    )
+
+
+@pytest.mark.parametrize("nas", SIZES, indirect=True)
+async def test_memory_per_entity(hass, enable_custom_integrations, request, nas):
+    """Benchmark the memory each entity of a NAS costs."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        entry = await setup_entry(hass, nas)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    entities = len(hass.states.async_all())
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    check(
+        str(request.node.callspec.params["nas"]),
+        {"memory_per_entity_bytes": allocated / entities},
+    )
+
+
+@pytest.mark.parametrize("nas", SIZES, indirect=True)
+async def test_identity_access(hass, enable_custom_integrations, request, nas):
+    """Benchmark reading the unique id, name and device info of each entity."""
+    entry = await setup_entry(hass, nas)
+    entities = [
+        entity
+        for platform in async_get_platforms(hass, DOMAIN)
+        for entity in platform.entities.values()
+    ]
+
+    start = time.perf_counter()
+    for _ in range(IDENTITY_READS):
+        for entity in entities:
+            entity.unique_id
+            entity.name
+            entity.device_info
+    elapsed = time.perf_counter() - start
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    check(
+        str(request.node.callspec.params["nas"]),
+        {"identity_reads_seconds": elapsed},
+    )
+
+
+def check(size: str, results: Dict[str, float]) -> None:
+    """Fails on results that regressed past the baseline, or records them."""
+    _LOGGER.info("%s resources: %s", size, json.dumps(results, indent=2))
+    baseline: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    if os.environ.get("TRUENAS_BENCHMARK_UPDATE"):
+        baseline.setdefault(size, {}).update(results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        return
+
+    expected = baseline.get(size, {})
+    regressions = []
+    for name, value in results.items():
+        if name not in expected:
+            continue
+        if name.endswith("_seconds"):
+            limit = expected[name] * TIME_TOLERANCE + TIME_SLACK
+        elif name.endswith("_bytes"):
+            limit = expected[name] * MEMORY_TOLERANCE
+        else:
+            # Counts are deterministic, so any increase is a regression.
+            limit = expected[name]
+        if value > limit:
+            regressions.append(f"{name}: {value:.4g} > {limit:.4g}")
+    assert not regressions, f"{size} resources regressed: {', '.join(regressions)}"
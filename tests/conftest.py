@@ -0,0 +1,98 @@
+"""Fixtures for TrueNAS integration tests."""
+from unittest.mock import patch
+
+import pytest
+from aiotruenas_client import CachingMachine
+from custom_components.truenas.const import CONF_AUTH_API_KEY, CONF_AUTH_MODE, DOMAIN
+from homeassistant.const import (
+    CONF_API_KEY,
+    CONF_HOST,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .fake_middleware import FakeMiddleware
+
+
+@pytest.fixture
+async def middleware(socket_enabled):
+    """A fake middleware with a disk, jail, pool and virtual machine."""
+    server = FakeMiddleware(
+        disks=[
+            {
+                "description": "",
+                "identifier": "{serial}SERIAL1",
+                "model": "Some Disk",
+                "name": "ada0",
+                "serial": "SERIAL1",
+                "size": 1000,
+                "type": "HDD",
+            }
+        ],
+        jails=[{"id": "jail1", "state": "up"}],
+        pools=[
+            {
+                "allocated": 400,
+                "encrypt": 0,
+                "encryptkey": "",
+                "fragmentation": "5",
+                "free": 600,
+                "guid": "1234",
+                "id": 1,
+                "is_decrypted": True,
+                "name": "tank",
+                "size": 1000,
+                "status": "ONLINE",
+                "topology": {},
+            }
+        ],
+        vms=[
+            {
+                "id": 1,
+                "name": "vm1",
+                "description": "",
+                "status": {"state": "RUNNING"},
+            }
+        ],
+    )
+    server.temperatures = {"ada0": 35}
+    await server.start()
+    # The fake middleware does not serve TLS.
+    with patch(
+        "custom_components.truenas.connection.Machine.connect", _insecure_connect
+    ):
+        yield server
+    await server.stop()
+
+
+async def setup_entry(hass, middleware, options=None, api_key="someapikey"):
+    """Sets up a config entry backed by the fake middleware."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_HOST: middleware.host,
+            CONF_NAME: "TrueNAS",
+            CONF_USERNAME: None,
+            CONF_PASSWORD: None,
+            CONF_AUTH_MODE: CONF_AUTH_API_KEY,
+            CONF_API_KEY: api_key,
+        },
+        options=options or {},
+        title="fakenas",
+        version=3,
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await hass.data[DOMAIN][entry.entry_id]["supervisor"].async_wait_connected()
+    await hass.async_block_till_done()
+    return entry
+
+
+_connect = CachingMachine.connect
+
+
+async def _insecure_connect(self, **kwargs):
+    await _connect(self, **{**kwargs, "secure": False})
@@ -0,0 +1,245 @@
+"""A fake TrueNAS middleware websocket server for offline tests."""
+import asyncio
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import websockets
+from websockets.server import WebSocketServer, WebSocketServerProtocol
+
+
+class FakeMiddleware:
+    """Speaks enough of the middleware websocket protocol to back a `CachingMachine`.
+
+    Resources are kept as the dictionaries returned by the `*.query` methods, and
+    collection updates can be pushed to subscribed clients with `emit`.
+    """
+
+    def __init__(
+        self,
+        disks: Optional[List[Dict[str, Any]]] = None,
+        jails: Optional[List[Dict[str, Any]]] = None,
+        pools: Optional[List[Dict[str, Any]]] = None,
+        vms: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        self.disks = disks or []
+        self.jails = jails or []
+        self.pools = pools or []
+        self.vms = vms or []
+        self.alerts: List[Dict[str, Any]] = []
+        self.interfaces: List[Dict[str, Any]] = []
+        # SMART self-test logs of each disk, keyed by disk name, newest first.
+        self.smart_tests: Dict[str, List[Dict[str, Any]]] = {}
+        self.temperatures: Dict[str, Optional[int]] = {}
+        # Reporting graphs, keyed by graph name and identifier.
+        self.graphs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Names of disks that are spun down.
+        self.standby: Set[str] = set()
+        self.method_calls: List[str] = []
+        self.jobs: Dict[int, Dict[str, Any]] = {}
+        # Handlers may be coroutines to simulate a slow middleware.
+        self.methods: Dict[str, Callable[[List[Any]], Any]] = {
+            "alert.list": lambda params: self.alerts,
+            "auth.login": lambda params: True,
+            "auth.login_with_api_key": lambda params: True,
+            "core.get_jobs": lambda params: self._query(
+                list(self.jobs.values()), params
+            ),
+            "core.ping": lambda params: "pong",
+            "disk.query": lambda params: self._query(self.disks, params),
+            "disk.temperatures": self._disk_temperatures,
+            "interface.query": lambda params: self._query(self.interfaces, params),
+            "jail.query": lambda params: self._query(self.jails, params),
+            "jail.restart": lambda params: self._job("jail.restart", lambda: True),
+            "jail.start": lambda params: self._job(
+                "jail.start", lambda: self._set_jail_state(params[0], "up")
+            ),
+            "jail.stop": lambda params: self._job(
+                "jail.stop", lambda: self._set_jail_state(params[0], "down")
+            ),
+            "pool.query": lambda params: self._query(self.pools, params),
+            "reporting.get_data": self._reporting_data,
+            "smart.test.results": self._smart_test_results,
+            "system.info": lambda params: {"hostname": "fakenas"},
+            "vm.query": lambda params: self._query(self.vms, params),
+            "vm.restart": lambda params: self._job("vm.restart", lambda: None),
+            "vm.start": lambda params: self._start_vm(params[0]),
+            "vm.status": lambda params: self._vm(params[0])["status"],
+            "vm.stop": lambda params: self._job(
+                "vm.stop", lambda: self._set_vm_state(params[0], "STOPPED")
+            ),
+        }
+        self._job_id = 0
+        self._server: Optional[WebSocketServer] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # Subscribed collection names of each client, keyed by subscription id.
+        self._subscriptions: Dict[WebSocketServerProtocol, Dict[str, str]] = {}
+
+    @property
+    def host(self) -> str:
+        """The `host:port` the server is listening on."""
+        assert self._server is not None
+        port = next(iter(self._server.sockets)).getsockname()[1]
+        return f"127.0.0.1:{port}"
+
+    async def start(self) -> None:
+        self._server = await websockets.serve(self._handler, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        assert self._server is not None
+        for task in list(self._tasks):
+            task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def disconnect(self) -> None:
+        """Drops the connection of every client."""
+        for websocket in list(self._subscriptions):
+            await websocket.close()
+
+    async def emit(
+        self, collection: str, id: Any, fields: Dict[str, Any], msg: str = "changed"
+    ) -> None:
+        """Sends a collection update to every client subscribed to `collection`."""
+        message = json.dumps(
+            {"msg": msg, "collection": collection, "id": id, "fields": fields}
+        )
+        for websocket, names in list(self._subscriptions.items()):
+            if collection in names.values():
+                await websocket.send(message)
+
+    def _job(self, method: str, run: Callable[[], Any]) -> int:
+        """Starts a job that completes shortly after its id is returned."""
+        self._job_id += 1
+        job_id = self._job_id
+        fields = {
+            "id": job_id,
+            "method": method,
+            "state": "RUNNING",
+            "result": None,
+            "error": None,
+        }
+        self.jobs[job_id] = fields
+
+        async def complete() -> None:
+            # Clients only wait for a job once they have its id.
+            await asyncio.sleep(0.01)
+            try:
+                fields.update(state="SUCCESS", result=run())
+            except Exception as exc:
+                fields.update(state="FAILED", error=str(exc))
+            await self.emit("core.get_jobs", job_id, fields)
+
+        task = asyncio.create_task(complete())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    @staticmethod
+    def _query(items: List[Dict[str, Any]], params: List[Any]) -> List[Dict[str, Any]]:
+        """Applies the `=`, `>=` and `in` filters of a query."""
+        filters = params[0] if params else []
+        return [
+            item
+            for item in items
+            if all(_matches(item.get(field), op, value) for field, op, value in filters)
+        ]
+
+    def _smart_test_results(self, params: List[Any]) -> List[Dict[str, Any]]:
+        """Applies the `tests_filter` extra option to the tests of each disk."""
+        options = params[1] if len(params) > 1 else {}
+        tests_filter = options.get("extra", {}).get("tests_filter", [])
+        return self._query(
+            [
+                {"disk": name, "tests": self._query(tests, [tests_filter])}
+                for name, tests in self.smart_tests.items()
+            ],
+            params,
+        )
+
+    def _vm(self, id: int) -> Dict[str, Any]:
+        return next(vm for vm in self.vms if vm["id"] == id)
+
+    def _start_vm(self, id: int) -> bool:
+        self._set_vm_state(id, "RUNNING")
+        return True
+
+    def _set_vm_state(self, id: int, state: str) -> None:
+        self._vm(id)["status"]["state"] = state
+
+    def _set_jail_state(self, name: str, state: str) -> bool:
+        next(jail for jail in self.jails if jail["id"] == name)["state"] = state
+        return True
+
+    def _disk_temperatures(self, params: List[Any]) -> Dict[str, Optional[int]]:
+        skip_standby = len(params) > 1 and params[1] == "STANDBY"
+        return {
+            name: None
+            if skip_standby and name in self.standby
+            else self.temperatures.get(name)
+            for name in params[0]
+        }
+
+    def _reporting_data(self, params: List[Any]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": graph["name"],
+                "identifier": graph["identifier"],
+                "legend": [],
+                "data": [],
+                **self.graphs.get((graph["name"], graph["identifier"]), {}),
+            }
+            for graph in params[0]
+        ]
+
+    async def _invoke(
+        self, websocket: WebSocketServerProtocol, message: Dict[str, Any]
+    ) -> None:
+        reply: Dict[str, Any] = {"msg": "result", "id": message["id"]}
+        try:
+            result = self.methods[message["method"]](message.get("params", []))
+            if asyncio.iscoroutine(result):
+                result = await result
+            reply["result"] = result
+        except Exception as exc:
+            reply["error"] = {"error": 22, "reason": str(exc)}
+        try:
+            await websocket.send(json.dumps(reply))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _handler(self, websocket: WebSocketServerProtocol) -> None:
+        self._subscriptions[websocket] = {}
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message["msg"] == "connect":
+                    await websocket.send(
+                        json.dumps({"msg": "connected", "session": str(uuid.uuid4())})
+                    )
+                elif message["msg"] == "method":
+                    # Like the middleware, calls do not wait for each other.
+                    self.method_calls.append(message["method"])
+                    task = asyncio.create_task(self._invoke(websocket, message))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                elif message["msg"] == "sub":
+                    self._subscriptions[websocket][message["id"]] = message["name"]
+                    await websocket.send(
+                        json.dumps({"msg": "ready", "subs": [message["id"]]})
+                    )
+                elif message["msg"] == "unsub":
+                    self._subscriptions[websocket].pop(message["id"], None)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            del self._subscriptions[websocket]
+
+
+def _matches(actual: Any, op: str, value: Any) -> bool:
+    if op == "in":
+        return actual in value
+    if op == ">=":
+        return actual is not None and actual >= value
+    return actual == value
@@ -0,0 +1,51 @@
+"""Tests for the index of alerts."""
+from custom_components.truenas.alerts import AlertIndex
+
+
+def _alert(uuid, level="WARNING", **fields):
+    return {
+        "uuid": uuid,
+        "level": level,
+        "klass": "PoolStatus",
+        "formatted": f"Alert {uuid}",
+        "dismissed": False,
+        **fields,
+    }
+
+
+def test_raised_and_cleared():
+    """Test alerts are diffed by uuid against the previous refresh."""
+    alerts = AlertIndex()
+    changes = alerts.update([_alert("a"), _alert("b", "CRITICAL")])
+    assert [alert.uuid for alert in changes.raised] == ["a", "b"]
+    assert changes.cleared == []
+    assert alerts.count("WARNING") == 1
+    assert alerts.count("CRITICAL") == 1
+
+    changes = alerts.update([_alert("b", "CRITICAL"), _alert("c")])
+    assert [alert.uuid for alert in changes.raised] == ["c"]
+    assert [alert.uuid for alert in changes.cleared] == ["a"]
+    assert alerts.count("WARNING") == 1
+    assert alerts.count("CRITICAL") == 1
+    assert "a" not in alerts
+    assert alerts["c"].formatted == "Alert c"
+    assert len(alerts) == 2
+
+
+def test_dismissed_alerts_are_cleared():
+    """Test an alert that is dismissed is cleared, and no longer counted."""
+    alerts = AlertIndex()
+    alerts.update([_alert("a")])
+    changes = alerts.update([_alert("a", dismissed=True)])
+    assert [alert.uuid for alert in changes.cleared] == ["a"]
+    assert alerts.count("WARNING") == 0
+
+
+def test_level_changes_are_counted():
+    """Test an alert changing level moves between counts without an event."""
+    alerts = AlertIndex()
+    alerts.update([_alert("a")])
+    changes = alerts.update([_alert("a", "ERROR")])
+    assert changes.raised == [] and changes.cleared == []
+    assert alerts.count("WARNING") == 0
+    assert alerts.count("ERROR") == 1
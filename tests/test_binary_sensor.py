@@ -0,0 +1,101 @@
+"""Tests for the TrueNAS binary sensors."""
+from custom_components.truenas.const import DOMAIN, ResourceClass
+
+from .conftest import setup_entry
+
+
+async def test_disk_running_hot(hass, enable_custom_integrations, middleware):
+    """Test a disk much hotter than the others of the host is flagged."""
+    for index in range(1, 4):
+        middleware.disks.append(
+            {
+                **middleware.disks[0],
+                "identifier": f"{{serial}}SERIAL{index + 1}",
+                "name": f"ada{index}",
+                "serial": f"SERIAL{index + 1}",
+            }
+        )
+    middleware.temperatures = {"ada0": 35, "ada1": 34, "ada2": 36, "ada3": 35}
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][
+        ResourceClass.DISK_TEMPERATURES
+    ]
+    assert hass.states.get("binary_sensor.disk_serial1_running_hot").state == "off"
+
+    middleware.temperatures["ada0"] = 70
+    await coordinator.async_refresh()
+    state = hass.states.get("binary_sensor.disk_serial1_running_hot")
+    assert state.state == "on"
+    assert state.attributes["Peer Deviation"] == 6.5
+
+    state = hass.states.get("sensor.disk_serial1_temperature")
+    assert state.state == "70"
+    assert state.attributes["Average"] == 42.0
+    assert state.attributes["Minimum"] == 35
+    assert state.attributes["Maximum"] == 70
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_disk_failing(hass, enable_custom_integrations, middleware):
+    """Test a disk is flagged once a SMART self-test fails."""
+    middleware.smart_tests = {
+        "ada0": [
+            {
+                "num": 1,
+                "description": "Short offline",
+                "status": "SUCCESS",
+                "status_verbose": "Completed without error",
+                "remaining": 0,
+                "lifetime": 200,
+                "lba_of_first_error": None,
+            },
+            {
+                "num": 2,
+                "description": "Short offline",
+                "status": "SUCCESS",
+                "status_verbose": "Completed without error",
+                "remaining": 0,
+                "lifetime": 100,
+                "lba_of_first_error": None,
+            },
+        ]
+    }
+    smart_test_results = middleware.methods["smart.test.results"]
+    replies = []
+
+    def record_reply(params):
+        replies.append(smart_test_results(params))
+        return replies[-1]
+
+    middleware.methods["smart.test.results"] = record_reply
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][
+        ResourceClass.DISK_HEALTH
+    ]
+    assert hass.states.get("binary_sensor.disk_serial1_failing").state == "off"
+    state = hass.states.get("sensor.disk_serial1_smart_test")
+    assert state.state == "SUCCESS"
+    assert state.attributes["Lifetime Hours"] == 200
+
+    middleware.smart_tests["ada0"].insert(
+        0,
+        {
+            "num": 1,
+            "description": "Extended offline",
+            "status": "FAILED",
+            "status_verbose": "Completed: read failure",
+            "remaining": 0,
+            "lifetime": 210,
+            "lba_of_first_error": 1234,
+        },
+    )
+    await coordinator.async_refresh()
+    state = hass.states.get("binary_sensor.disk_serial1_failing")
+    assert state.state == "on"
+    assert state.attributes["LBA of First Error"] == 1234
+    assert hass.states.get("sensor.disk_serial1_smart_test").state == "FAILED"
+    # Only the tests from the latest one read on are sent again.
+    assert [test["lifetime"] for test in replies[-1][0]["tests"]] == [210, 200]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -1,12 +1,18 @@
 """Test the TrueNAS config flow."""
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
+from custom_components.truenas import async_setup_entry
 from custom_components.truenas.config_flow import CannotConnect, InvalidAuth
+from custom_components.truenas.connection import async_close, async_get_session_cache
 from custom_components.truenas.const import DOMAIN
 from homeassistant import config_entries, setup
+from homeassistant.const import CONF_SCAN_INTERVAL
+from pytest_homeassistant_custom_component.common import MockConfigEntry
 from websockets.exceptions import InvalidURI, SecurityError
 
+from .conftest import setup_entry
+
 
 @pytest.fixture(autouse=True)
 def auto_enable_custom_integrations(enable_custom_integrations):
@@ -23,8 +29,11 @@ async def test_form_password(hass):
     assert result["errors"] == {}
 
     with patch(
-        "custom_components.truenas.config_flow.Machine.create",
+        "custom_components.truenas.config_flow.create_machine",
+        return_value=AsyncMock(),
     ) as mock_machine, patch(
+        "custom_components.truenas.config_flow.async_connect"
+    ), patch(
         "custom_components.truenas.async_setup", return_value=True
     ) as mock_setup, patch(
         "custom_components.truenas.async_setup_entry",
@@ -33,6 +42,7 @@ async def test_form_password(hass):
         mock_machine.return_value.get_system_info.return_value = {
             "hostname": "somehostname"
         }
+        mock_machine.return_value.closed = False
 
         result2 = await hass.config_entries.flow.async_configure(
             result["flow_id"],
@@ -69,6 +79,9 @@ async def test_form_password(hass):
         }
     assert len(mock_setup.mock_calls) == 1
     assert len(mock_setup_entry.mock_calls) == 1
+    # The validated session is left for the entry to adopt.
+    sessions = async_get_session_cache(hass)
+    assert sessions.async_pop(result3["data"]) is mock_machine.return_value
 
 
 async def test_form_api_key(hass):
@@ -81,8 +94,11 @@ async def test_form_api_key(hass):
     assert result["errors"] == {}
 
     with patch(
-        "custom_components.truenas.config_flow.Machine.create",
+        "custom_components.truenas.config_flow.create_machine",
+        return_value=AsyncMock(),
     ) as mock_machine, patch(
+        "custom_components.truenas.config_flow.async_connect"
+    ), patch(
         "custom_components.truenas.async_setup", return_value=True
     ) as mock_setup, patch(
         "custom_components.truenas.async_setup_entry",
@@ -91,6 +107,7 @@ async def test_form_api_key(hass):
         mock_machine.return_value.get_system_info.return_value = {
             "hostname": "somehostname"
         }
+        mock_machine.return_value.closed = False
 
         result2 = await hass.config_entries.flow.async_configure(
             result["flow_id"],
@@ -126,6 +143,9 @@ async def test_form_api_key(hass):
         }
     assert len(mock_setup.mock_calls) == 1
     assert len(mock_setup_entry.mock_calls) == 1
+    # The validated session is left for the entry to adopt.
+    sessions = async_get_session_cache(hass)
+    assert sessions.async_pop(result3["data"]) is mock_machine.return_value
 
 
 async def test_form_invalid_auth(hass):
@@ -135,7 +155,7 @@ async def test_form_invalid_auth(hass):
     )
 
     with patch(
-        "custom_components.truenas.config_flow.Machine.create",
+        "custom_components.truenas.config_flow.async_connect",
         side_effect=SecurityError,
     ):
         result2 = await hass.config_entries.flow.async_configure(
@@ -165,7 +185,7 @@ async def test_form_cannot_connect(hass):
     )
 
     with patch(
-        "custom_components.truenas.config_flow.Machine.create",
+        "custom_components.truenas.config_flow.async_connect",
         side_effect=InvalidURI(uri="1.1.1.1", msg="invalid_uri"),
     ):
         result2 = await hass.config_entries.flow.async_configure(
@@ -186,3 +206,136 @@ async def test_form_cannot_connect(hass):
 
     assert result3["type"] == "form"
     assert result3["errors"] == {"base": "cannot_connect"}
+
+
+async def test_form_session_has_no_job_subscription(hass, middleware):
+    """Test the session left for the entry does not follow jobs."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    with patch(
+        "custom_components.truenas.async_setup_entry",
+        return_value=True,
+    ):
+        result2 = await hass.config_entries.flow.async_configure(
+            result["flow_id"],
+            {
+                "host": middleware.host,
+                "name": "TrueNAS",
+                "auth_mode": "API Key",
+            },
+        )
+        result3 = await hass.config_entries.flow.async_configure(
+            result2["flow_id"], {"api_key": "someapikey"}
+        )
+        await hass.async_block_till_done()
+
+    assert result3["type"] == "create_entry"
+    assert all(
+        "core.get_jobs" not in names.values()
+        for names in middleware._subscriptions.values()
+    )
+    machine = async_get_session_cache(hass).async_pop(result3["data"])
+    await async_close(machine)
+
+
+async def test_options_flow(hass):
+    """Test the refresh intervals can be configured per resource class."""
+    entry = MockConfigEntry(domain=DOMAIN, data={}, options={CONF_SCAN_INTERVAL: 60})
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    assert result["type"] == "form"
+    assert result["step_id"] == "init"
+
+    result2 = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            "disk_scan_interval": 60,
+            "disk_temperature_scan_interval": 300,
+            "jail_scan_interval": 5,
+            "pool_scan_interval": 60,
+            "vm_scan_interval": 5,
+        },
+    )
+    assert result2["type"] == "create_entry"
+    assert entry.options["vm_scan_interval"] == 5
+    assert entry.options["disk_temperature_scan_interval"] == 300
+
+
+async def test_reauth(hass):
+    """Test rejected credentials can be replaced."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            "host": "1.1.1.1",
+            "username": None,
+            "password": None,
+            "name": "TrueNAS",
+            "auth_mode": "API Key",
+            "api_key": "oldapikey",
+        },
+        version=3,
+    )
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_REAUTH, "entry_id": entry.entry_id},
+        data=entry.data,
+    )
+    assert result["type"] == "form"
+    assert result["step_id"] == "reauth_confirm"
+
+    with patch(
+        "custom_components.truenas.config_flow.create_machine",
+        return_value=AsyncMock(),
+    ) as mock_machine, patch(
+        "custom_components.truenas.config_flow.async_connect"
+    ), patch(
+        "custom_components.truenas.async_setup_entry",
+        return_value=True,
+    ) as mock_setup_entry:
+        mock_machine.return_value.get_system_info.return_value = {
+            "hostname": "somehostname"
+        }
+        mock_machine.return_value.closed = False
+
+        result2 = await hass.config_entries.flow.async_configure(
+            result["flow_id"], {"api_key": "newapikey"}
+        )
+        await hass.async_block_till_done()
+
+    assert result2["type"] == "abort"
+    assert result2["reason"] == "reauth_successful"
+    assert entry.data["api_key"] == "newapikey"
+    assert len(mock_setup_entry.mock_calls) == 1
+    sessions = async_get_session_cache(hass)
+    assert sessions.async_pop(entry.data) is mock_machine.return_value
+
+
+async def test_reauth_loaded_entry(hass, middleware):
+    """Test a loaded entry is reloaded once, without its old session."""
+    entry = await setup_entry(hass, middleware, api_key="oldapikey")
+    old_machine = hass.data[DOMAIN][entry.entry_id]["hub"].machine
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_REAUTH, "entry_id": entry.entry_id},
+        data=entry.data,
+    )
+    with patch(
+        "custom_components.truenas.async_setup_entry", wraps=async_setup_entry
+    ) as mock_setup_entry:
+        result2 = await hass.config_entries.flow.async_configure(
+            result["flow_id"], {"api_key": "newapikey"}
+        )
+        await hass.async_block_till_done()
+
+    assert result2["type"] == "abort"
+    assert result2["reason"] == "reauth_successful"
+    assert len(mock_setup_entry.mock_calls) == 1
+    assert old_machine.closed
+    assert hass.data[DOMAIN][entry.entry_id]["hub"].machine is not old_machine
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,141 @@
+"""Tests for supervising the connection to the TrueNAS machine."""
+import asyncio
+from unittest.mock import patch
+
+from custom_components.truenas import connection
+from custom_components.truenas.const import DOMAIN, ResourceClass
+from custom_components.truenas.events import TrueNASEventSubscriber
+from homeassistant.const import STATE_OFF
+from websockets.exceptions import SecurityError
+
+from .conftest import setup_entry
+
+
+async def test_reconnects_after_connection_drops(
+    hass, enable_custom_integrations, middleware
+):
+    """Test a dropped connection is reopened and entities keep working."""
+    with patch("custom_components.truenas.connection.KEEPALIVE_INTERVAL", 0.01), patch(
+        "custom_components.truenas.connection.KEEPALIVE_TIMEOUT", 1
+    ), patch("custom_components.truenas.connection.BACKOFF_BASE", 0.01):
+        entry = await setup_entry(hass, middleware)
+        data = hass.data[DOMAIN][entry.entry_id]
+        machine = data["machine"]
+        supervisor = data["supervisor"]
+        assert hass.states.get("sensor.truenas_reconnects").state == "0"
+
+        await middleware.disconnect()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if supervisor.reconnect_count == 1 and supervisor.connected:
+                break
+        await hass.async_block_till_done()
+
+        assert supervisor.reconnect_count == 1
+        assert data["machine"] is machine
+        assert not machine.closed
+        assert hass.states.get("sensor.truenas_reconnects").state == "1"
+        state = hass.states.get("sensor.truenas_disconnected_time")
+        assert state.attributes["Connected"] is True
+
+        # The cached machine and its entities carry on over the new connection.
+        middleware.vms[0]["status"]["state"] = "STOPPED"
+        await data["coordinators"][ResourceClass.VMS].async_refresh()
+        assert hass.states.get("binary_sensor.vm1_virtural_machine_running").state == (
+            STATE_OFF
+        )
+
+        assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_reload_adopts_the_open_session(
+    hass, enable_custom_integrations, middleware
+):
+    """Test changing the options reloads the entry over the same connection."""
+    entry = await setup_entry(hass, middleware)
+    machine = hass.data[DOMAIN][entry.entry_id]["machine"]
+
+    hass.config_entries.async_update_entry(entry, options={"push_updates": True})
+    await hass.async_block_till_done()
+    data = hass.data[DOMAIN][entry.entry_id]
+    await data["supervisor"].async_wait_connected()
+
+    assert data["machine"] is machine
+    assert not machine.closed
+    assert hass.states.get("binary_sensor.vm1_virtural_machine_running") is not None
+
+    # Unloading for good closes the session instead of handing it over.
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    assert machine.closed
+
+
+async def test_keeps_reconnecting_when_refreshing_fails(
+    hass, enable_custom_integrations, middleware
+):
+    """Test an error refreshing a new connection is retried rather than fatal."""
+    subscribe = TrueNASEventSubscriber.async_subscribe
+    failures = []
+
+    async def flaky_subscribe(self):
+        if not failures:
+            failures.append(self)
+            raise RuntimeError("dropped while subscribing")
+        await subscribe(self)
+
+    with patch("custom_components.truenas.connection.KEEPALIVE_INTERVAL", 0.01), patch(
+        "custom_components.truenas.connection.KEEPALIVE_TIMEOUT", 1
+    ), patch("custom_components.truenas.connection.BACKOFF_BASE", 0.01):
+        entry = await setup_entry(hass, middleware, options={"push_updates": True})
+        data = hass.data[DOMAIN][entry.entry_id]
+        supervisor = data["supervisor"]
+
+        with patch.object(TrueNASEventSubscriber, "async_subscribe", flaky_subscribe):
+            await middleware.disconnect()
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if supervisor.reconnect_count == 1 and supervisor.connected:
+                    break
+        await hass.async_block_till_done()
+
+        assert failures
+        assert supervisor.reconnect_count == 1
+        assert supervisor.connected
+        assert data["hub"].events is not None
+        assert data["hub"].events is not failures[0]
+
+        assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_reauth_starts_once_per_outage(
+    hass, enable_custom_integrations, middleware
+):
+    """Test rejected credentials start a single reauth however often retried."""
+    connect = connection.async_connect
+    attempts = []
+
+    async def rejected_connect(machine, entry):
+        attempts.append(machine)
+        if len(attempts) <= 3:
+            raise SecurityError("rejected")
+        await connect(machine, entry)
+
+    with patch("custom_components.truenas.connection.KEEPALIVE_INTERVAL", 0.01), patch(
+        "custom_components.truenas.connection.KEEPALIVE_TIMEOUT", 1
+    ), patch("custom_components.truenas.connection.BACKOFF_BASE", 0.01):
+        entry = await setup_entry(hass, middleware)
+        supervisor = hass.data[DOMAIN][entry.entry_id]["supervisor"]
+
+        with patch(
+            "custom_components.truenas.connection.async_connect", rejected_connect
+        ), patch.object(entry, "async_start_reauth") as start_reauth:
+            await middleware.disconnect()
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if supervisor.reconnect_count == 1 and supervisor.connected:
+                    break
+
+        assert len(attempts) == 4
+        assert supervisor.connected
+        start_reauth.assert_called_once()
+
+        assert await hass.config_entries.async_unload(entry.entry_id)
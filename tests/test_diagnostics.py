@@ -0,0 +1,33 @@
+"""Tests for the TrueNAS diagnostics."""
+from custom_components.truenas.const import DOMAIN, ResourceClass
+from custom_components.truenas.diagnostics import async_get_config_entry_diagnostics
+
+from .conftest import setup_entry
+
+
+async def test_diagnostics(hass, enable_custom_integrations, middleware):
+    """Test refreshes are measured per resource class and per endpoint."""
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][ResourceClass.POOLS]
+    await coordinator.async_refresh()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["entry"]["data"]["api_key"] == "**REDACTED**"
+    assert diagnostics["connection"]["connected"]
+
+    pools = diagnostics["resource_classes"]["pools"]
+    assert pools["successes"] == 2
+    assert pools["failures"] == 0
+    assert pools["latency"]["count"] == 2
+    assert pools["write_time"]["count"] == 2
+
+    pool_query = diagnostics["endpoints"]["pool.query"]
+    assert pool_query["successes"] == 2
+    assert pool_query["payload"]["last"] == 1
+    assert "disk.temperatures" in diagnostics["endpoints"]
+
+    state = hass.states.get("sensor.truenas_pools_refresh_duration")
+    assert float(state.state) >= 0
+    assert state.attributes["Successes"] == 2
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,35 @@
+"""Tests for adding and retiring entities as resources come and go."""
+from custom_components.truenas.const import DOMAIN, ResourceClass
+from homeassistant.const import STATE_OFF
+from homeassistant.helpers import entity_registry
+
+from .conftest import setup_entry
+
+
+async def test_new_and_removed_resources(hass, enable_custom_integrations, middleware):
+    """Test resources are discovered and retired without a reload."""
+    entry = await setup_entry(hass, middleware)
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    machine = hass.data[DOMAIN][entry.entry_id]["machine"]
+    registry = entity_registry.async_get(hass)
+    assert hass.states.get("binary_sensor.vm2_virtural_machine_running") is None
+
+    middleware.vms.append(
+        {"id": 2, "name": "vm2", "description": "", "status": {"state": "STOPPED"}}
+    )
+    middleware.jails.clear()
+    await coordinators[ResourceClass.VMS].async_refresh()
+    await coordinators[ResourceClass.JAILS].async_refresh()
+    await hass.async_block_till_done()
+
+    assert hass.states.get("binary_sensor.vm2_virtural_machine_running").state == (
+        STATE_OFF
+    )
+    assert hass.states.get("binary_sensor.jail1_jail_running") is None
+    assert registry.async_get("binary_sensor.jail1_jail_running") is None
+
+    # The connection is untouched.
+    assert hass.data[DOMAIN][entry.entry_id]["machine"] is machine
+    assert not machine.closed
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,54 @@
+"""Tests for push updates from middleware collection subscriptions."""
+import asyncio
+
+from custom_components.truenas.const import CONF_PUSH_UPDATES, DOMAIN, ResourceClass
+from homeassistant.const import STATE_OFF, STATE_ON
+
+from .conftest import setup_entry
+
+
+async def _wait_for_state(hass, entity_id, state):
+    for _ in range(50):
+        await hass.async_block_till_done()
+        if hass.states.get(entity_id).state == state:
+            return
+        await asyncio.sleep(0.01)
+    assert hass.states.get(entity_id).state == state
+
+
+async def test_push_updates(hass, enable_custom_integrations, middleware):
+    """Test collection updates are applied without polling."""
+    entry = await setup_entry(hass, middleware, {CONF_PUSH_UPDATES: True})
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    assert coordinators[ResourceClass.VMS].update_interval.total_seconds() == 600
+
+    assert hass.states.get("binary_sensor.vm1_virtural_machine_running").state == (
+        STATE_ON
+    )
+    assert hass.states.get("binary_sensor.jail1_jail_running").state == STATE_ON
+    assert hass.states.get("sensor.tank_pool").state == "ONLINE"
+
+    queries = middleware.method_calls.count("vm.query")
+    await middleware.emit("vm.query", 1, {"status": {"state": "STOPPED"}})
+    await middleware.emit("jail.query", "jail1", {"state": "down"})
+    await middleware.emit("pool.query", 1, {"status": "DEGRADED"})
+
+    await _wait_for_state(hass, "binary_sensor.vm1_virtural_machine_running", STATE_OFF)
+    await _wait_for_state(hass, "binary_sensor.jail1_jail_running", STATE_OFF)
+    await _wait_for_state(hass, "sensor.tank_pool", "DEGRADED")
+    assert middleware.method_calls.count("vm.query") == queries
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_polling_without_push_updates(
+    hass, enable_custom_integrations, middleware
+):
+    """Test the default mode does not subscribe to collections."""
+    entry = await setup_entry(hass, middleware, {})
+    assert hass.data[DOMAIN][entry.entry_id]["hub"].events is None
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    assert coordinators[ResourceClass.VMS].update_interval.total_seconds() == 30
+    assert hass.states.get("sensor.disk_serial1_temperature").state == "35"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
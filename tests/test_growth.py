@@ -0,0 +1,33 @@
+"""Tests for the incremental growth rate."""
+import pytest
+from custom_components.truenas.growth import GrowthTracker
+
+
+def test_rate_of_steady_growth():
+    """Test the rate of a value growing steadily is exact."""
+    growth = GrowthTracker()
+    assert growth.rate is None
+    for minute in range(10):
+        growth.add(1_700_000_000 + minute * 60, 4e12 + minute * 6000)
+    assert growth.rate == pytest.approx(100)
+
+
+def test_rate_only_covers_the_window():
+    """Test samples leaving the window no longer count."""
+    growth = GrowthTracker(size=5)
+    for second in range(5):
+        growth.add(second, 0)
+    for second in range(5, 10):
+        growth.add(second, (second - 4) * 10)
+    assert len(growth) == 5
+    assert growth.rate == pytest.approx(10)
+
+
+def test_samples_going_back_in_time_are_ignored():
+    """Test a sample older than the last one does not skew the rate."""
+    growth = GrowthTracker()
+    growth.add(10, 100)
+    growth.add(20, 200)
+    growth.add(15, 0)
+    assert len(growth) == 2
+    assert growth.rate == pytest.approx(10)
@@ -0,0 +1,153 @@
+"""Tests for sharing a TrueNAS host between config entries."""
+import asyncio
+from unittest.mock import patch
+
+from custom_components.truenas.const import DOMAIN, EVENT_ALERT_RAISED, ResourceClass
+from custom_components.truenas.events import TrueNASEventSubscriber
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from .conftest import setup_entry
+
+
+async def test_entries_for_a_host_share_a_connection(
+    hass, enable_custom_integrations, middleware
+):
+    """Test a second entry for a host reuses the connection of the first."""
+    first = await setup_entry(hass, middleware)
+    second = await setup_entry(hass, middleware)
+    first_data = hass.data[DOMAIN][first.entry_id]
+    second_data = hass.data[DOMAIN][second.entry_id]
+
+    assert first_data["hub"] is second_data["hub"]
+    assert first_data["machine"] is second_data["machine"]
+    assert middleware.method_calls.count("auth.login_with_api_key") == 1
+
+    # Both entries refreshing in the same cycle only query the host once.
+    calls = middleware.method_calls.count("vm.query")
+    await asyncio.gather(
+        first_data["coordinators"][ResourceClass.VMS].async_refresh(),
+        second_data["coordinators"][ResourceClass.VMS].async_refresh(),
+    )
+    assert middleware.method_calls.count("vm.query") == calls + 1
+    assert first_data["coordinators"][ResourceClass.VMS].last_update_success
+    assert second_data["coordinators"][ResourceClass.VMS].last_update_success
+
+    # The connection outlives the first entry, but not the last one.
+    machine = first_data["machine"]
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert not machine.closed
+    assert await hass.config_entries.async_unload(second.entry_id)
+    assert machine.closed
+    assert hass.data[DOMAIN]["hubs"] == {}
+
+
+async def test_entries_with_other_credentials_connect_on_their_own(
+    hass, enable_custom_integrations, middleware
+):
+    """Test an entry for a host with other credentials gets its own session."""
+    first = await setup_entry(hass, middleware, api_key="readonlykey")
+    second = await setup_entry(hass, middleware, api_key="adminkey")
+    first_data = hass.data[DOMAIN][first.entry_id]
+    second_data = hass.data[DOMAIN][second.entry_id]
+
+    assert first_data["hub"] is not second_data["hub"]
+    assert first_data["machine"] is not second_data["machine"]
+    assert first_data["hub"].hub_id != second_data["hub"].hub_id
+    assert middleware.method_calls.count("auth.login_with_api_key") == 2
+
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert first_data["machine"].closed
+    assert not second_data["machine"].closed
+    assert await hass.config_entries.async_unload(second.entry_id)
+    assert hass.data[DOMAIN]["hubs"] == {}
+
+
+async def test_entries_for_a_host_each_get_its_resources(
+    hass, enable_custom_integrations, middleware
+):
+    """Test the entities of disks, jails, pools and VMs are unique per entry."""
+    first = await setup_entry(hass, middleware)
+    second = await setup_entry(hass, middleware)
+    registry = er.async_get(hass)
+
+    for entry in (first, second):
+        unique_ids = {
+            entity.unique_id
+            for entity in er.async_entries_for_config_entry(registry, entry.entry_id)
+        }
+        assert f"{entry.entry_id}_serial1_running_hot" in unique_ids
+        assert f"{entry.entry_id}_jail1_binary_sensor" in unique_ids
+        assert f"{entry.entry_id}_1_binary_sensor" in unique_ids
+        assert f"{entry.entry_id}_1234" in unique_ids
+        assert f"{entry.entry_id}_1234_allocated" in unique_ids
+
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert await hass.config_entries.async_unload(second.entry_id)
+
+
+async def test_entries_for_a_host_share_alert_events(
+    hass, enable_custom_integrations, middleware
+):
+    """Test an alert raised on a shared host fires a single event."""
+    first = await setup_entry(hass, middleware)
+    second = await setup_entry(hass, middleware)
+    raised = async_capture_events(hass, EVENT_ALERT_RAISED)
+    alerts = [
+        hass.data[DOMAIN][entry.entry_id]["coordinators"][ResourceClass.ALERTS]
+        for entry in (first, second)
+    ]
+    # Both entries have read the host before the alert is raised.
+    for coordinator in alerts:
+        await coordinator.async_refresh()
+
+    middleware.alerts = [
+        {
+            "uuid": "pool",
+            "level": "CRITICAL",
+            "klass": "PoolStatus",
+            "formatted": "Pool tank state is DEGRADED",
+            "dismissed": False,
+        }
+    ]
+    # Each entry queries the host on its own rather than sharing a result.
+    with patch("custom_components.truenas.hub.SHARED_RESULT_TTL", 0):
+        for coordinator in alerts:
+            await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert [event.data["uuid"] for event in raised] == ["pool"]
+    assert raised[0].data["entry_id"] == first.entry_id
+    assert hass.states.get("sensor.truenas_critical_alerts").state == "1"
+    assert hass.states.get("sensor.truenas_critical_alerts_2").state == "1"
+
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert await hass.config_entries.async_unload(second.entry_id)
+
+
+async def test_failed_subscription_is_retried(
+    hass, enable_custom_integrations, middleware
+):
+    """Test a subscription that fails is not kept half subscribed."""
+    first = await setup_entry(hass, middleware)
+    hub = hass.data[DOMAIN][first.entry_id]["hub"]
+
+    with patch.object(
+        TrueNASEventSubscriber,
+        "async_subscribe",
+        side_effect=RuntimeError("dropped while subscribing"),
+    ) as subscribe:
+        second = await setup_entry(hass, middleware, options={"push_updates": True})
+        # The joining entry subscribes in the background.
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if subscribe.called:
+                break
+    assert subscribe.called
+    assert hub.events is None
+
+    await hub._async_update_subscription()
+    assert hub.events is not None
+
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert await hass.config_entries.async_unload(second.entry_id)
@@ -0,0 +1,66 @@
+"""Tests for the identity of entities."""
+import pytest
+from custom_components.truenas.identity import identity, shared_device_info
+
+
+class Entity:
+    def __init__(self, name: str) -> None:
+        self.name_of_backing_object = name
+        self.computed = 0
+
+    @property
+    def _identity_key(self):
+        return self.name_of_backing_object
+
+    @identity
+    def name(self) -> str:
+        self.computed += 1
+        return f"{self.name_of_backing_object} Pool"
+
+    @identity
+    def device_info(self):
+        self.computed += 1
+        return {"name": self.name_of_backing_object}
+
+
+def test_computed_once():
+    """Test values are only computed on the first access."""
+    entity = Entity("tank")
+    assert entity.name == "tank Pool"
+    assert entity.name == "tank Pool"
+    assert entity.device_info == {"name": "tank"}
+    assert entity.device_info is entity.device_info
+    assert entity.computed == 2
+
+
+def test_computed_again_when_the_key_changes():
+    """Test every value is computed again once the backing object is renamed."""
+    entity = Entity("tank")
+    assert entity.name == "tank Pool"
+    assert entity.device_info == {"name": "tank"}
+
+    entity.name_of_backing_object = "vault"
+    assert entity.name == "vault Pool"
+    assert entity.device_info == {"name": "vault"}
+    assert entity.computed == 4
+
+
+def test_read_only():
+    """Test values cannot be assigned."""
+    entity = Entity("tank")
+    with pytest.raises(AttributeError):
+        entity.name = "other"
+
+
+def test_device_info_shared():
+    """Test entities of a device share its device info, rather than copies."""
+    device_info = shared_device_info(identifiers={("truenas", "serial1")}, name="ada0")
+    assert device_info == {"identifiers": {("truenas", "serial1")}, "name": "ada0"}
+    assert (
+        shared_device_info(identifiers={("truenas", "serial1")}, name="ada0")
+        is device_info
+    )
+    assert (
+        shared_device_info(identifiers={("truenas", "serial1")}, name="ada1")
+        is not device_info
+    )
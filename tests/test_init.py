@@ -1,11 +1,31 @@
 """Tests for init module."""
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
 
 from custom_components import truenas
-from custom_components.truenas.const import CONF_AUTH_MODE, CONF_AUTH_PASSWORD, DOMAIN
+from custom_components.truenas.const import (
+    CONF_AUTH_API_KEY,
+    CONF_AUTH_MODE,
+    CONF_AUTH_PASSWORD,
+    CONF_VM_SCAN_INTERVAL,
+    DOMAIN,
+    ResourceClass,
+)
 from homeassistant.config_entries import CONN_CLASS_CLOUD_POLL, SOURCE_USER
-from homeassistant.const import CONF_API_KEY, CONF_NAME, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.const import (
+    CONF_API_KEY,
+    CONF_HOST,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+)
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import Entity
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from .conftest import setup_entry
+
 
 async def test_config_flow_entry_migrate(hass):
     """Test that config flow entry is migrated correctly."""
@@ -36,5 +56,194 @@ async def test_config_flow_entry_migrate(hass):
     await hass.async_block_till_done()
 
     # Test that config entry is at the current version with new data
-    assert entry.version == 2
+    assert entry.version == 3
     assert entry.data == expected_new_config_data
+
+
+async def test_config_flow_entry_migrate_unique_ids(hass):
+    """Test that resource unique ids are scoped by the config entry."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={CONF_HOST: "1.1.1.1", CONF_NAME: "TrueNAS"},
+        title="somehostname",
+        version=2,
+    )
+    entry.add_to_hass(hass)
+    registry = er.async_get(hass)
+    old_unique_ids = {
+        "binary_sensor": "none_serial1_running_hot",
+        "sensor": "1234_allocated",
+    }
+    for domain, unique_id in old_unique_ids.items():
+        registry.async_get_or_create(
+            domain, DOMAIN, unique_id, config_entry=entry, suggested_object_id=domain
+        )
+    registry.async_get_or_create(
+        "sensor", DOMAIN, f"{entry.entry_id}_cpu_usage", config_entry=entry
+    )
+
+    await truenas.async_migrate_entry(hass, entry)
+    await hass.async_block_till_done()
+
+    assert entry.version == 3
+    assert {
+        entity.unique_id
+        for entity in er.async_entries_for_config_entry(registry, entry.entry_id)
+    } == {
+        f"{entry.entry_id}_serial1_running_hot",
+        f"{entry.entry_id}_1234_allocated",
+        f"{entry.entry_id}_cpu_usage",
+    }
+    # The entities keep their entity ids.
+    assert registry.async_get("binary_sensor.binary_sensor") is not None
+    assert registry.async_get("sensor.sensor") is not None
+
+
+async def test_setup_entry_creates_coordinator_per_resource_class(
+    hass, enable_custom_integrations
+):
+    """Test that each resource class is refreshed by its own coordinator."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_HOST: "1.1.1.1",
+            CONF_NAME: "TrueNAS",
+            CONF_USERNAME: None,
+            CONF_PASSWORD: None,
+            CONF_AUTH_MODE: CONF_AUTH_API_KEY,
+            CONF_API_KEY: "someapikey",
+        },
+        options={CONF_VM_SCAN_INTERVAL: 5},
+        title="somehostname",
+        version=3,
+    )
+    entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.truenas.create_machine"
+    ) as mock_create_machine, patch("custom_components.truenas.async_connect"):
+        machine = mock_create_machine.return_value
+        machine.closed = False
+        machine.disks = []
+        machine.jails = []
+        machine.pools = []
+        machine.vms = []
+        machine.get_disks = AsyncMock()
+        machine.get_jails = AsyncMock()
+        machine.get_pools = AsyncMock(return_value=[])
+        machine.get_vms = AsyncMock()
+        machine.invoke_method = AsyncMock(return_value=[])
+        machine.close = AsyncMock()
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        await hass.data[DOMAIN][entry.entry_id]["supervisor"].async_wait_connected()
+
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    assert set(coordinators) == set(ResourceClass)
+    assert coordinators[ResourceClass.VMS].update_interval == timedelta(seconds=5)
+    assert coordinators[ResourceClass.DISK_TEMPERATURES].update_interval == timedelta(
+        seconds=300
+    )
+    machine.get_disks.assert_awaited_once_with()
+    machine.get_pools.assert_awaited_once_with()
+    machine.get_vms.assert_awaited_once_with()
+
+    # Refreshing one resource class does not fetch any of the others.
+    await coordinators[ResourceClass.VMS].async_refresh()
+    assert machine.get_vms.await_count == 2
+    assert machine.get_disks.await_count == 1
+    assert machine.get_jails.await_count == 1
+    assert machine.get_pools.await_count == 1
+    methods = [call.args[0] for call in machine.invoke_method.await_args_list]
+    assert sorted(methods) == [
+        "alert.list",
+        "interface.query",
+        "reporting.get_data",
+    ]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_unchanged_entities_are_not_written(
+    hass, enable_custom_integrations, middleware
+):
+    """Test a refresh only writes the state of entities that changed."""
+    entry = await setup_entry(hass, middleware)
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    # Growth rates are only known from the second sample of a pool on.
+    await coordinators[ResourceClass.POOLS].async_refresh()
+    await coordinators[ResourceClass.POOLS].async_refresh()
+
+    def written_entity_ids(mock_write_ha_state):
+        # The last refresh and refresh duration diagnostic sensors change on
+        # every refresh.
+        return [
+            call.args[0].entity_id
+            for call in mock_write_ha_state.call_args_list
+            if not call.args[0].entity_id.endswith(
+                ("_last_refresh", "_refresh_duration")
+            )
+        ]
+
+    with patch.object(
+        Entity, "async_write_ha_state", autospec=True
+    ) as mock_write_ha_state:
+        await coordinators[ResourceClass.POOLS].async_refresh()
+        await coordinators[ResourceClass.DISK_TEMPERATURES].async_refresh()
+        assert written_entity_ids(mock_write_ha_state) == []
+
+        middleware.temperatures["ada0"] = 40
+        await coordinators[ResourceClass.POOLS].async_refresh()
+        await coordinators[ResourceClass.DISK_TEMPERATURES].async_refresh()
+        assert written_entity_ids(mock_write_ha_state) == [
+            "sensor.disk_serial1_temperature"
+        ]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_failing_resource_class_does_not_stop_others(
+    hass, enable_custom_integrations, middleware
+):
+    """Test one failing endpoint only affects its own resource class."""
+    entry = await setup_entry(hass, middleware)
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
+    last_pool_refresh = coordinators[ResourceClass.POOLS].last_success_time
+    assert last_pool_refresh is not None
+
+    async def slow_temperatures(params):
+        await asyncio.sleep(1)
+        return {}
+
+    middleware.methods["disk.temperatures"] = slow_temperatures
+    middleware.pools[0]["status"] = "DEGRADED"
+    with patch.object(coordinators[ResourceClass.DISK_TEMPERATURES], "_timeout", 0.1):
+        await coordinators[ResourceClass.DISK_TEMPERATURES].async_refresh()
+    await coordinators[ResourceClass.POOLS].async_refresh()
+
+    assert not coordinators[ResourceClass.DISK_TEMPERATURES].last_update_success
+    assert coordinators[ResourceClass.POOLS].last_update_success
+    assert coordinators[ResourceClass.POOLS].last_success_time > last_pool_refresh
+    assert hass.states.get("sensor.tank_pool").state == "DEGRADED"
+
+    state = hass.states.get("sensor.truenas_disk_temperatures_last_refresh")
+    assert state.attributes["Last Update Succeeded"] is False
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_refresh_requests_are_coalesced(
+    hass, enable_custom_integrations, middleware
+):
+    """Test many entities asking for a refresh at once cause a single fetch."""
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][ResourceClass.VMS]
+    queries = middleware.method_calls.count("vm.query")
+
+    with patch("custom_components.truenas.coordinator.COALESCE_WINDOW", 0.01):
+        await asyncio.gather(*[coordinator.async_request_refresh() for _ in range(150)])
+
+    assert middleware.method_calls.count("vm.query") == queries + 1
+    assert coordinator.coalesced_requests == 149
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
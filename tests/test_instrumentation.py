@@ -0,0 +1,40 @@
+"""Tests for the measurement of refreshes."""
+import pytest
+from custom_components.truenas.instrumentation import Histogram, RefreshStats
+
+
+def test_histogram():
+    """Test observations are counted in buckets and summarized."""
+    histogram = Histogram((1, 10, 100))
+    for value in (0.5, 2, 3, 50, 500):
+        histogram.observe(value)
+
+    assert histogram.count == 5
+    assert histogram.mean == pytest.approx(111.1)
+    assert histogram.percentile(50) == 10
+    assert histogram.percentile(95) == 500
+    assert histogram.as_dict()["buckets"] == {
+        "le_1": 1,
+        "le_10": 2,
+        "le_100": 1,
+        "inf": 1,
+    }
+
+
+async def test_refresh_stats():
+    """Test successes and failures are both timed."""
+    stats = RefreshStats()
+
+    async def succeed():
+        return [1, 2]
+
+    async def fail():
+        raise ValueError
+
+    assert await stats.async_measure(succeed) == [1, 2]
+    with pytest.raises(ValueError):
+        await stats.async_measure(fail)
+
+    assert stats.successes == 1
+    assert stats.failures == 1
+    assert stats.latency.count == 2
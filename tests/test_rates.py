@@ -0,0 +1,42 @@
+"""Tests for the rates of counters."""
+from custom_components.truenas.rates import CounterRates
+
+
+def test_rates():
+    """Test rates are known from the second sample of a counter on."""
+    rates = CounterRates(2)
+    rates.update(0, {"em0": (1000, 2000)})
+    assert rates.rate("em0", 0) is None
+
+    rates.update(10, {"em0": (2000, 2500), "em1": (0, 0)})
+    assert rates.rate("em0", 0) == 100
+    assert rates.rate("em0", 1) == 50
+    assert rates.rate("em1", 0) is None
+    assert rates.rate("em2", 0) is None
+    assert rates.names == ["em0", "em1"]
+
+    # Interfaces that went away are forgotten.
+    rates.update(20, {"em1": (100, 100)})
+    assert "em0" not in rates
+    assert len(rates) == 1
+    assert rates.rate("em1", 0) == 10
+
+
+def test_rates_of_wrapped_counters():
+    """Test counters wrapping around at 32 or 64 bits keep their rate."""
+    rates = CounterRates(2)
+    rates.update(0, {"em0": (2**32 - 100, 2**64 - 100)})
+    rates.update(10, {"em0": (900, 900)})
+    assert rates.rate("em0", 0) == 100
+    assert rates.rate("em0", 1) == 100
+
+
+def test_rates_of_reset_counters():
+    """Test counters that were reset have no rate until the next sample."""
+    rates = CounterRates(1)
+    rates.update(0, {"em0": (5000,)})
+    rates.update(10, {"em0": (100,)})
+    assert rates.rate("em0", 0) is None
+
+    rates.update(20, {"em0": (1100,)})
+    assert rates.rate("em0", 0) == 100
@@ -0,0 +1,70 @@
+"""Tests for the reduction of reporting graphs."""
+import numpy as np
+import pytest
+from custom_components.truenas.reporting import (
+    Reading,
+    Summary,
+    reduce_graphs,
+    summarize,
+)
+
+
+def test_reduce_graphs():
+    """Test every series is reduced to its latest value and its average."""
+    readings = reduce_graphs(
+        [
+            {
+                "name": "disk",
+                "identifier": "ada0",
+                "legend": ["read", "write"],
+                "data": [[100, 10], [200, None], [None, None]],
+            },
+            {
+                "name": "diskgeombusy",
+                "identifier": "ada0",
+                "legend": ["busy"],
+                "data": [[50]],
+            },
+        ]
+    )
+
+    assert readings == {
+        ("disk", "ada0"): [Reading(200, 150), Reading(10, 10)],
+        ("diskgeombusy", "ada0"): [Reading(50, 50)],
+    }
+
+
+def test_reduce_graphs_without_data():
+    """Test series without any value have no reading."""
+    assert reduce_graphs([]) == {}
+    assert reduce_graphs(
+        [
+            {
+                "name": "disk",
+                "identifier": "ada0",
+                "legend": ["read", "write"],
+                "data": [[None, None]],
+            },
+            {"name": "diskgeombusy", "identifier": "ada0", "legend": [], "data": []},
+        ]
+    ) == {
+        ("disk", "ada0"): [Reading(None, None), Reading(None, None)],
+        ("diskgeombusy", "ada0"): [],
+    }
+
+
+def test_summarize():
+    """Test each series is summarized, ignoring gaps in it."""
+    summaries = summarize(
+        {
+            "cpu": np.array([10.0, 20.0, np.nan, 30.0]),
+            "load": np.arange(1.0, 101.0),
+            "memory": None,
+        }
+    )
+
+    assert summaries["cpu"] == Summary(10, 20, 30, 29)
+    assert summaries["load"].minimum == 1
+    assert summaries["load"].maximum == 100
+    assert summaries["load"].p95 == pytest.approx(95.05)
+    assert summaries["memory"] == Summary(None, None, None, None)
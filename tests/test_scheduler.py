@@ -0,0 +1,53 @@
+"""Tests for spreading refreshes across TrueNAS hosts."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from custom_components.truenas.scheduler import RefreshScheduler
+
+
+def test_phases_are_deterministic_and_spread():
+    """Test each host refreshes at its own, stable point of the interval."""
+    interval = timedelta(seconds=30)
+    phases = [
+        RefreshScheduler.phase(f"nas{index}-vms", interval) for index in range(30)
+    ]
+
+    assert phases == [
+        RefreshScheduler.phase(f"nas{index}-vms", interval) for index in range(30)
+    ]
+    assert all(0 <= phase < 30 for phase in phases)
+    # Thirty hosts do not all land in the same few seconds.
+    assert len({int(phase) for phase in phases}) > 10
+
+
+def test_next_refresh_lands_on_the_phase():
+    """Test the next refresh is the next occurrence of the phase."""
+    scheduler = RefreshScheduler()
+    interval = timedelta(seconds=30)
+    phase = scheduler.phase("nas-vms", interval)
+    now = datetime(2023, 4, 1, tzinfo=timezone.utc)
+
+    first = scheduler.next_refresh("nas-vms", interval, now)
+    assert now < first <= now + interval
+    offset = (first.timestamp() - phase) % 30
+    assert min(offset, 30 - offset) < 1e-6
+    second = scheduler.next_refresh("nas-vms", interval, first)
+    assert second - first == interval
+
+
+async def test_slot_caps_concurrent_refreshes():
+    """Test no more refreshes than allowed run at once."""
+    scheduler = RefreshScheduler(max_concurrent=2)
+    running = 0
+    most = 0
+
+    async def refresh():
+        nonlocal running, most
+        async with scheduler.slot():
+            running += 1
+            most = max(most, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[refresh() for _ in range(6)])
+    assert most == 2
@@ -0,0 +1,245 @@
+"""Tests for the TrueNAS sensors."""
+from datetime import timedelta
+from unittest.mock import patch
+
+from custom_components.truenas.const import (
+    CONF_SKIP_STANDBY_DISKS,
+    DOMAIN,
+    EVENT_ALERT_CLEARED,
+    EVENT_ALERT_RAISED,
+    ResourceClass,
+)
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from .conftest import setup_entry
+
+
+async def test_disk_temperature_skips_standby_disks(
+    hass, enable_custom_integrations, middleware
+):
+    """Test disks in standby keep their last known temperature."""
+    entry = await setup_entry(hass, middleware, {CONF_SKIP_STANDBY_DISKS: True})
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][
+        ResourceClass.DISK_TEMPERATURES
+    ]
+
+    state = hass.states.get("sensor.disk_serial1_temperature")
+    assert state.state == "35"
+    assert state.attributes["Stale"] is False
+
+    middleware.standby.add("ada0")
+    middleware.temperatures["ada0"] = 20
+    await coordinator.async_refresh()
+    state = hass.states.get("sensor.disk_serial1_temperature")
+    assert state.state == "35"
+    assert state.attributes["Stale"] is True
+
+    middleware.standby.clear()
+    await coordinator.async_refresh()
+    state = hass.states.get("sensor.disk_serial1_temperature")
+    assert state.state == "20"
+    assert state.attributes["Stale"] is False
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_disk_io(hass, enable_custom_integrations, middleware):
+    """Test disk throughput is read from a single batched reporting query."""
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][
+        ResourceClass.DISK_IO
+    ]
+    assert hass.states.get("sensor.disk_serial1_read_rate").state == "unknown"
+
+    middleware.graphs[("disk", "ada0")] = {
+        "legend": ["read", "write"],
+        "data": [[1000, 300], [3000, None]],
+    }
+    middleware.graphs[("diskgeombusy", "ada0")] = {
+        "legend": ["busy"],
+        "data": [[12.5]],
+    }
+    calls = middleware.method_calls.count("reporting.get_data")
+    await coordinator.async_refresh()
+    assert middleware.method_calls.count("reporting.get_data") == calls + 1
+
+    state = hass.states.get("sensor.disk_serial1_read_rate")
+    assert state.state == "3000.0"
+    assert state.attributes["Average"] == 2000.0
+    assert hass.states.get("sensor.disk_serial1_write_rate").state == "300.0"
+    assert hass.states.get("sensor.disk_serial1_busy").state == "12.5"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_host_stats(hass, enable_custom_integrations, middleware):
+    """Test the load of the host is summarized over the reporting window."""
+    middleware.graphs[("cpu", None)] = {
+        "legend": ["cpu-user", "cpu-idle"],
+        "data": [[10, 90], [30, 70], [None, None]],
+    }
+    middleware.graphs[("memory", None)] = {
+        "legend": ["memory-active_value", "memory-free_value"],
+        "data": [[250, 750], [500, 500]],
+    }
+    middleware.graphs[("arcratio", None)] = {
+        "legend": ["cache_ratio-arc_value", "cache_ratio-L2_value"],
+        "data": [[90, 0]],
+    }
+    entry = await setup_entry(hass, middleware)
+
+    state = hass.states.get("sensor.truenas_cpu_usage")
+    assert state.state == "20.0"
+    assert state.attributes["Minimum"] == 10.0
+    assert state.attributes["Maximum"] == 30.0
+    assert hass.states.get("sensor.truenas_memory_usage").state == "37.5"
+    assert hass.states.get("sensor.truenas_arc_hit_ratio").state == "90.0"
+    assert hass.states.get("sensor.truenas_load").state == "unknown"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_interface_rates(hass, enable_custom_integrations, middleware):
+    """Test network interfaces are found and their counters turned into rates."""
+
+    def interface(received, sent):
+        return {
+            "name": "em0",
+            "state": {
+                "link_state": "LINK_STATE_UP",
+                "aliases": [
+                    {
+                        "type": "LINK",
+                        "stats": {"received_bytes": received, "sent_bytes": sent},
+                    }
+                ],
+            },
+        }
+
+    middleware.interfaces = [interface(1000, 1000)]
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][
+        ResourceClass.INTERFACES
+    ]
+    state = hass.states.get("sensor.truenas_em0_received")
+    assert state.state == "unknown"
+    assert state.attributes["Link State"] == "LINK_STATE_UP"
+
+    middleware.interfaces = [interface(2000, 1000)]
+    await coordinator.async_refresh()
+    assert float(hass.states.get("sensor.truenas_em0_received").state) > 0
+    assert hass.states.get("sensor.truenas_em0_sent").state == "0.0"
+
+    # A counter that was reset has no rate, rather than a negative one.
+    middleware.interfaces = [interface(10, 1000)]
+    await coordinator.async_refresh()
+    assert hass.states.get("sensor.truenas_em0_received").state == "unknown"
+
+    middleware.interfaces = []
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.truenas_em0_received") is None
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_pool_capacity(hass, enable_custom_integrations, middleware):
+    """Test pool capacity and its projection from the growth of the pool."""
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][ResourceClass.POOLS]
+
+    assert hass.states.get("sensor.tank_pool_allocated").state == "400"
+    assert hass.states.get("sensor.tank_pool_free").state == "600"
+    assert hass.states.get("sensor.tank_pool_used").state == "40.0"
+    assert hass.states.get("sensor.tank_pool_fragmentation").state == "5.0"
+
+    # The pool grows by 100 bytes a day.
+    start = dt_util.utcnow()
+    for day in range(1, 4):
+        middleware.pools[0].update(allocated=400 + day * 100, free=600 - day * 100)
+        with patch(
+            "custom_components.truenas.sensor.dt_util.utcnow",
+            return_value=start + timedelta(days=day),
+        ):
+            await coordinator.async_refresh()
+
+    assert hass.states.get("sensor.tank_pool_growth_rate").state == "100"
+    assert hass.states.get("sensor.tank_pool_days_until_full").state == "3.0"
+
+    # Neither a failed refresh nor one finding the same capacity is sampled.
+    pool_query = middleware.methods["pool.query"]
+    for day in (5, 6):
+        middleware.methods["pool.query"] = _unreachable if day == 5 else pool_query
+        with patch(
+            "custom_components.truenas.sensor.dt_util.utcnow",
+            return_value=start + timedelta(days=day),
+        ):
+            await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert hass.states.get("sensor.tank_pool_growth_rate").state == "100"
+
+    # A renamed pool is written even though its capacity is the same.
+    middleware.pools[0]["name"] = "vault"
+    await coordinator.async_refresh()
+    state = hass.states.get("sensor.tank_pool_allocated")
+    assert state.attributes["friendly_name"] == "vault Pool Allocated"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_alerts(hass, enable_custom_integrations, middleware):
+    """Test alerts are counted per level, and events fired only as they change."""
+    pool_alert = {
+        "uuid": "pool",
+        "level": "CRITICAL",
+        "klass": "PoolStatus",
+        "formatted": "Pool tank state is DEGRADED",
+        "dismissed": False,
+    }
+    middleware.alerts = [pool_alert]
+    raised = async_capture_events(hass, EVENT_ALERT_RAISED)
+    cleared = async_capture_events(hass, EVENT_ALERT_CLEARED)
+    entry = await setup_entry(hass, middleware)
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinators"][
+        ResourceClass.ALERTS
+    ]
+    assert hass.states.get("sensor.truenas_critical_alerts").state == "1"
+    assert hass.states.get("sensor.truenas_warning_alerts").state == "0"
+    # Alerts raised before the entry was set up are not reported as new.
+    assert raised == []
+
+    middleware.alerts = [
+        {
+            "uuid": "certificate",
+            "level": "WARNING",
+            "klass": "CertificateExpiring",
+            "formatted": "Certificate is expiring",
+            "dismissed": False,
+        }
+    ]
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.truenas_critical_alerts").state == "0"
+    assert hass.states.get("sensor.truenas_warning_alerts").state == "1"
+    assert [event.data for event in raised] == [
+        {
+            "entry_id": entry.entry_id,
+            "uuid": "certificate",
+            "level": "WARNING",
+            "klass": "CertificateExpiring",
+            "formatted": "Certificate is expiring",
+        }
+    ]
+    assert [event.data["uuid"] for event in cleared] == ["pool"]
+
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert len(raised) == 1
+    assert len(cleared) == 1
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+def _unreachable(params):
+    raise OSError("pool unreachable")
@@ -0,0 +1,195 @@
+"""Tests for the bulk jail and virtual machine services, and profiling."""
+import asyncio
+import os
+from datetime import timedelta
+
+import pytest
+from custom_components.truenas.const import (
+    DOMAIN,
+    EVENT_BULK_COMPLETED,
+    EVENT_PROFILE_COMPLETED,
+)
+from homeassistant.const import STATE_OFF, STATE_ON
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import (
+    async_capture_events,
+    async_fire_time_changed,
+)
+
+from .conftest import setup_entry
+
+
+async def test_vm_bulk_stop(hass, enable_custom_integrations, middleware):
+    """Test many virtual machines are stopped, with a result for each."""
+    middleware.vms.append(
+        {"id": 2, "name": "vm2", "description": "", "status": {"state": "RUNNING"}}
+    )
+    entry = await setup_entry(hass, middleware)
+    events = async_capture_events(hass, EVENT_BULK_COMPLETED)
+    queries = middleware.method_calls.count("vm.query")
+
+    await hass.services.async_call(
+        DOMAIN,
+        "vm_bulk",
+        {
+            "entity_id": [
+                "binary_sensor.vm1_virtural_machine_running",
+                "binary_sensor.vm2_virtural_machine_running",
+                "binary_sensor.missing",
+            ],
+            "action": "stop",
+            "max_concurrent": 2,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    assert middleware.method_calls.count("vm.stop") == 2
+    assert [vm["status"]["state"] for vm in middleware.vms] == ["STOPPED", "STOPPED"]
+    # The batch is followed by a single refresh of all of them.
+    assert middleware.method_calls.count("vm.query") == queries + 1
+    assert hass.states.get("binary_sensor.vm1_virtural_machine_running").state == (
+        STATE_OFF
+    )
+
+    assert len(events) == 1
+    results = events[0].data["results"]
+    assert results["binary_sensor.vm1_virtural_machine_running"] == "success"
+    assert results["binary_sensor.vm2_virtural_machine_running"] == "success"
+    assert results["binary_sensor.missing"] != "success"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_jail_bulk_reports_failures(hass, enable_custom_integrations, middleware):
+    """Test a failing target does not stop the others."""
+    middleware.jails.append({"id": "jail2", "state": "down"})
+    entry = await setup_entry(hass, middleware)
+    events = async_capture_events(hass, EVENT_BULK_COMPLETED)
+    queries = middleware.method_calls.count("jail.query")
+
+    await hass.services.async_call(
+        DOMAIN,
+        "jail_bulk",
+        {
+            "entity_id": [
+                "binary_sensor.jail1_jail_running",
+                "binary_sensor.jail2_jail_running",
+            ],
+            "action": "start",
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    results = events[0].data["results"]
+    # The first jail is already running.
+    assert results["binary_sensor.jail1_jail_running"] != "success"
+    assert results["binary_sensor.jail2_jail_running"] == "success"
+    assert hass.states.get("binary_sensor.jail2_jail_running").state == STATE_ON
+    assert middleware.method_calls.count("jail.query") == queries + 1
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_control_refreshes_only_the_target(
+    hass, enable_custom_integrations, middleware
+):
+    """Test a control action is reflected without a full refresh."""
+    entry = await setup_entry(hass, middleware)
+    calls = len(middleware.method_calls)
+
+    await hass.services.async_call(
+        DOMAIN,
+        "jail_stop",
+        {"entity_id": "binary_sensor.jail1_jail_running"},
+        blocking=True,
+    )
+
+    assert hass.states.get("binary_sensor.jail1_jail_running").state == STATE_OFF
+    calls = middleware.method_calls[calls:]
+    assert calls[0] == "jail.stop"
+    assert "core.get_jobs" in calls
+    assert calls[-1] == "jail.query"
+    assert "disk.query" not in calls and "pool.query" not in calls
+    # Jobs are polled rather than followed through a subscription.
+    assert all(
+        "core.get_jobs" not in names.values()
+        for names in middleware._subscriptions.values()
+    )
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_control_reports_the_job_error(
+    hass, enable_custom_integrations, middleware
+):
+    """Test a failed job is reported even when refreshing the jail fails too."""
+    entry = await setup_entry(hass, middleware)
+
+    def fail(message):
+        raise RuntimeError(message)
+
+    middleware.methods["jail.stop"] = lambda params: middleware._job(
+        "jail.stop", lambda: fail("jail is busy")
+    )
+    middleware.methods["jail.query"] = lambda params: fail("query failed")
+
+    with pytest.raises(HomeAssistantError, match="jail is busy"):
+        await hass.services.async_call(
+            DOMAIN,
+            "jail_stop",
+            {"entity_id": "binary_sensor.jail1_jail_running"},
+            blocking=True,
+        )
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_profile(hass, enable_custom_integrations, middleware, tmp_path):
+    """Test scheduled refreshes are profiled into the configuration directory."""
+    hass.config.config_dir = str(tmp_path)
+    entry = await setup_entry(hass, middleware)
+    events = async_capture_events(hass, EVENT_PROFILE_COMPLETED)
+    queries = middleware.method_calls.count("pool.query")
+
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"].values()
+
+    def refreshes():
+        return [c.stats.successes + c.stats.failures for c in coordinators]
+
+    # The service call is waited for by `async_block_till_done`, so the
+    # scheduled refreshes are waited for one by one instead.
+    profile = asyncio.ensure_future(
+        hass.services.async_call(
+            DOMAIN, "profile", {"entry_id": entry.entry_id, "cycles": 2}, blocking=True
+        )
+    )
+    await asyncio.sleep(0.1)
+    # The profile runs no refresh of its own, and waits for the schedule.
+    assert middleware.method_calls.count("pool.query") == queries
+    assert not profile.done()
+    before = refreshes()
+    for hour in (1, 2):
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(hours=hour))
+        while any(now < then + hour for now, then in zip(refreshes(), before)):
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(profile, 10)
+    await hass.async_block_till_done()
+
+    assert middleware.method_calls.count("pool.query") == queries + 2
+    assert len(events) == 1
+    assert os.path.getsize(events[0].data["stats"]) > 0
+    with open(events[0].data["summary"], encoding="utf-8") as summary:
+        text = summary.read()
+    assert "2 scheduled refresh(es)" in text
+    assert "pool.query" in text
+    assert "cumulative" in text
+
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(
+            DOMAIN, "profile", {"entry_id": "missing"}, blocking=True
+        )
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,74 @@
+"""Tests for the incremental SMART results."""
+from custom_components.truenas.smart import SmartResults, SmartTest
+
+SERIALS = {"ada0": "SERIAL1", "ada1": "SERIAL2"}
+
+
+def _test(lifetime, status="SUCCESS", **fields):
+    return {
+        "num": 1,
+        "description": "Short offline",
+        "status": status,
+        "status_verbose": "Completed without error",
+        "remaining": 0,
+        "lifetime": lifetime,
+        "lba_of_first_error": None,
+        **fields,
+    }
+
+
+def test_latest_test_of_each_disk():
+    """Test the newest test of each disk is kept, by serial."""
+    results = SmartResults()
+    changed = results.update(
+        SERIALS,
+        [
+            {"disk": "ada0", "tests": [_test(200), _test(100)]},
+            {"disk": "ada1", "tests": []},
+            {"disk": "ada9", "tests": [_test(50)]},
+        ],
+    )
+    assert changed == ["SERIAL1"]
+    assert results.latest("SERIAL1").lifetime == 200
+    assert results.latest("SERIAL2") is None
+    assert len(results) == 1
+
+
+def test_only_new_tests_change_results():
+    """Test tests before the cursor are ignored, and the same test is no change."""
+    results = SmartResults()
+    results.update(SERIALS, [{"disk": "ada0", "tests": [_test(200)]}])
+    assert results.update(SERIALS, [{"disk": "ada0", "tests": [_test(200)]}]) == []
+    # A disk swapped in under the same name has a log of its own.
+    assert results.update(SERIALS, [{"disk": "ada0", "tests": [_test(50)]}]) == []
+    assert results.cursor("SERIAL1") == 200
+
+    changed = results.update(
+        SERIALS, [{"disk": "ada0", "tests": [_test(300, "FAILED"), _test(200)]}]
+    )
+    assert changed == ["SERIAL1"]
+    assert results.latest("SERIAL1").failing
+
+
+def test_running_test_completes_at_the_cursor():
+    """Test a running test is read again once it completes."""
+    results = SmartResults()
+    results.update(SERIALS, [{"disk": "ada0", "tests": [_test(200, "RUNNING")]}])
+    assert not results.latest("SERIAL1").failing
+
+    changed = results.update(
+        SERIALS, [{"disk": "ada0", "tests": [_test(200, lba_of_first_error=1234)]}]
+    )
+    assert changed == ["SERIAL1"]
+    assert results.latest("SERIAL1").failing
+
+
+def test_restore():
+    """Test results are restored from what they saved."""
+    results = SmartResults()
+    results.update(SERIALS, [{"disk": "ada0", "tests": [_test(200)]}])
+    restored = SmartResults()
+    restored.restore(results.as_dict())
+    assert restored.latest("SERIAL1") == SmartTest(
+        200, "Short offline", "SUCCESS", "Completed without error", None
+    )
@@ -0,0 +1,109 @@
+"""Tests for warm starts from the machine snapshot."""
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+from custom_components.truenas.const import CONF_SKIP_STANDBY_DISKS, DOMAIN
+from homeassistant.const import STATE_ON
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .conftest import setup_entry
+
+
+async def test_warm_start(hass, enable_custom_integrations, middleware, hass_storage):
+    """Test entities are created from the snapshot before the host is reached."""
+    entry = await setup_entry(hass, middleware)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=61))
+    await hass.async_block_till_done()
+    snapshot = hass_storage[f"{DOMAIN}.{entry.entry_id}"]["data"]
+    assert set(snapshot["vms"]) == {"1"}
+    assert "topology" not in snapshot["pools"]["1234"]
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    connecting = asyncio.Event()
+
+    async def hang(machine, entry):
+        connecting.set()
+        await asyncio.Event().wait()
+
+    with patch("custom_components.truenas.connection.async_connect", side_effect=hang):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        await connecting.wait()
+
+        assert hass.states.get("binary_sensor.vm1_virtural_machine_running").state == (
+            STATE_ON
+        )
+        assert hass.states.get("sensor.tank_pool").state == "ONLINE"
+        assert hass.states.get("sensor.disk_serial1_temperature").state == "35"
+
+        assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_smart_results_survive_restarts(
+    hass, enable_custom_integrations, middleware, hass_storage
+):
+    """Test SMART results are saved, and shown again before the host is reached."""
+    middleware.smart_tests = {
+        "ada0": [
+            {
+                "num": 1,
+                "description": "Short offline",
+                "status": "SUCCESS",
+                "status_verbose": "Completed without error",
+                "remaining": 0,
+                "lifetime": 200,
+                "lba_of_first_error": None,
+            }
+        ]
+    }
+    entry = await setup_entry(hass, middleware)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=61))
+    await hass.async_block_till_done()
+    saved = hass_storage[f"{DOMAIN}.{entry.entry_id}.smart"]["data"]
+    assert saved["SERIAL1"]["lifetime"] == 200
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    connecting = asyncio.Event()
+
+    async def hang(machine, entry):
+        connecting.set()
+        await asyncio.Event().wait()
+
+    with patch("custom_components.truenas.connection.async_connect", side_effect=hang):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        await connecting.wait()
+
+        assert hass.states.get("sensor.disk_serial1_smart_test").state == "SUCCESS"
+        assert hass.states.get("binary_sensor.disk_serial1_failing").state == "off"
+
+        assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_standby_temperatures_survive_restarts(
+    hass, enable_custom_integrations, middleware, hass_storage
+):
+    """Test a disk that stays in standby keeps its temperature across a restart."""
+    options = {CONF_SKIP_STANDBY_DISKS: True}
+    entry = await setup_entry(hass, middleware, options)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=61))
+    await hass.async_block_till_done()
+    saved = hass_storage[f"{DOMAIN}.{entry.entry_id}.temperatures"]["data"]
+    assert saved == {"SERIAL1": 35}
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    # The snapshot is left out, so the temperature is read from the host.
+    del hass_storage[f"{DOMAIN}.{entry.entry_id}"]
+    middleware.standby.add("ada0")
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await hass.data[DOMAIN][entry.entry_id]["supervisor"].async_wait_connected()
+    await hass.async_block_till_done()
+
+    state = hass.states.get("sensor.disk_serial1_temperature")
+    assert state.state == "35"
+    assert state.attributes["Stale"] is True
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,37 @@
+"""Tests for the rolling statistics of disk temperatures."""
+from custom_components.truenas.thermal import TemperatureHistory, TemperatureStats
+
+
+def test_statistics():
+    """Test the average and extremes follow the temperatures of a disk."""
+    history = TemperatureHistory(size=3)
+    history.add({"ada0": 30})
+    assert history.stats("ada0") == TemperatureStats(30, 30, 30, None)
+
+    history.add({"ada0": 40})
+    history.add({"ada0": None})
+    assert history.stats("ada0") == TemperatureStats(32, 30, 40, None)
+    assert history.stats("ada1") is None
+
+    # The minimum leaves the window.
+    history.add({"ada0": 35})
+    assert history.stats("ada0").minimum == 35
+    assert history.stats("ada0").maximum == 40
+
+
+def test_peer_deviation():
+    """Test a disk much hotter than the others of the host runs hot."""
+    history = TemperatureHistory()
+    history.add({"ada0": 30, "ada1": 31})
+    assert history.stats("ada0").peer_deviation is None
+
+    history.add({"ada0": 30, "ada1": 31, "ada2": 32, "ada3": 60})
+    assert history.stats("ada1").peer_deviation == -0.5
+    assert not history.stats("ada1").hot
+    assert history.stats("ada3").peer_deviation == 28.5
+    assert history.stats("ada3").hot
+
+    # Disks that went away are forgotten.
+    history.add({"ada0": 30})
+    assert history.stats("ada3") is None
+    assert history.stats("ada0").average == 30